@@ -0,0 +1,178 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from latency import LatencyHistogram
+
+# Laravel roles that share a class with another role
+ROLE_ALIASES = {"transiter": "carrier"}
+
+
+class AdmissionRejected(Exception):
+    """The request cannot be admitted; the client should retry later"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class PriorityClass:
+    """Queue settings and metrics for one group of users"""
+
+    def __init__(self, name: str, priority: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.priority = priority
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self.queued = 0
+        self.wait = LatencyHistogram(low=0.001)
+        self.counters = {"admitted": 0, "rejected_full": 0, "timed_out": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "priority": self.priority,
+            "queue_depth": self.queued,
+            **self.counters,
+            "wait": self.wait.summary(),
+        }
+
+
+class Ticket:
+    """A held slot; release is idempotent"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._started)
+
+    async def __aenter__(self) -> "Ticket":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Bounded concurrency for LLM work with per-role priority queues
+
+    Up to `max_concurrency` requests run at once. Others wait in a single
+    priority queue (lower number first, FIFO within a class), so a gate
+    operator is served before queued carriers. A request is rejected at
+    once when its class queue is full, and gives up once it has waited its
+    class's `max_wait`; both carry a Retry-After estimate.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        classes: List[PriorityClass],
+        default_class: str,
+        enabled: bool = True,
+    ):
+        self.max_concurrency = max_concurrency
+        self.classes = {c.name: c for c in classes}
+        self.default_class = default_class
+        self.enabled = enabled
+
+        self.in_use = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future, PriorityClass]] = []
+        self._sequence = itertools.count()
+        # Moving average of how long an admitted request holds its slot
+        self._service_time = 5.0
+
+    def classify(self, role: Optional[str]) -> PriorityClass:
+        role = (role or "").strip().lower()
+        role = ROLE_ALIASES.get(role, role)
+        return self.classes.get(role) or self.classes[self.default_class]
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog has likely drained"""
+        backlog = self.in_use + sum(c.queued for c in self.classes.values())
+        slots = max(self.max_concurrency, 1)
+        return max(1, math.ceil(backlog / slots * self._service_time))
+
+    async def acquire(self, role: Optional[str]) -> Ticket:
+        """Wait for a slot, or raise AdmissionRejected"""
+        if not self.enabled:
+            return Ticket(self)
+
+        cls = self.classify(role)
+        started = time.monotonic()
+
+        # Take a free slot unless someone of equal or higher priority is waiting
+        if self.in_use < self.max_concurrency and not any(
+            not w[2].done() and w[0] <= cls.priority for w in self._waiters
+        ):
+            return self._admit(cls, started)
+
+        if cls.queued >= cls.max_queue:
+            cls.counters["rejected_full"] += 1
+            raise AdmissionRejected(
+                f"Too many queued {cls.name} requests", self.retry_after()
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (cls.priority, next(self._sequence), waiter, cls))
+        cls.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=cls.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the wait expired; use it
+                return self._admit(cls, started, transferred=True)
+            waiter.cancel()
+            cls.counters["timed_out"] += 1
+            cls.wait.observe(time.monotonic() - started)
+            raise AdmissionRejected(
+                f"Waited too long for a {cls.name} slot", self.retry_after()
+            )
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(None)
+            waiter.cancel()
+            raise
+        finally:
+            cls.queued -= 1
+
+        return self._admit(cls, started, transferred=True)
+
+    def _admit(self, cls: PriorityClass, started: float, transferred: bool = False):
+        # A slot handed over by _release is already counted in in_use
+        if not transferred:
+            self.in_use += 1
+        cls.counters["admitted"] += 1
+        cls.wait.observe(time.monotonic() - started)
+        return Ticket(self)
+
+    def _release(self, held_for: Optional[float]) -> None:
+        if not self.enabled:
+            return
+        if held_for is not None:
+            self._service_time = 0.9 * self._service_time + 0.1 * held_for
+
+        # Hand the slot straight to the best waiter still waiting
+        while self._waiters:
+            _, _, waiter, _ = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_use -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_concurrency": self.max_concurrency,
+            "in_use": self.in_use,
+            "queued": sum(1 for w in self._waiters if not w[2].done()),
+            "classes": {name: c.stats() for name, c in self.classes.items()},
+        }
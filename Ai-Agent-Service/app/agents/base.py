@@ -1,6 +1,18 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any
+from metrics import FUNCTION_CALLS
 from models import ChatMessage
+from tracing import tracer
+from tools import (
+    find_availability,
+    get_booking_status,
+    get_port_schedule,
+    get_port_schedule_range,
+    get_user_bookings,
+)
+
+SYSTEM_PROMPT_PATH = "prompts/system_prompt.txt"
+DEFAULT_SYSTEM_PROMPT = "You are a helpful AI assistant for a port booking system."
 
 
 class AgentInterface(ABC):
@@ -8,7 +20,11 @@ class AgentInterface(ABC):
 
     @abstractmethod
     async def generate(
-        self, message: str, chat_history: List[ChatMessage], tools: List[Dict[str, Any]]
+        self,
+        message: str,
+        chat_history: List[ChatMessage],
+        user_id: str,
+        tools: List[Dict[str, Any]],
     ) -> str:
         """
         Generate a response from the AI agent
@@ -16,6 +32,7 @@ class AgentInterface(ABC):
         Args:
             message: The user's message
             chat_history: Previous conversation history
+            user_id: Id of the user the agent is answering
             tools: Available tools for the agent to use
 
         Returns:
@@ -23,10 +40,116 @@ class AgentInterface(ABC):
         """
         pass
 
+    @abstractmethod
+    def stream(
+        self,
+        message: str,
+        chat_history: List[ChatMessage],
+        user_id: str,
+        tools: List[Dict[str, Any]],
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from the AI agent as text chunks
+
+        Implemented as an async generator; takes the same arguments as generate.
+
+        Returns:
+            An async iterator yielding the response text as it is produced
+        """
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Provider specific runtime statistics"""
+        return {}
+
     def _load_system_prompt(self) -> str:
         """Load system prompt from file"""
         try:
-            with open("prompts/system_prompt.txt", "r") as f:
+            with open(SYSTEM_PROMPT_PATH, "r") as f:
                 return f.read()
         except FileNotFoundError:
-            return "You are a helpful AI assistant for a port booking system."
+            return DEFAULT_SYSTEM_PROMPT
+
+    async def _execute_function(
+        self, function_name: str, args: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Execute a function call and return the result"""
+        FUNCTION_CALLS.inc(function=function_name)
+        with tracer.span("function_call", **{"function.name": function_name}):
+            return await self._call_function(function_name, args)
+
+    async def _call_function(
+        self, function_name: str, args: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        try:
+            if function_name == "get_booking_status":
+                booking = await get_booking_status(
+                    booking_id=args["booking_id"],
+                    user_id=args.get("user_id", "U456"),  # Default user for MVP
+                )
+                return {
+                    "booking_id": booking.booking_id,
+                    "status": booking.status,
+                    "date": booking.timeslot.date,
+                    "hour": booking.timeslot.hour_start,
+                }
+
+            elif function_name == "get_user_bookings":
+                bookings = await get_user_bookings(
+                    user_id=args.get("user_id", "U456"),
+                    date=args["date"],
+                    hour=args["hour"],
+                )
+                return {
+                    "bookings": [
+                        {
+                            "booking_id": b.booking_id,
+                            "status": b.status,
+                            "date": b.timeslot.date,
+                            "hour": b.timeslot.hour_start,
+                        }
+                        for b in bookings
+                    ]
+                }
+
+            elif function_name == "get_port_schedule":
+                schedule = await get_port_schedule(date=args["date"])
+                return {
+                    "date": schedule.date,
+                    "slots": [
+                        {
+                            "hour": slot.hour_start,
+                            "max_capacity": slot.max_capacity,
+                            "booked_capacity": slot.booked_capacity,
+                            "available": slot.max_capacity - slot.booked_capacity,
+                        }
+                        for slot in schedule.schedule
+                    ],
+                }
+
+            elif function_name == "get_port_schedule_range":
+                grid = await get_port_schedule_range(
+                    start_date=args["start_date"],
+                    end_date=args["end_date"],
+                    hour_from=args.get("hour_from"),
+                    hour_to=args.get("hour_to"),
+                )
+                # Already compact; the model reads the tables as they are
+                return grid.model_dump()
+
+            elif function_name == "find_availability":
+                availability = await find_availability(
+                    start_date=args["start_date"],
+                    end_date=args["end_date"],
+                    trucks=int(args.get("trucks") or 1),
+                    hours=int(args.get("hours") or 1),
+                    hour_from=args.get("hour_from"),
+                    hour_to=args.get("hour_to"),
+                )
+                return availability.model_dump()
+
+            else:
+                return {"error": f"Unknown function: {function_name}"}
+
+        except Exception as e:
+            return {"error": str(e)}
@@ -0,0 +1,257 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from models import ChatMessage
+from agents.base import AgentInterface
+from config import get_settings
+from latency import LatencyHistogram
+from log import logger
+from tracing import tracer
+
+
+class Provider:
+    """One wrapped agent with its latency history and health
+
+    Full answers and time to first streamed token are tracked separately
+    since they drive different hedge thresholds.
+    """
+
+    def __init__(self, name: str, agent: AgentInterface):
+        self.name = name
+        self.agent = agent
+        self.latency = {"generate": LatencyHistogram(), "stream": LatencyHistogram()}
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.counters = {"requests": 0, "wins": 0, "failures": 0, "cancelled": 0}
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+
+class CompositeAgent(AgentInterface):
+    """Wraps several agents with hedged requests and failover
+
+    The first healthy provider is asked first. If it has not answered once
+    its adaptive hedge delay (a latency percentile from its own histogram)
+    has passed, or as soon as it fails, the next provider is asked too; the
+    first good answer wins and the other calls are cancelled. A provider that
+    fails repeatedly is skipped for a cooldown period, so traffic fails over
+    entirely until it recovers.
+    """
+
+    def __init__(
+        self,
+        providers: Optional[Sequence[Tuple[str, AgentInterface]]] = None,
+    ):
+        self.settings = get_settings()
+        if providers is None:
+            providers = self._create_providers()
+        if not providers:
+            raise ValueError("CompositeAgent needs at least one provider")
+        self.providers = [Provider(name, agent) for name, agent in providers]
+        self.hedges = 0
+        self.failovers = 0
+
+    def _create_providers(self) -> List[Tuple[str, AgentInterface]]:
+        from agents.registry import ProviderRegistry
+
+        registry = ProviderRegistry()
+        names = [
+            n.strip() for n in self.settings.composite_providers.split(",") if n.strip()
+        ]
+        return [(name, registry.create(name)) for name in names]
+
+    # Provider selection -----------------------------------------------------
+
+    def _ordered(self) -> List[Provider]:
+        """Healthy providers in configured order, then the unhealthy ones"""
+        now = time.monotonic()
+        healthy = [p for p in self.providers if p.healthy(now)]
+        return healthy + [p for p in self.providers if not p.healthy(now)]
+
+    def hedge_delay(self, provider: Provider, kind: str = "generate") -> float:
+        """How long to wait on a provider before hedging to the next one"""
+        settings = self.settings
+        histogram = provider.latency[kind]
+        if histogram.total < settings.hedge_min_samples:
+            return settings.hedge_initial_delay
+        delay = histogram.percentile(settings.hedge_percentile)
+        return min(max(delay, settings.hedge_min_delay), settings.hedge_max_delay)
+
+    def _succeeded(self, provider: Provider, kind: str, elapsed: float) -> None:
+        provider.latency[kind].observe(elapsed)
+        provider.consecutive_failures = 0
+        provider.unhealthy_until = 0.0
+        provider.counters["wins"] += 1
+
+    def _failed(self, provider: Provider, error: BaseException) -> None:
+        logger.warning("Provider %s failed: %s", provider.name, error)
+        provider.counters["failures"] += 1
+        provider.consecutive_failures += 1
+        if provider.consecutive_failures >= self.settings.provider_failure_threshold:
+            provider.unhealthy_until = (
+                time.monotonic() + self.settings.provider_cooldown
+            )
+
+    # Generation -------------------------------------------------------------
+
+    async def generate(
+        self,
+        message: str,
+        chat_history: List[ChatMessage],
+        user_id: str,
+        tools: List[Dict[str, Any]],
+    ) -> str:
+        """Return the first good answer, hedging and failing over between providers"""
+
+        async def attempt(provider: Provider) -> str:
+            return await provider.agent.generate(
+                message=message,
+                chat_history=chat_history,
+                user_id=user_id,
+                tools=tools,
+            )
+
+        return await self._race("generate", attempt)
+
+    async def stream(
+        self,
+        message: str,
+        chat_history: List[ChatMessage],
+        user_id: str,
+        tools: List[Dict[str, Any]],
+    ) -> AsyncIterator[str]:
+        """Stream from the first provider to produce a token
+
+        Hedging and failover apply until the first chunk; after that the
+        winning stream is relayed as is.
+        """
+
+        async def attempt(provider: Provider) -> Tuple[str, AsyncIterator[str]]:
+            stream = provider.agent.stream(
+                message=message,
+                chat_history=chat_history,
+                user_id=user_id,
+                tools=tools,
+            )
+            try:
+                return await stream.__anext__(), stream
+            except StopAsyncIteration:
+                return "", stream
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        first, stream = await self._race(
+            "stream", attempt, on_cancel=self._close_stream
+        )
+        try:
+            if first:
+                yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    @staticmethod
+    async def _close_stream(result: Tuple[str, AsyncIterator[str]]) -> None:
+        await result[1].aclose()
+
+    async def _race(self, kind: str, attempt, on_cancel=None):
+        """Run attempt(provider) with hedging; return the first successful result"""
+        queue = self._ordered()
+        running: Dict[asyncio.Task, Tuple[Provider, float]] = {}
+        last_error: Optional[BaseException] = None
+        # The primary is skipped while unhealthy
+        failed_over = queue[0] is not self.providers[0]
+
+        def launch() -> None:
+            provider = queue.pop(0)
+            provider.counters["requests"] += 1
+            task = asyncio.ensure_future(self._attempt(provider, kind, attempt))
+            running[task] = (provider, time.monotonic())
+
+        launch()
+        try:
+            while running:
+                # Hedge when the newest attempt outlives its provider's delay;
+                # unhealthy providers are only used to fail over
+                provider, started = next(reversed(running.values()))
+                timeout = None
+                if queue and queue[0].healthy(time.monotonic()):
+                    timeout = max(
+                        started + self.hedge_delay(provider, kind) - time.monotonic(), 0
+                    )
+
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self.hedges += 1
+                    launch()
+                    continue
+
+                for task in done:
+                    provider, started = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        self._succeeded(provider, kind, time.monotonic() - started)
+                        self.failovers += failed_over
+                        return task.result()
+                    self._failed(provider, error)
+                    last_error = error
+                    # Fail over right away instead of waiting for the hedge
+                    if queue:
+                        failed_over = True
+                        launch()
+        finally:
+            await self._cancel(running, on_cancel)
+
+        raise last_error or Exception("No AI provider is available")
+
+    @staticmethod
+    async def _attempt(provider: Provider, kind: str, attempt):
+        with tracer.span(
+            f"provider {kind}", **{"provider.name": provider.name}
+        ) as span:
+            try:
+                return await attempt(provider)
+            except asyncio.CancelledError:
+                span.set(**{"provider.cancelled": True})
+                raise
+
+    async def _cancel(
+        self, running: Dict[asyncio.Task, Tuple[Provider, float]], on_cancel
+    ) -> None:
+        """Cancel the losing attempts and release whatever they produced"""
+        for task, (provider, _) in running.items():
+            provider.counters["cancelled"] += 1
+            task.cancel()
+        for task in running:
+            try:
+                result = await task
+            except BaseException:
+                continue
+            # Finished between the win and the cancellation
+            if on_cancel is not None:
+                await on_cancel(result)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "providers": {
+                p.name: {
+                    "healthy": p.healthy(now),
+                    "consecutive_failures": p.consecutive_failures,
+                    "hedge_delay_s": {
+                        kind: round(self.hedge_delay(p, kind), 3) for kind in p.latency
+                    },
+                    "latency": {kind: h.summary() for kind, h in p.latency.items()},
+                    **p.counters,
+                    "agent": p.agent.stats(),
+                }
+                for p in self.providers
+            },
+        }
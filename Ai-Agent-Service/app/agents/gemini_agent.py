@@ -1,10 +1,22 @@
+import asyncio
+import time
 from google import genai
 from google.genai import types
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional
 from models import ChatMessage
-from agents.base import AgentInterface
+from agents.base import AgentInterface, DEFAULT_SYSTEM_PROMPT, SYSTEM_PROMPT_PATH
 from config import get_settings
-from tools import get_booking_status, get_port_schedule, get_user_bookings
+from context import ContextBuilder
+from metrics import LLM_SECONDS, observed, record_tokens
+from tracing import tracer
+from prompt_cache import GeminiPromptCacheProvider, PromptCache
+from tools import (
+    find_availability,
+    get_booking_status,
+    get_port_schedule,
+    get_port_schedule_range,
+    get_user_bookings,
+)
 
 
 class GeminiAgent(AgentInterface):
@@ -14,18 +26,88 @@ class GeminiAgent(AgentInterface):
         self.settings = get_settings()
         self.client = genai.Client(api_key=self.settings.gemini_api_key)
 
-        self.system_prompt = self._load_system_prompt()
+        self.context_builder = ContextBuilder(
+            max_tokens=self.settings.context_max_tokens,
+            message_max_tokens=self.settings.context_message_max_tokens,
+            summary_max_tokens=self.settings.context_summary_max_tokens,
+        )
+
+        self.model = "gemini-2.0-flash-lite"
+
+        self.tool_declarations = [
+            types.Tool(
+                function_declarations=[
+                    types.FunctionDeclaration.from_callable(
+                        client=self.client, callable=function
+                    )
+                    for function in (
+                        get_booking_status,
+                        get_port_schedule,
+                        get_port_schedule_range,
+                        get_user_bookings,
+                        find_availability,
+                    )
+                ]
+            )
+        ]
+
+        # The system prompt and tool declarations are the static prefix of
+        # every request; the provider caches them so they are not re-processed
+        self.prompt_cache = PromptCache(
+            provider=GeminiPromptCacheProvider(self.client),
+            model=self.model,
+            tools=self.tool_declarations,
+            prompt_path=SYSTEM_PROMPT_PATH,
+            default_prompt=DEFAULT_SYSTEM_PROMPT,
+            ttl_seconds=self.settings.gemini_prompt_cache_ttl,
+            min_tokens=self.settings.gemini_prompt_cache_min_tokens,
+            enabled=self.settings.gemini_prompt_cache_enabled,
+        )
+        self._build_configs()
+
+    def _build_configs(self) -> None:
+        """Build the inline request configs for the current system prompt"""
+        self.system_prompt = self.prompt_cache.system_prompt
+        self._config_version = self.prompt_cache.version
 
         self.config = types.GenerateContentConfig(
-            tools=[
-                get_booking_status,
-                get_port_schedule,
-                get_user_bookings,
-            ],
+            system_instruction=self.system_prompt,
+            tools=self.tool_declarations,
             automatic_function_calling={"disable": True},
         )
+        # Used once the tool rounds or the time budget are spent, so the
+        # model answers with the data it already has
+        self.final_config = self.config.model_copy(
+            update={
+                "tool_config": types.ToolConfig(
+                    function_calling_config=types.FunctionCallingConfig(mode="NONE")
+                )
+            }
+        )
+        self._cached_config = None
 
-        self.model = "gemini-2.0-flash-lite"
+    def stats(self) -> Dict[str, Any]:
+        return {"prompt_cache": self.prompt_cache.stats()}
+
+    async def _request_config(self, final: bool) -> types.GenerateContentConfig:
+        """Pick the config for the next model call, preferring the cached prefix"""
+        await self.prompt_cache.reload_prompt()
+        # Function calling cannot be switched off on top of a cached prefix
+        # that declares tools, so final answers always use the inline config
+        name = None if final else await self.prompt_cache.handle()
+
+        if self._config_version != self.prompt_cache.version:
+            self._build_configs()
+
+        if name is None:
+            return self.final_config if final else self.config
+
+        if self._cached_config is None or self._cached_config.cached_content != name:
+            self._cached_config = types.GenerateContentConfig(
+                cached_content=name,
+                automatic_function_calling={"disable": True},
+            )
+        return self._cached_config
 
     async def generate(
         self,
@@ -44,12 +126,26 @@ class GeminiAgent(AgentInterface):
                 types.Content(role="user", parts=[types.Part(text=message)])
             )
 
-            max_iterations = 1
-            for i in range(max_iterations):
+            max_rounds = self.settings.agent_max_tool_rounds
+            deadline = time.monotonic() + self.settings.agent_time_budget
+            for i in range(max_rounds + 1):
+                final = i == max_rounds or time.monotonic() >= deadline
+
+                config = await self._request_config(final)
                 # Use client.aio for non-blocking async calls
-                response = await self.client.aio.models.generate_content(
-                    model=self.model, contents=contents, config=self.config
-                )
+                with tracer.span(
+                    "llm generate_content",
+                    kind="client",
+                    **self._span_attributes(config, i),
+                ) as span, observed(
+                    LLM_SECONDS, "llm", provider="gemini", call="generate"
+                ):
+                    response = await self.client.aio.models.generate_content(
+                        model=self.model,
+                        contents=contents,
+                        config=config,
+                    )
+                    self._record_usage(response.usage_metadata, span)
 
                 # Add the model's response (text or function call) to history
                 model_content = response.candidates[0].content
@@ -64,120 +160,168 @@ class GeminiAgent(AgentInterface):
                     # No function calls? We have the final text response.
                     return response.text
 
-                # 3. Handle Function Calls
-                tool_responses = []
-
-                for fc in function_calls:
-                    # Execute your async tool functions
-                    result = await self._execute_function(fc.name, dict(fc.args))
-
-                    # Format response correctly for Gemini
-                    tool_responses.append(
-                        types.Part(
-                            function_response=types.FunctionResponse(
-                                name=fc.name, response={"result": result}
-                            )
-                        )
-                    )
-
                 # Send function results back in the next loop iteration
-                contents.append(types.Content(role="user", parts=tool_responses))
+                contents.append(await self._call_functions(function_calls, deadline))
 
             return "I'm sorry, I reached my maximum reasoning limit for this request."
 
         except Exception as e:
             raise Exception(f"Error whilst generating the response {str(e)}")
 
-    def _build_chat_history(
-        self, chat_history: List[ChatMessage], user_id: str
-    ) -> List[Dict[str, Any]]:
-        """Build Gemini chat history format"""
-        history = []
-
-        # Add system instruction as first user message
-        if chat_history:
-            history.append(
-                types.Content(
-                    role="user",
-                    parts=[
-                        types.Part(text=self.system_prompt),
-                        types.Part(text=f"The Current User's Id is: {user_id}"),
-                    ],
-                )
+    async def stream(
+        self,
+        message: str,
+        chat_history: List[ChatMessage],
+        user_id: str,
+        tools: List[Dict[str, Any]],
+    ) -> AsyncIterator[str]:
+        """Stream response text from Gemini, resolving function calls mid-stream"""
+        try:
+            contents = self._build_chat_history(
+                chat_history=chat_history, user_id=user_id
             )
-            history.append(
-                types.Content(
-                    role="model",
-                    parts=[
-                        types.Part(
-                            text="I understand. I'll help you with your port booking needs"
-                        )
-                    ],
-                )
+            contents.append(
+                types.Content(role="user", parts=[types.Part(text=message)])
             )
 
-        # Add conversation history (last 10 messages)
-        for msg in chat_history[-10:]:
-            role = "user" if msg.sender == "user" else "model"
-            history.append(
-                types.Content(role=role, parts=[types.Part(text=msg.message)])
-            )
+            max_rounds = self.settings.agent_max_tool_rounds
+            deadline = time.monotonic() + self.settings.agent_time_budget
+            for i in range(max_rounds + 1):
+                final = i == max_rounds or time.monotonic() >= deadline
+                model_parts = []
+                function_calls = []
 
-        return history
+                usage = None
+
+                config = await self._request_config(final)
+                # Not made current: the span stays open across the yields below
+                with tracer.span(
+                    "llm generate_content_stream",
+                    kind="client",
+                    activate=False,
+                    **self._span_attributes(config, i),
+                ) as span, observed(
+                    LLM_SECONDS, "llm", provider="gemini", call="stream"
+                ):
+                    async for (
+                        chunk
+                    ) in await self.client.aio.models.generate_content_stream(
+                        model=self.model,
+                        contents=contents,
+                        config=config,
+                    ):
+                        # Each chunk carries the running totals
+                        usage = chunk.usage_metadata or usage
+                        if not chunk.candidates or not chunk.candidates[0].content:
+                            continue
+
+                        for part in chunk.candidates[0].content.parts or []:
+                            model_parts.append(part)
+                            if part.function_call:
+                                function_calls.append(part.function_call)
+                            elif part.text:
+                                yield part.text
+                    self._record_usage(usage, span)
+
+                if not function_calls:
+                    return
+
+                contents.append(types.Content(role="model", parts=model_parts))
+                contents.append(await self._call_functions(function_calls, deadline))
 
-    async def _execute_function(
-        self, function_name: str, args: Dict[str, Any]
+            yield "I'm sorry, I reached my maximum reasoning limit for this request."
+
+        except Exception as e:
+            raise Exception(f"Error whilst streaming the response {str(e)}")
+
+    def _span_attributes(
+        self, config: types.GenerateContentConfig, round: int
     ) -> Dict[str, Any]:
-        """Execute a function call and return the result"""
+        return {
+            "gen_ai.system": "gemini",
+            "gen_ai.request.model": self.model,
+            "agent.round": round,
+            "agent.cached_prefix": config.cached_content is not None,
+        }
 
-        try:
-            if function_name == "get_booking_status":
-                booking = await get_booking_status(
-                    booking_id=args["booking_id"],
-                    user_id=args.get("user_id", "U456"),  # Default user for MVP
-                )
-                return {
-                    "booking_id": booking.booking_id,
-                    "status": booking.status,
-                    "date": booking.timeslot.date,
-                    "hour": booking.timeslot.hour_start,
+    @staticmethod
+    def _record_usage(
+        usage: Optional[types.GenerateContentResponseUsageMetadata], span
+    ) -> None:
+        if usage is not None:
+            record_tokens(
+                "gemini", usage.prompt_token_count, usage.candidates_token_count
+            )
+            span.set(
+                **{
+                    "gen_ai.usage.input_tokens": usage.prompt_token_count,
+                    "gen_ai.usage.output_tokens": usage.candidates_token_count,
                 }
+            )
+
+    async def _call_functions(
+        self, function_calls: List[types.FunctionCall], deadline: float
+    ) -> types.Content:
+        """Execute the model's function calls concurrently and wrap the results for Gemini"""
 
-            elif function_name == "get_user_bookings":
-                bookings = await get_user_bookings(
-                    user_id=args.get("user_id", "U456"),
-                    date=args["date"],
-                    hour=args["hour"],
+        async def call(fc: types.FunctionCall) -> Dict[str, Any]:
+            try:
+                return await asyncio.wait_for(
+                    self._execute_function(fc.name, dict(fc.args or {})),
+                    timeout=max(deadline - time.monotonic(), 0),
                 )
+            except asyncio.TimeoutError:
                 return {
-                    "bookings": [
-                        {
-                            "booking_id": b.booking_id,
-                            "status": b.status,
-                            "date": b.timeslot.date,
-                            "hour": b.timeslot.hour_start,
-                        }
-                        for b in bookings
-                    ]
+                    "error": "The request ran out of time before this tool answered"
                 }
 
-            elif function_name == "get_port_schedule":
-                schedule = await get_port_schedule(date=args["date"])
-                return {
-                    "date": schedule.date,
-                    "slots": [
-                        {
-                            "hour": slot.hour_start,
-                            "max_capacity": slot.max_capacity,
-                            "booked_capacity": slot.booked_capacity,
-                            "available": slot.max_capacity - slot.booked_capacity,
-                        }
-                        for slot in schedule.schedule
-                    ],
-                }
+        results = await asyncio.gather(*(call(fc) for fc in function_calls))
 
-            else:
-                return {"error": f"Unknown function: {function_name}"}
+        # Format responses correctly for Gemini, in the order they were requested
+        tool_responses = [
+            types.Part(
+                function_response=types.FunctionResponse(
+                    name=fc.name, response={"result": result}
+                )
+            )
+            for fc, result in zip(function_calls, results)
+        ]
 
-        except Exception as e:
-            return {"error": str(e)}
+        return types.Content(role="user", parts=tool_responses)
+
+    def _build_chat_history(
+        self, chat_history: List[ChatMessage], user_id: str
+    ) -> List[Dict[str, Any]]:
+        """Build Gemini chat history format"""
+        history = []
+        context = self.context_builder.build(chat_history)
+
+        # The system prompt is sent as system instruction (or cached prefix);
+        # per-request context goes in a first user message
+        parts = [types.Part(text=f"The Current User's Id is: {user_id}")]
+        if context.summary:
+            parts.append(
+                types.Part(
+                    text=f"Summary of the earlier conversation:\n{context.summary}"
+                )
+            )
+        history.append(types.Content(role="user", parts=parts))
+        history.append(
+            types.Content(
+                role="model",
+                parts=[
+                    types.Part(
+                        text="I understand. I'll help you with your port booking needs"
+                    )
+                ],
+            )
+        )
+
+        # Add the recent conversation that fits the token budget
+        for msg in context.messages:
+            role = "user" if msg.sender == "human" else "model"
+            history.append(
+                types.Content(role=role, parts=[types.Part(text=msg.message)])
+            )
+
+        return history
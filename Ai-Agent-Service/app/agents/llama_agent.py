@@ -1,123 +1,241 @@
 """
-EXPERIMENTAL MODULE  === HAS NO TEST COVERAGE
+EXPERIMENTAL MODULE
 
-The ollama agent implementation has not been tested either a devlopment or production environment,
-Thus this module is currently only experimental and should be tested before being labeled as finished
+The ollama agent implementation is only covered by unit tests against a scripted client and has not been tested
+in either a devlopment or production environment, Thus this module is currently only experimental and should be
+tested before being labeled as finished
 """
 
+import asyncio
 import json
+import time
+import httpx
 import ollama
-from typing import List, Dict, Any
-from app.tools import get_booking_status, get_port_schedule, get_user_bookings
+from typing import AsyncIterator, List, Dict, Any
 from models import ChatMessage
 from agents.base import AgentInterface
 from config import get_settings
+from context import ContextBuilder
+from metrics import LLM_SECONDS, observed, record_tokens
+from tracing import tracer
+from tools import (
+    find_availability,
+    get_booking_status,
+    get_port_schedule,
+    get_port_schedule_range,
+    get_user_bookings,
+)
 
 
 class LlamaAgent(AgentInterface):
-    """Llama AI agent implementation using Ollama"""
+    """Llama AI agent implementation using Ollama's chat API with native tool calling
+
+    One async client is shared by every request so connections to the Ollama
+    server are reused. Model calls are bounded by a semaphore sized to the
+    server's parallelism (OLLAMA_NUM_PARALLEL); requests beyond it wait here
+    instead of queueing inside Ollama.
+    """
 
     def __init__(self):
         self.settings = get_settings()
         self.model = self.settings.ollama_model
         self.system_prompt = self._load_system_prompt()
+        self.context_builder = ContextBuilder(
+            max_tokens=self.settings.context_max_tokens,
+            message_max_tokens=self.settings.context_message_max_tokens,
+            summary_max_tokens=self.settings.context_summary_max_tokens,
+        )
+
+        self.client = ollama.AsyncClient(
+            host=self.settings.ollama_base_url,
+            timeout=self.settings.ollama_timeout,
+            limits=httpx.Limits(
+                max_connections=self.settings.ollama_max_concurrency,
+                max_keepalive_connections=self.settings.ollama_max_concurrency,
+            ),
+        )
+        self.concurrency = asyncio.Semaphore(self.settings.ollama_max_concurrency)
+
+        # Ollama builds the tool schemas from the signatures and docstrings
+        self.tools = [
+            get_booking_status,
+            get_port_schedule,
+            get_port_schedule_range,
+            get_user_bookings,
+            find_availability,
+        ]
 
     async def generate(
-        self, message: str, chat_history: List[ChatMessage], tools: List[Dict[str, Any]]
+        self,
+        message: str,
+        chat_history: List[ChatMessage],
+        user_id: str,
+        tools: List[Dict[str, Any]],
     ) -> str:
-        """Generate response using Llama via Ollama"""
-
-        # Build conversation
-        conversation = self._build_conversation(chat_history, message)
-
-        # Generate with tool calling
-        response = await self._generate_with_tools(conversation, message)
-
-        return response
-
-    def _build_conversation(
-        self, chat_history: List[ChatMessage], current_message: str
-    ) -> str:
-        """Build conversation context"""
-        context = f"{self.system_prompt}\n\n=== Conversation History ===\n"
-
-        for msg in chat_history[-10:]:  # Last 10 messages
-            sender = "User" if msg.sender == "human" else "Assistant"
-            context += f"{sender}: {msg.message}\n"
-
-        context += f"\nUser: {current_message}\nAssistant:"
-        return context
-
-    async def _generate_with_tools(self, context: str, user_message: str) -> str:
-        """Generate response with tool calling capability"""
-
-        response_text = ""
-
-        # Simple keyword-based tool detection for MVP
-        # Check if user is asking about booking status
-        if "booking" in user_message.lower() and any(
-            word in user_message.lower()
-            for word in ["status", "check", "what", "where"]
-        ):
-            words = user_message.split()
-            for word in words:
-                if word.startswith("BK") or word.startswith("bk"):
-                    try:
-                        booking = await get_booking_status(word.upper(), "U456")
-                        response_text = (
-                            f"Booking {booking.booking_id} is {booking.status}. "
+        """Generate response using Llama via Ollama, running the model's tool calls"""
+        try:
+            messages = self._build_conversation(chat_history, message, user_id)
+
+            max_rounds = self.settings.agent_max_tool_rounds
+            deadline = time.monotonic() + self.settings.agent_time_budget
+            for i in range(max_rounds + 1):
+                final = i == max_rounds or time.monotonic() >= deadline
+
+                async with self.concurrency:
+                    with tracer.span(
+                        "llm chat", kind="client", **self._span_attributes(i)
+                    ) as span, observed(
+                        LLM_SECONDS, "llm", provider="llama", call="generate"
+                    ):
+                        response = await self.client.chat(
+                            model=self.model,
+                            messages=messages,
+                            tools=None if final else self.tools,
                         )
-                        response_text += f"Scheduled for {booking.timeslot.date} at hour {booking.timeslot.hour_start}:00."
-                        return response_text
-                    except Exception as e:
-                        pass
-
-        # Check if user is asking about their bookings
-        if any(
-            word in user_message.lower()
-            for word in ["my bookings", "my appointments", "today"]
-        ):
-            try:
-                from datetime import date
-
-                today = date.today().isoformat()
-                bookings = await get_user_bookings("U456", today, "14")
-
-                if bookings:
-                    response_text = f"You have {len(bookings)} booking(s) today:\n"
-                    for booking in bookings:
-                        response_text += f"- {booking.booking_id}: {booking.status} at {booking.timeslot.hour_start}:00\n"
-                    return response_text.strip()
-                else:
-                    return "You have no bookings for today."
-            except Exception as e:
-                pass
-
-        # Check for schedule/availability
-        if any(
-            word in user_message.lower()
-            for word in ["available", "schedule", "slots", "capacity"]
-        ):
-            try:
-                from datetime import date
-
-                today = date.today().isoformat()
+                        self._record_usage(response, span)
 
-                schedule = await get_port_schedule(today)
+                messages.append(response.message)
+                if not response.message.tool_calls:
+                    return response.message.content or ""
 
-                response_text = f"Schedule on {schedule.date}:\n"
+                messages.extend(
+                    await self._call_functions(
+                        response.message.tool_calls, user_id, deadline
+                    )
+                )
 
-                for slot in schedule.schedule[:5]:
-                    available = slot.max_capacity - slot.booked_capacity
-                    response_text += f"Hour {slot.hour_start}:00 - {available}/{slot.max_capacity} slots available\n"
+            return "I'm sorry, I reached my maximum reasoning limit for this request."
 
-                return response_text.strip()
-            except Exception as e:
-                pass
-
-        # Fallback to Llama generation
+        except Exception as e:
+            raise Exception(f"Error whilst generating the response {str(e)}")
+
+    async def stream(
+        self,
+        message: str,
+        chat_history: List[ChatMessage],
+        user_id: str,
+        tools: List[Dict[str, Any]],
+    ) -> AsyncIterator[str]:
+        """Stream response text from Llama, resolving tool calls between rounds"""
         try:
-            response = ollama.generate(model=self.model, prompt=context)
-            return response["response"]
+            messages = self._build_conversation(chat_history, message, user_id)
+
+            max_rounds = self.settings.agent_max_tool_rounds
+            deadline = time.monotonic() + self.settings.agent_time_budget
+            for i in range(max_rounds + 1):
+                final = i == max_rounds or time.monotonic() >= deadline
+                content = []
+                tool_calls = []
+
+                async with self.concurrency:
+                    # Not made current: the span stays open across the yields
+                    with tracer.span(
+                        "llm chat stream",
+                        kind="client",
+                        activate=False,
+                        **self._span_attributes(i),
+                    ) as span, observed(
+                        LLM_SECONDS, "llm", provider="llama", call="stream"
+                    ):
+                        async for chunk in await self.client.chat(
+                            model=self.model,
+                            messages=messages,
+                            tools=None if final else self.tools,
+                            stream=True,
+                        ):
+                            if chunk.message.tool_calls:
+                                tool_calls.extend(chunk.message.tool_calls)
+                            if chunk.message.content:
+                                content.append(chunk.message.content)
+                                yield chunk.message.content
+                            # Token counts come with the final chunk
+                            if chunk.done:
+                                self._record_usage(chunk, span)
+
+                if not tool_calls:
+                    return
+
+                messages.append(
+                    ollama.Message(
+                        role="assistant",
+                        content="".join(content),
+                        tool_calls=tool_calls,
+                    )
+                )
+                messages.extend(
+                    await self._call_functions(tool_calls, user_id, deadline)
+                )
+
+            yield "I'm sorry, I reached my maximum reasoning limit for this request."
+
         except Exception as e:
-            return f"I apologize, but I encountered an error: {str(e)}. Please try rephrasing your question."
+            raise Exception(f"Error whilst streaming the response {str(e)}")
+
+    def _span_attributes(self, round: int) -> Dict[str, Any]:
+        return {
+            "gen_ai.system": "ollama",
+            "gen_ai.request.model": self.model,
+            "agent.round": round,
+        }
+
+    @staticmethod
+    def _record_usage(response: ollama.ChatResponse, span) -> None:
+        record_tokens("llama", response.prompt_eval_count, response.eval_count)
+        span.set(
+            **{
+                "gen_ai.usage.input_tokens": response.prompt_eval_count,
+                "gen_ai.usage.output_tokens": response.eval_count,
+            }
+        )
+
+    async def _call_functions(
+        self,
+        tool_calls: List[ollama.Message.ToolCall],
+        user_id: str,
+        deadline: float,
+    ) -> List[Dict[str, Any]]:
+        """Execute the model's tool calls concurrently and wrap the results for Ollama"""
+
+        async def call(tc: ollama.Message.ToolCall) -> Dict[str, Any]:
+            # Bookings are always looked up for the user making the request
+            args = {**(tc.function.arguments or {}), "user_id": user_id}
+            try:
+                return await asyncio.wait_for(
+                    self._execute_function(tc.function.name, args),
+                    timeout=max(deadline - time.monotonic(), 0),
+                )
+            except asyncio.TimeoutError:
+                return {
+                    "error": "The request ran out of time before this tool answered"
+                }
+
+        results = await asyncio.gather(*(call(tc) for tc in tool_calls))
+
+        return [
+            {
+                "role": "tool",
+                "tool_name": tc.function.name,
+                "content": json.dumps(result),
+            }
+            for tc, result in zip(tool_calls, results)
+        ]
+
+    def _build_conversation(
+        self, chat_history: List[ChatMessage], current_message: str, user_id: str
+    ) -> List[Dict[str, Any]]:
+        """Build the chat messages: system prompt, summary, recent turns, new message"""
+        conversation = self.context_builder.build(chat_history)
+
+        system = f"{self.system_prompt}\n\nThe Current User's Id is: {user_id}"
+        if conversation.summary:
+            system += (
+                f"\n\nSummary of the earlier conversation:\n{conversation.summary}"
+            )
+        messages = [{"role": "system", "content": system}]
+
+        for msg in conversation.messages:  # Recent turns within the token budget
+            role = "user" if msg.sender == "human" else "assistant"
+            messages.append({"role": role, "content": msg.message})
+
+        messages.append({"role": "user", "content": current_message})
+        return messages
@@ -0,0 +1,62 @@
+import importlib
+import time
+from typing import Any, Dict, Optional, Type
+
+from agents.base import AgentInterface
+
+# Provider name -> "module:Class"; modules are only imported when selected so
+# a pod never pays for SDKs it does not use
+PROVIDERS: Dict[str, str] = {
+    "gemini": "agents.gemini_agent:GeminiAgent",
+    "llama": "agents.llama_agent:LlamaAgent",
+    # Hedges and fails over between the providers in COMPOSITE_PROVIDERS
+    "composite": "agents.composite_agent:CompositeAgent",
+}
+
+
+class ProviderRegistry:
+    """Resolves the configured AI provider to an agent, importing it lazily
+
+    Records how long the provider's import and construction took so cold
+    start cost is visible in the service stats.
+    """
+
+    def __init__(self, providers: Optional[Dict[str, str]] = None):
+        self.providers = dict(PROVIDERS if providers is None else providers)
+        self.selected: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+
+    def register(self, name: str, target: str) -> None:
+        """Register a provider as "module:Class" """
+        self.providers[name.lower()] = target
+
+    def load(self, name: str) -> Type[AgentInterface]:
+        """Import the provider's module and return its agent class"""
+        target = self.providers.get(name.strip().lower())
+        if target is None:
+            raise ValueError(
+                f"Unknown AI provider '{name}', expected one of: {', '.join(sorted(self.providers))}"
+            )
+
+        module_name, _, class_name = target.partition(":")
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        self.timings["import_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return getattr(module, class_name)
+
+    def create(self, name: str) -> AgentInterface:
+        """Import and construct the agent for a provider"""
+        agent_class = self.load(name)
+
+        started = time.perf_counter()
+        agent = agent_class()
+        self.timings["init_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self.selected = name.strip().lower()
+        return agent
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.selected,
+            "available": sorted(self.providers),
+            **self.timings,
+        }
@@ -0,0 +1,461 @@
+import functools
+import hashlib
+import inspect
+import random
+import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import httpx
+from pydantic import BaseModel
+
+from models import ChatMessage
+
+# Words that change what a question refers to; they must match exactly
+TEMPORAL_WORDS = {
+    "today",
+    "tomorrow",
+    "yesterday",
+    "tonight",
+    "morning",
+    "afternoon",
+    "evening",
+    "week",
+    "next",
+    "last",
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+}
+
+# Filler words ignored when comparing phrasings
+STOPWORDS = {
+    "a",
+    "an",
+    "the",
+    "is",
+    "are",
+    "was",
+    "what",
+    "whats",
+    "s",
+    "of",
+    "for",
+    "to",
+    "at",
+    "on",
+    "in",
+    "me",
+    "my",
+    "i",
+    "you",
+    "can",
+    "could",
+    "please",
+    "show",
+    "tell",
+    "give",
+    "check",
+    "about",
+    "there",
+    "any",
+    "do",
+    "does",
+}
+
+# Words that point back at the previous answer rather than add a subject
+REFERRING_WORDS = {
+    "and",
+    "how",
+    "then",
+    "also",
+    "instead",
+    "same",
+    "else",
+    "other",
+    "others",
+    "that",
+    "those",
+    "it",
+    "them",
+    "one",
+    "yes",
+    "no",
+    "ok",
+}
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", message.lower())).strip()
+
+
+def anchor_tokens(normalized: str) -> Tuple[str, ...]:
+    """Tokens that must be identical for two questions to share an answer"""
+    return tuple(
+        sorted(
+            {
+                token
+                for token in normalized.split()
+                if token in TEMPORAL_WORDS or any(c.isdigit() for c in token)
+            }
+        )
+    )
+
+
+def fingerprint(result: Any) -> str:
+    """Stable digest of a tool result (or of the error it raised)"""
+    if isinstance(result, httpx.HTTPStatusError):
+        payload = f"error:{result.response.status_code}"
+    elif isinstance(result, BaseException):
+        payload = f"error:{type(result).__name__}"
+    elif isinstance(result, BaseModel):
+        payload = result.model_dump_json()
+    elif isinstance(result, list):
+        payload = "[" + ",".join(fingerprint(item) for item in result) + "]"
+    else:
+        payload = repr(result)
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+def is_follow_up(normalized: str) -> bool:
+    """Whether a question only makes sense after the previous answer
+
+    Questions without anchor tokens ("yes please", "and the others?") lean on
+    the conversation, and so do short ones that name nothing but an anchor
+    ("what about tomorrow", "and at 14?").
+    """
+    anchors = anchor_tokens(normalized)
+    return not anchors or all(
+        w in STOPWORDS or w in REFERRING_WORDS or w in anchors
+        for w in normalized.split()
+    )
+
+
+def context_fingerprint(history: Sequence[ChatMessage]) -> str:
+    """Digest of the turn a follow-up answers: the last assistant message"""
+    last = next((m.message for m in reversed(history) if m.sender == "agent"), "")
+    return hashlib.blake2b(last.encode(), digest_size=8).hexdigest()
+
+
+class ToolDependency(BaseModel):
+    """A tool call an answer was built from"""
+
+    name: str
+    arguments: Dict[str, Any]
+    fingerprint: str
+    cacheable: bool = True
+
+
+class MinHasher:
+    """MinHash signatures over character shingles, with LSH banding"""
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, num_hashes: int = 64, bands: int = 16, shingle_size: int = 4):
+        rng = random.Random(1337)
+        self.num_hashes = num_hashes
+        self.bands = bands
+        self.rows = num_hashes // bands
+        self.shingle_size = shingle_size
+        self._coefficients = [
+            (rng.randrange(1, self._PRIME), rng.randrange(0, self._PRIME))
+            for _ in range(num_hashes)
+        ]
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        size = self.shingle_size
+        content = " ".join(w for w in text.split() if w not in STOPWORDS) or text
+        padded = f" {content} "
+        shingles = {padded[i : i + size] for i in range(max(len(padded) - size + 1, 1))}
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+            for s in shingles
+        ]
+        return tuple(
+            min((a * h + b) % self._PRIME for h in hashes)
+            for a, b in self._coefficients
+        )
+
+    def band_keys(self, signature: Tuple[int, ...]) -> List[Tuple]:
+        rows = self.rows
+        return [(i, signature[i * rows : (i + 1) * rows]) for i in range(self.bands)]
+
+    @staticmethod
+    def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+        return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+class AnswerEntry(BaseModel):
+    key: Tuple
+    normalized: str
+    signature: Tuple[int, ...]
+    answer: str
+    dependencies: List[ToolDependency]
+    expires_at: float
+
+
+_recording: ContextVar[Optional[List[ToolDependency]]] = ContextVar(
+    "answer_cache_recording", default=None
+)
+
+
+def tracked(name: str):
+    """Decorate a tool so its calls are recorded as answer dependencies"""
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            deps = _recording.get()
+            if deps is None:
+                return await func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                not_found = (
+                    isinstance(e, httpx.HTTPStatusError)
+                    and e.response.status_code == 404
+                )
+                deps.append(
+                    ToolDependency(
+                        name=name,
+                        arguments=arguments,
+                        fingerprint=fingerprint(e),
+                        cacheable=not_found,
+                    )
+                )
+                raise
+            deps.append(
+                ToolDependency(
+                    name=name, arguments=arguments, fingerprint=fingerprint(result)
+                )
+            )
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def recording() -> Iterator[List[ToolDependency]]:
+    """Collect the tool calls made while generating one answer"""
+    deps: List[ToolDependency] = []
+    token = _recording.set(deps)
+    try:
+        yield deps
+    finally:
+        _recording.reset(token)
+
+
+class AnswerCache:
+    """Caches final answers per user, keyed on the normalized question
+
+    Follow-ups mean something different after every answer, so their key
+    also holds the assistant turn they follow; self-contained questions are
+    shared across turns and chats.
+
+    Each answer remembers the tool calls it was built from and their result
+    fingerprints. Before a cached answer is served, those calls are replayed
+    (normally straight from the tool cache) and the answer is dropped if any
+    result changed. Questions that differ only in phrasing are matched with
+    MinHash, provided their anchor tokens (ids, hours, dates, "tomorrow"...)
+    are identical.
+    """
+
+    def __init__(
+        self,
+        tools: Dict[str, Callable[..., Awaitable[Any]]],
+        enabled: bool = True,
+        ttl: float = 300.0,
+        max_entries: int = 2048,
+        similarity_threshold: float = 0.8,
+    ):
+        self.tools = tools
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.hasher = MinHasher()
+
+        self._entries: "OrderedDict[Tuple, AnswerEntry]" = OrderedDict()
+        self._buckets: Dict[Tuple, set] = {}
+
+        self.counters = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "near_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    def _key(
+        self,
+        user_id: str,
+        history: Sequence[ChatMessage],
+        normalized: str,
+    ) -> Tuple:
+        context = context_fingerprint(history) if is_follow_up(normalized) else ""
+        return (
+            str(user_id),
+            date.today().isoformat(),
+            context,
+            anchor_tokens(normalized),
+        )
+
+    async def lookup(
+        self,
+        user_id: str,
+        message: str,
+        history: Sequence[ChatMessage],
+    ) -> Optional[str]:
+        """Return a still-valid cached answer for this question, if any"""
+        if not self.enabled:
+            return None
+
+        self.counters["lookups"] += 1
+        normalized = normalize_message(message)
+        key = self._key(user_id, history, normalized)
+
+        entry = self._entries.get(key + (normalized,))
+        kind = "exact_hits"
+        if entry is None:
+            entry = self._find_similar(key, normalized)
+            kind = "near_hits"
+
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+
+        if entry.expires_at <= time.monotonic() or not await self._is_fresh(entry):
+            self._remove(entry.key)
+            self.counters["invalidations"] += 1
+            self.counters["misses"] += 1
+            return None
+
+        self._entries.move_to_end(entry.key)
+        self.counters[kind] += 1
+        return entry.answer
+
+    def _find_similar(self, key: Tuple, normalized: str) -> Optional[AnswerEntry]:
+        signature = self.hasher.signature(normalized)
+        candidates = set()
+        for band in self.hasher.band_keys(signature):
+            candidates |= self._buckets.get(key + band, set())
+
+        best, best_score = None, self.similarity_threshold
+        for entry_key in candidates:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                continue
+            score = MinHasher.similarity(signature, entry.signature)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    async def _is_fresh(self, entry: AnswerEntry) -> bool:
+        """Replay the answer's tool calls and compare result fingerprints"""
+        for dep in entry.dependencies:
+            tool = self.tools.get(dep.name)
+            if tool is None:
+                return False
+            try:
+                result = await tool(**dep.arguments)
+            except Exception as e:
+                result = e
+            if fingerprint(result) != dep.fingerprint:
+                return False
+        return True
+
+    def store(
+        self,
+        user_id: str,
+        message: str,
+        history: Sequence[ChatMessage],
+        answer: str,
+        dependencies: List[ToolDependency],
+    ) -> None:
+        """Cache an answer built from tool data, unless one of its calls failed
+
+        Answers without tool calls are not cached: nothing would tell when
+        they go stale, and they are mostly replies to the conversation itself.
+        """
+        if (
+            not self.enabled
+            or not dependencies
+            or not all(dep.cacheable for dep in dependencies)
+        ):
+            return
+
+        normalized = normalize_message(message)
+        key = self._key(user_id, history, normalized) + (normalized,)
+        if key in self._entries:
+            self._remove(key)
+
+        entry = AnswerEntry(
+            key=key,
+            normalized=normalized,
+            signature=self.hasher.signature(normalized),
+            answer=answer,
+            dependencies=dependencies,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        self._entries[key] = entry
+        for band in self.hasher.band_keys(entry.signature):
+            self._buckets.setdefault(key[:-1] + band, set()).add(key)
+        self.counters["stores"] += 1
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.counters["evictions"] += 1
+
+    def _remove(self, key: Tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in self.hasher.band_keys(entry.signature):
+            bucket_key = key[:-1] + band
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[bucket_key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["lookups"]
+        hits = self.counters["exact_hits"] + self.counters["near_hits"]
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            **self.counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
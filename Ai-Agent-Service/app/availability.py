@@ -0,0 +1,164 @@
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from models import PortSchedule
+
+HOURS = 24
+# Free capacity of an hour nothing is known about
+UNKNOWN = -1
+
+
+def parse_hour(value: Optional[str], name: str = "hour") -> Optional[int]:
+    """An hour as 0-23; "9", "09" and "09:00" are all accepted"""
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        hour = int(str(value).split(":", 1)[0])
+    except ValueError:
+        hour = -1
+    if not 0 <= hour < HOURS:
+        raise ValueError(f"{name} must be an hour from 00 to 23, HH")
+    return hour
+
+
+class AvailabilityIndex:
+    """Free capacity per date and hour, kept up to date from fetched schedules
+
+    Each known date is a row of 24 hourly cells in a NumPy matrix, so
+    "next free slot" style questions over a range of dates are answered with
+    a few array operations instead of walking the schedules. Rows are
+    refreshed whenever get_port_schedule fetches a date from the backend;
+    when `max_dates` rows are in use the least recently updated one is reused.
+    """
+
+    def __init__(self, max_dates: int = 400):
+        self.max_dates = max_dates
+        self.capacity = np.zeros((0, HOURS), dtype=np.int32)
+        self.booked = np.zeros((0, HOURS), dtype=np.int32)
+        self.updated = np.zeros(0, dtype=np.float64)
+        self._rows: Dict[str, int] = {}
+        self.counters = {"updates": 0, "queries": 0, "evictions": 0}
+
+    # Updates ----------------------------------------------------------------
+
+    def update(self, schedule: PortSchedule) -> None:
+        """Replace a date's row with a freshly fetched schedule
+
+        Slots whose start hour does not parse are left out.
+        """
+        row = self._row(schedule.date)
+        self.capacity[row] = 0
+        self.booked[row] = 0
+        for slot in schedule.schedule:
+            try:
+                hour = parse_hour(slot.hour_start)
+            except ValueError:
+                continue
+            if hour is not None:
+                self.capacity[row, hour] = slot.max_capacity
+                self.booked[row, hour] = slot.booked_capacity
+        self.updated[row] = time.monotonic()
+        self.counters["updates"] += 1
+
+    def _row(self, date: str) -> int:
+        if date in self._rows:
+            return self._rows[date]
+
+        if len(self._rows) < self.max_dates:
+            row = len(self._rows)
+            if row == len(self.updated):
+                self._grow()
+        else:
+            row = int(np.argmin(self.updated))
+            evicted = next(d for d, r in self._rows.items() if r == row)
+            del self._rows[evicted]
+            self.counters["evictions"] += 1
+
+        self._rows[date] = row
+        return row
+
+    def _grow(self) -> None:
+        size = min(max(2 * len(self.updated), 32), self.max_dates)
+        extra = size - len(self.updated)
+        self.capacity = np.vstack([self.capacity, np.zeros((extra, HOURS), np.int32)])
+        self.booked = np.vstack([self.booked, np.zeros((extra, HOURS), np.int32)])
+        self.updated = np.concatenate([self.updated, np.zeros(extra)])
+
+    def missing(self, dates: List[str], max_age: float) -> List[str]:
+        """The dates with no row, or a row older than max_age seconds"""
+        now = time.monotonic()
+        return [
+            d
+            for d in dates
+            if d not in self._rows or now - self.updated[self._rows[d]] > max_age
+        ]
+
+    # Queries ----------------------------------------------------------------
+
+    def free(self, dates: List[str]) -> np.ndarray:
+        """Free capacity as a dates x hours matrix; UNKNOWN for unknown dates"""
+        rows = np.array([self._rows.get(d, -1) for d in dates], dtype=np.intp)
+        known = rows >= 0
+        free = np.full((len(dates), HOURS), UNKNOWN, dtype=np.int32)
+        free[known] = np.maximum(
+            self.capacity[rows[known]] - self.booked[rows[known]], 0
+        )
+        return free
+
+    def windows(
+        self,
+        dates: List[str],
+        hours: int = 1,
+        hour_from: int = 0,
+        hour_to: int = HOURS - 1,
+    ) -> np.ndarray:
+        """Lowest free capacity over every run of `hours` consecutive hours
+
+        Element [d, h] covers hours h .. h + hours - 1 of dates[d]; runs that
+        leave the hour_from..hour_to window or touch unknown hours are UNKNOWN.
+        """
+        self.counters["queries"] += 1
+        free = self.free(dates)
+        free[:, :hour_from] = UNKNOWN
+        free[:, hour_to + 1 :] = UNKNOWN
+        if hours > HOURS:
+            return np.full((len(dates), 0), UNKNOWN, dtype=np.int32)
+        runs = np.lib.stride_tricks.sliding_window_view(free, hours, axis=1)
+        return runs.min(axis=2)
+
+    @staticmethod
+    def next_available(windows: np.ndarray, trucks: int) -> Optional[tuple]:
+        """(date index, hour) of the earliest run with room for `trucks`"""
+        fits = (windows >= trucks).ravel()
+        if not fits.any():
+            return None
+        return divmod(int(np.argmax(fits)), windows.shape[1])
+
+    @staticmethod
+    def best_window(windows: np.ndarray, trucks: int) -> Optional[tuple]:
+        """(date index, hour) of the run with the most room, earliest on ties"""
+        if windows.size == 0 or windows.max() < max(trucks, 1):
+            return None
+        return divmod(int(np.argmax(windows)), windows.shape[1])
+
+    def fill_level(self, dates: List[str]) -> List[Optional[float]]:
+        """Share of each date's capacity that is booked; None if unknown or closed"""
+        rows = np.array([self._rows.get(d, -1) for d in dates], dtype=np.intp)
+        known = rows >= 0
+        capacity = np.zeros(len(dates), dtype=np.int64)
+        booked = np.zeros(len(dates), dtype=np.int64)
+        capacity[known] = self.capacity[rows[known]].sum(axis=1)
+        booked[known] = self.booked[rows[known]].sum(axis=1)
+        return [
+            round(float(b) / c, 3) if c > 0 else None
+            for b, c in zip(booked.tolist(), capacity.tolist())
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dates": len(self._rows),
+            "max_dates": self.max_dates,
+            **self.counters,
+        }
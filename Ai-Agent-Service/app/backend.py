@@ -0,0 +1,121 @@
+import httpx
+from typing import Any, Dict, Optional
+from config import Settings, get_settings
+from tracing import tracer
+
+
+class BackendClient:
+    """Application-scoped, pooled HTTP client for the Laravel backend
+
+    A single httpx.AsyncClient is shared by every tool call so connections
+    (and TLS sessions) are kept alive and reused instead of being
+    re-established for each request. HTTP/2 is negotiated when the backend
+    supports it (over TLS via ALPN), letting concurrent tool calls multiplex
+    over one connection.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or get_settings()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport: Optional[httpx.AsyncBaseTransport] = None
+
+        self.requests_total = 0
+        self.errors_total = 0
+        self.in_flight = 0
+
+    async def start(self, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        """Open the shared client (called from the FastAPI lifespan)
+
+        A transport can be given to route calls elsewhere, e.g. to an
+        in-process mock backend in tests and load tests.
+        """
+        if self._client is not None:
+            return
+
+        limits = httpx.Limits(
+            max_connections=self.settings.backend_max_connections,
+            max_keepalive_connections=self.settings.backend_max_keepalive_connections,
+            keepalive_expiry=self.settings.backend_keepalive_expiry,
+        )
+        timeout = httpx.Timeout(
+            connect=self.settings.backend_connect_timeout,
+            read=self.settings.backend_read_timeout,
+            write=self.settings.backend_write_timeout,
+            pool=self.settings.backend_pool_timeout,
+        )
+
+        self._transport = transport or httpx.AsyncHTTPTransport(
+            http2=self.settings.backend_http2,
+            limits=limits,
+        )
+        self._client = httpx.AsyncClient(
+            base_url=self.settings.api_base_url,
+            headers={
+                "Authorization": f"Bearer {self.settings.api_service_token}",
+                "Content-Type": "application/json",
+            },
+            timeout=timeout,
+            transport=self._transport,
+        )
+
+    async def close(self) -> None:
+        """Close the shared client and release pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._transport = None
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """Send a request to the backend through the shared pool"""
+        if self._client is None:
+            # Allows tools to be used outside the app lifespan (scripts, tests)
+            await self.start()
+
+        self.requests_total += 1
+        self.in_flight += 1
+        try:
+            with tracer.span(
+                f"HTTP {method}",
+                kind="client",
+                **{"http.request.method": method, "url.path": path},
+            ) as span:
+                # Lets the backend continue the trace from this span
+                kwargs["headers"] = {**tracer.headers(), **kwargs.get("headers", {})}
+                response = await self._client.request(method, path, **kwargs)
+                span.set(**{"http.response.status_code": response.status_code})
+                return response
+        except httpx.HTTPError:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def get(self, path: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return connection pool statistics"""
+        connections = []
+        if self._transport is not None:
+            # httpx does not expose its pool publicly; httpcore's is stable
+            pool = getattr(self._transport, "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+
+        return {
+            "started": self._client is not None,
+            "http2_enabled": self.settings.backend_http2,
+            "max_connections": self.settings.backend_max_connections,
+            "max_keepalive_connections": self.settings.backend_max_keepalive_connections,
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "http2_connections": sum(1 for c in connections if "HTTP/2" in c.info()),
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "in_flight": self.in_flight,
+        }
+
+
+backend = BackendClient()
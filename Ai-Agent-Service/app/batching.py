@@ -0,0 +1,98 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+
+class BatchLoader:
+    """DataLoader-style batching of individual tool calls
+
+    Loads requested within `window` seconds of each other are collected and
+    resolved with a single call to `batch_fn`, which receives the distinct
+    keys and returns a dict of key -> result (or an exception for that key).
+    A batch is sent early once it reaches `max_batch` keys.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        window: float = 0.005,
+        max_batch: int = 50,
+    ):
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.keys = 0
+        self.largest_batch = 0
+
+    async def load(self, key: Hashable) -> Any:
+        """Resolve one key as part of the next batch"""
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            # Nobody may be left to see a failure if the caller was cancelled
+            future.add_done_callback(_consume_exception)
+            self._pending[key] = future
+
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._dispatch)
+
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+
+        self.batches += 1
+        self.keys += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in batch.items():
+            if future.done():
+                continue
+            result = results.get(
+                key, KeyError(f"Batch response has no result for {key}")
+            )
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "keys": self.keys,
+            "mean_batch_size": (
+                round(self.keys / self.batches, 2) if self.batches else 0.0
+            ),
+            "largest_batch": self.largest_batch,
+        }
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
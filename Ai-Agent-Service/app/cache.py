@@ -0,0 +1,224 @@
+import functools
+import inspect
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+from pydantic import BaseModel
+
+
+class CachePolicy(BaseModel):
+    """Caching rules for a single tool"""
+
+    ttl: float
+    # Seconds to remember "not found" answers, 0 disables negative caching
+    negative_ttl: float = 0.0
+    negative_statuses: Tuple[int, ...] = (404,)
+    # Argument holding the user id; entries are scoped (and invalidated) per user
+    user_arg: Optional[str] = None
+
+
+class CacheEntry(BaseModel):
+    value: Any = None
+    error: Optional[BaseException] = None
+    expires_at: float
+    size: int
+
+    model_config = {"arbitrary_types_allowed": True}
+
+
+class CacheBackend(ABC):
+    """Storage interface for cached tool results"""
+
+    @abstractmethod
+    async def get(self, key: Tuple) -> Optional[CacheEntry]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: Tuple, entry: CacheEntry) -> None:
+        pass
+
+    @abstractmethod
+    async def delete_where(self, predicate: Callable[[Tuple], bool]) -> int:
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        pass
+
+
+class LRUCacheBackend(CacheBackend):
+    """In-process LRU store bounded by entry count and approximate bytes"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    async def get(self, key: Tuple) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: Tuple, entry: CacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def delete_where(self, predicate: Callable[[Tuple], bool]) -> int:
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def _remove(self, key: Tuple) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+def _status_error(error: httpx.HTTPStatusError) -> httpx.HTTPStatusError:
+    """A new error for the same response, with no traceback attached
+
+    The cached error is never raised itself: every raise would add the
+    raising request's frames to its traceback, which the entry then keeps.
+    """
+    return httpx.HTTPStatusError(
+        str(error), request=error.request, response=error.response
+    )
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate the memory footprint of a tool result in bytes"""
+    if isinstance(value, BaseModel):
+        return len(value.model_dump_json())
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_size(item) for item in value) + 8 * len(value)
+    return len(repr(value))
+
+
+class ToolCache:
+    """Async read-through cache placed in front of the tool functions"""
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        policies: Dict[str, CachePolicy],
+        enabled: bool = True,
+    ):
+        self.backend = backend
+        self.policies = policies
+        self.enabled = enabled
+        self.counters: Dict[str, Dict[str, int]] = {
+            name: {"hits": 0, "misses": 0, "negative_hits": 0} for name in policies
+        }
+
+    def cached(self, name: str):
+        """Decorate an async tool function with the policy registered as `name`"""
+
+        def decorator(func: Callable[..., Awaitable[Any]]):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                policy = self.policies.get(name)
+                if not self.enabled or policy is None:
+                    return await func(*args, **kwargs)
+
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = self._make_key(name, policy, bound.arguments)
+                counters = self.counters[name]
+
+                entry = await self.backend.get(key)
+                if entry is not None:
+                    if entry.error is not None:
+                        counters["negative_hits"] += 1
+                        raise _status_error(entry.error)
+                    counters["hits"] += 1
+                    return entry.value
+
+                counters["misses"] += 1
+                try:
+                    value = await func(*args, **kwargs)
+                except httpx.HTTPStatusError as e:
+                    if (
+                        policy.negative_ttl > 0
+                        and e.response.status_code in policy.negative_statuses
+                    ):
+                        await self.backend.set(
+                            key,
+                            CacheEntry(
+                                error=_status_error(e),
+                                expires_at=time.monotonic() + policy.negative_ttl,
+                                size=len(str(e)),
+                            ),
+                        )
+                    raise
+
+                await self.backend.set(
+                    key,
+                    CacheEntry(
+                        value=value,
+                        expires_at=time.monotonic() + policy.ttl,
+                        size=_estimate_size(value),
+                    ),
+                )
+                return value
+
+            return wrapper
+
+        return decorator
+
+    @staticmethod
+    def _make_key(name: str, policy: CachePolicy, arguments: Dict[str, Any]) -> Tuple:
+        user = str(arguments.get(policy.user_arg)) if policy.user_arg else None
+        args = tuple(sorted((k, str(v)) for k, v in arguments.items()))
+        return (name, user, args)
+
+    async def invalidate(
+        self, name: Optional[str] = None, user_id: Optional[str] = None
+    ) -> int:
+        """Drop cached entries for a tool and/or a user"""
+
+        def matches(key: Tuple) -> bool:
+            return (name is None or key[0] == name) and (
+                user_id is None or key[1] == str(user_id)
+            )
+
+        return await self.backend.delete_where(matches)
+
+    def stats(self) -> Dict[str, Any]:
+        tools: Dict[str, Dict[str, Any]] = {}
+        for name, counters in self.counters.items():
+            lookups = sum(counters.values())
+            hits = counters["hits"] + counters["negative_hits"]
+            tools[name] = {
+                **counters,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            }
+        return {"enabled": self.enabled, "tools": tools, **self.backend.stats()}
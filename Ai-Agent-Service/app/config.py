@@ -1,17 +1,152 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict
 
 
 class Settings(BaseSettings):
     api_base_url: str
     api_service_token: str
 
-    ai_provider: str = "gemini"  # gemini or llama
+    ai_provider: str = "gemini"  # gemini, llama or composite
+
+    # Composite provider: providers in order of preference, hedging and failover
+    composite_providers: str = "gemini,llama"
+    hedge_percentile: float = 0.95
+    hedge_initial_delay: float = 8.0
+    hedge_min_delay: float = 1.0
+    hedge_max_delay: float = 15.0
+    hedge_min_samples: int = 20
+    provider_failure_threshold: int = 3
+    provider_cooldown: float = 30.0
 
     gemini_api_key: str = ""
+    # Cache the system prompt and tool declarations provider-side
+    gemini_prompt_cache_enabled: bool = True
+    gemini_prompt_cache_ttl: int = 3600
+    # Smallest prefix (estimated tokens) the model accepts for caching
+    gemini_prompt_cache_min_tokens: int = 4096
 
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "llama2"
+    # Concurrent model calls; match the Ollama server's OLLAMA_NUM_PARALLEL
+    ollama_max_concurrency: int = 4
+    ollama_timeout: float = 120.0
+
+    # Agent tool loop: function-call rounds per request and wall-clock budget (s)
+    agent_max_tool_rounds: int = 4
+    agent_time_budget: float = 20.0
+
+    # Admission of LLM work: concurrency, priority per role (lower first),
+    # queue bound and longest wait (s) per role; unknown roles use the default
+    admission_enabled: bool = True
+    admission_max_concurrency: int = 16
+    admission_priorities: Dict[str, int] = {"operator": 0, "admin": 1, "carrier": 2}
+    admission_max_queue: Dict[str, int] = {"operator": 32, "admin": 32, "carrier": 128}
+    admission_max_wait: Dict[str, float] = {
+        "operator": 20.0,
+        "admin": 15.0,
+        "carrier": 8.0,
+    }
+    admission_default_class: str = "carrier"
+
+    # Deterministic fast path for simple questions, answered without the LLM
+    intent_router_enabled: bool = True
+    booking_id_pattern: str = r"\bBK\d+\b"
+
+    # Answer cache: reuse answers to repeated questions while their data is unchanged
+    answer_cache_enabled: bool = True
+    answer_cache_ttl: float = 300.0
+    answer_cache_max_entries: int = 2048
+    answer_cache_similarity: float = 0.8
+
+    # Parsed chat histories kept between turns, so each turn only parses the
+    # new messages; a tail above 0 parses only that many of the last ones,
+    # leaving older turns out of the context summary
+    history_cache_enabled: bool = True
+    history_cache_max_chats: int = 256
+    history_tail_messages: int = 0
+
+    # Conversation context sent to the model (estimated tokens)
+    context_max_tokens: int = 2000
+    context_message_max_tokens: int = 500
+    context_summary_max_tokens: int = 300
+
+    # Backend HTTP client pool
+    backend_http2: bool = True
+    backend_max_connections: int = 100
+    backend_max_keepalive_connections: int = 20
+    backend_keepalive_expiry: float = 30.0
+    backend_connect_timeout: float = 5.0
+    backend_read_timeout: float = 10.0
+    backend_write_timeout: float = 10.0
+    backend_pool_timeout: float = 5.0
+
+    # Tool result cache (TTLs in seconds)
+    tool_cache_enabled: bool = True
+    tool_cache_max_entries: int = 1024
+    tool_cache_max_bytes: int = 8 * 1024 * 1024
+    port_schedule_cache_ttl: float = 30.0
+    booking_status_cache_ttl: float = 15.0
+    booking_status_negative_ttl: float = 60.0
+    user_bookings_cache_ttl: float = 15.0
+
+    # Coalesce identical concurrent tool calls into one backend request
+    tool_single_flight_enabled: bool = True
+
+    # Longest date range get_port_schedule_range will fetch, in days
+    schedule_range_max_days: int = 31
+
+    # Dates kept in the in-memory availability index
+    availability_max_dates: int = 400
+
+    # Batch calls made within a short window into bulk backend requests;
+    # needs the bulk tool endpoints (see test/mock/mock_api.py)
+    tool_batching_enabled: bool = False
+    tool_batch_window_ms: float = 5.0
+    tool_batch_max_size: int = 50
+
+    # Request tracing: head-sampled share of traces, and traces kept whatever
+    # the sampling when slower than the threshold (s, 0 = off) or failed
+    tracing_enabled: bool = False
+    tracing_sample_rate: float = 0.1
+    tracing_slow_threshold: float = 5.0
+    tracing_max_spans: int = 512
+    tracing_export_path: str = "traces.jsonl"
+
+    # Token for the /api/ai/admin endpoints, sent as X-Admin-Token; they
+    # are disabled while it is empty
+    admin_token: str = ""
+
+    # Sampling profiler armed through /api/ai/admin/profile
+    profile_interval_ms: float = 5.0
+    profile_max_overhead: float = 0.05
+    profile_max_requests: int = 100
+    profile_max_seconds: float = 120.0
+    profile_output_path: str = "profile.folded"
+
+    # Memory tracing started through /api/ai/admin/memory
+    memory_trace_frames: int = 5
+    memory_max_snapshots: int = 5
+    memory_trace_max_seconds: float = 900.0
+
+    # Event loop lag is sampled every interval; in debug mode the stack of a
+    # callback holding the loop past the threshold is captured
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_ms: float = 500.0
+    loop_block_threshold_ms: float = 100.0
+    loop_monitor_debug: bool = False
+    loop_monitor_max_stacks: int = 20
+
+    # Circuit breakers per tool and an AIMD concurrency limit on backend calls
+    resilience_enabled: bool = True
+    circuit_failure_rate: float = 0.5
+    circuit_window: int = 20
+    circuit_min_calls: int = 5
+    circuit_reset_timeout: float = 15.0
+    tool_concurrency_initial: int = 20
+    tool_concurrency_min: int = 2
+    tool_concurrency_max: int = 100
+    tool_latency_threshold: float = 2.0
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,123 @@
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from models import ChatMessage
+
+# Rough average for English text with the Gemini / Llama tokenizers
+CHARS_PER_TOKEN = 4
+# Role markers and separators added around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, marking the cut"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[: max_chars - 15].rstrip() + " [...truncated]"
+
+
+def summarize_turns(messages: List[ChatMessage]) -> List[str]:
+    """Extractive summary: the first sentence of each turn, one line per turn"""
+    lines = []
+    for msg in messages:
+        speaker = "User" if msg.sender == "human" else "Assistant"
+        first_sentence = _SENTENCE_END.split(msg.message.strip(), maxsplit=1)[0]
+        lines.append(f"{speaker}: {truncate_to_tokens(first_sentence, 40)}")
+    return lines
+
+
+class ConversationContext(BaseModel):
+    """What the agent sends of the conversation"""
+
+    summary: Optional[str] = None
+    messages: List[ChatMessage]
+
+
+class ContextBuilder:
+    """Packs the most recent turns into a token budget
+
+    Turns that no longer fit are folded into a rolling summary. The summary is
+    cached per chat (identified by its first message) together with how many
+    turns it covers, so each turn only summarizes the messages that newly fell
+    out of the window.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 2000,
+        message_max_tokens: int = 500,
+        summary_max_tokens: int = 300,
+        cache_size: int = 1024,
+        summarizer: Callable[[List[ChatMessage]], List[str]] = summarize_turns,
+    ):
+        self.max_tokens = max_tokens
+        self.message_max_tokens = message_max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.cache_size = cache_size
+        self.summarizer = summarizer
+        # chat key -> (number of turns summarized, summary lines)
+        self._summaries: "OrderedDict[str, Tuple[int, List[str]]]" = OrderedDict()
+
+    def build(self, chat_history: List[ChatMessage]) -> ConversationContext:
+        """Select the recent turns that fit the budget and summarize the rest"""
+        budget = self.max_tokens
+        recent: List[ChatMessage] = []
+
+        for msg in reversed(chat_history):
+            text = truncate_to_tokens(msg.message, self.message_max_tokens)
+            cost = estimate_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+            if cost > budget:
+                break
+            budget -= cost
+            if text is not msg.message:
+                msg = msg.model_copy(update={"message": text})
+            recent.append(msg)
+
+        recent.reverse()
+        older = chat_history[: len(chat_history) - len(recent)]
+
+        return ConversationContext(summary=self._summary(older), messages=recent)
+
+    def _summary(self, older: List[ChatMessage]) -> Optional[str]:
+        if not older:
+            return None
+
+        key = self._chat_key(older[0])
+        covered, lines = self._summaries.get(key, (0, []))
+        if covered > len(older):
+            # History was edited or the window grew; start over
+            covered, lines = 0, []
+
+        if covered < len(older):
+            lines = lines + self.summarizer(older[covered:])
+
+        # Keep the newest summary lines within the summary budget
+        while lines and estimate_tokens("\n".join(lines)) > self.summary_max_tokens:
+            lines = lines[1:]
+
+        self._summaries[key] = (len(older), lines)
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > self.cache_size:
+            self._summaries.popitem(last=False)
+
+        return "\n".join(lines) if lines else None
+
+    @staticmethod
+    def _chat_key(first: ChatMessage) -> str:
+        identity = f"{first.created_at}|{first.sender}|{first.message}"
+        return hashlib.blake2b(identity.encode(), digest_size=12).hexdigest()
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached_summaries": len(self._summaries)}
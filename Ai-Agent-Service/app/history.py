@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+from pydantic_core import from_json
+
+from models import ChatMessage
+
+# Built once; validates straight from the response bytes without json.loads
+MESSAGES = TypeAdapter(List[ChatMessage])
+
+
+class HistoryParser:
+    """Parses chat histories from raw response bytes, reusing earlier turns
+
+    The backend returns a chat's whole history on every turn, and a turn only
+    appends to it. The last body and its parsed messages are kept per chat;
+    when a new body starts with the previous one, only the appended messages
+    are validated. Comparing the bytes is a memcmp, far cheaper than building
+    the models again. Any other change parses the body in full.
+
+    With `tail`, a full parse decodes the JSON but validates only the last
+    `tail` messages into models; such partial results are not kept.
+    """
+
+    def __init__(self, max_chats: int = 256, enabled: bool = True):
+        self.max_chats = max_chats
+        self.enabled = enabled
+        # chat id -> (response body, messages parsed from it)
+        self._chats: "OrderedDict[str, Tuple[bytes, List[ChatMessage]]]" = OrderedDict()
+        self.counters = {"unchanged": 0, "incremental": 0, "full": 0, "tail": 0}
+
+    def parse(
+        self, chat_id: str, body: bytes, tail: Optional[int] = None
+    ) -> Tuple[List[ChatMessage], str]:
+        """The chat's messages (the last `tail` only, if set) and how they were parsed"""
+        messages, mode = self._reuse(chat_id, body) if self.enabled else (None, "")
+
+        if messages is None:
+            if tail:
+                mode = "tail"
+                messages = MESSAGES.validate_python(from_json(body)[-tail:])
+            else:
+                mode = "full"
+                messages = MESSAGES.validate_json(body)
+                self._store(chat_id, body, messages)
+
+        self.counters[mode] += 1
+        # A copy, so callers may trim it without touching the kept list
+        return (messages[-tail:] if tail else list(messages)), mode
+
+    def _reuse(
+        self, chat_id: str, body: bytes
+    ) -> Tuple[Optional[List[ChatMessage]], str]:
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            return None, ""
+        previous, messages = entry
+
+        if body == previous:
+            self._chats.move_to_end(chat_id)
+            return messages, "unchanged"
+
+        # "[a,b]" grew into "[a,b,c,d]": validate "[c,d]" only
+        size = len(previous)
+        if (
+            messages
+            and len(body) > size
+            and body[size - 1 : size] == b","
+            and body.startswith(previous[:-1])
+        ):
+            messages = messages + MESSAGES.validate_json(b"[" + body[size:])
+            self._store(chat_id, body, messages)
+            return messages, "incremental"
+
+        return None, ""
+
+    def _store(self, chat_id: str, body: bytes, messages: List[ChatMessage]) -> None:
+        if not self.enabled:
+            return
+        self._chats[chat_id] = (body, messages)
+        self._chats.move_to_end(chat_id)
+        while len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "chats": len(self._chats),
+            "max_chats": self.max_chats,
+            **self.counters,
+        }
@@ -0,0 +1,46 @@
+import bisect
+from typing import Any, Dict, List, Optional
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (seconds) with percentile estimates"""
+
+    def __init__(self, low: float = 0.05, high: float = 120.0, factor: float = 1.2):
+        self.bounds: List[float] = []
+        bound = low
+        while bound < high:
+            self.bounds.append(bound)
+            bound *= factor
+        self.bounds.append(high)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile (0 < q <= 1)"""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return self.bounds[-1]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.total,
+            "mean_s": round(self.sum / self.total, 3) if self.total else None,
+            **{
+                f"p{int(q * 100)}_s": (
+                    round(p, 3) if (p := self.percentile(q)) is not None else None
+                )
+                for q in (0.5, 0.95, 0.99)
+            },
+        }
@@ -0,0 +1,21 @@
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Records are queued on the calling thread and written to stdout by a
+# listener thread, so logging under load never blocks the event loop on a
+# slow terminal or pipe
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+
+_stream = logging.StreamHandler(sys.stdout)
+_stream.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+listener = QueueListener(_queue, _stream)
+listener.start()
+atexit.register(listener.stop)
+
+logger = logging.getLogger("ai_agent")
+logger.setLevel(logging.INFO)
+logger.addHandler(QueueHandler(_queue))
+logger.propagate = False
@@ -0,0 +1,128 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from metrics import LOOP_BLOCKS, LOOP_LAG
+from profiling import fold_stack
+
+
+class LoopMonitor:
+    """Measures event loop lag and, in debug mode, catches what blocks it
+
+    A task sleeps for `interval` seconds over and over; how late it wakes up
+    is the time other callbacks held the loop, and is observed as the lag
+    histogram. Wake-ups later than `block_threshold` count as blocked.
+
+    In debug mode a watchdog thread also checks, every half threshold,
+    whether the task is overdue, and if so records the loop thread's stack
+    while the blocking callback is still running. One stack is kept per
+    block, the last `max_stacks` of them.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        block_threshold: float = 0.1,
+        debug: bool = False,
+        max_stacks: int = 20,
+    ):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.debug = debug
+        self.stacks: Deque[Dict[str, Any]] = deque(maxlen=max_stacks)
+
+        self.samples = 0
+        self.blocked = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+        # When the monitoring task should next wake up (monotonic)
+        self._deadline: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        """Start monitoring the running loop; must be called from it"""
+        if self._task is not None:
+            return
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if self.debug:
+            self._thread = threading.Thread(
+                target=self._watch,
+                args=(threading.get_ident(),),
+                name="loop-watchdog",
+                daemon=True,
+            )
+            self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self._deadline = None
+
+    async def _run(self) -> None:
+        while True:
+            self._deadline = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(time.monotonic() - self._deadline, 0.0))
+
+    def record(self, lag: float) -> None:
+        self.samples += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        LOOP_LAG.observe(lag)
+        if lag >= self.block_threshold:
+            self.blocked += 1
+            LOOP_BLOCKS.inc()
+
+    def _watch(self, target: int) -> None:
+        captured: Optional[float] = None
+        while not self._stopped.wait(self.block_threshold / 2):
+            deadline = self._deadline
+            if deadline is None or deadline == captured:
+                continue
+            overdue = time.monotonic() - deadline
+            if overdue < self.block_threshold:
+                continue
+
+            frame = sys._current_frames().get(target)
+            if frame is not None:
+                self.stacks.append(
+                    {
+                        "at": time.time(),
+                        "blocked_ms": round(overdue * 1000, 1),
+                        "stack": fold_stack(frame),
+                    }
+                )
+            del frame
+            captured = deadline
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "debug": self.debug,
+            "interval_ms": round(self.interval * 1000, 3),
+            "block_threshold_ms": round(self.block_threshold * 1000, 3),
+            "samples": self.samples,
+            "blocked": self.blocked,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stacks_captured": len(self.stacks),
+        }
@@ -1,15 +1,78 @@
-from fastapi import FastAPI, Depends, HTTPException
+import json
+import secrets
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-from agents.gemini_agent import GeminiAgent
-from tools import get_chat_messages
-from models import GenerateRequest, GenerateResponse, ChatMessage
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Any, AsyncIterator, Dict, List, Optional
+from admission import AdmissionController, AdmissionRejected, PriorityClass
+from agents.registry import ProviderRegistry
+from answer_cache import AnswerCache, recording
+from backend import backend
+from config import get_settings
+from log import logger
+from loop_monitor import LoopMonitor
+from metrics import (
+    CONTENT_TYPE,
+    ERRORS,
+    HISTORY_SECONDS,
+    REQUEST_SECONDS,
+    metrics,
+    observed,
+)
+from profiling import SamplingProfiler
+from router import IntentRouter
+from tracing import tracer
+from tools import (
+    TOOLS,
+    availability_index,
+    booking_status_loader,
+    get_chat_messages,
+    history_parser,
+    port_schedule_loader,
+    resilience,
+    single_flight,
+    tool_cache,
+)
+from memory import MemoryProfiler
+from models import (
+    ChatMessage,
+    GenerateRequest,
+    GenerateResponse,
+    MemorySnapshotRequest,
+    MemoryTraceRequest,
+    ProfileRequest,
+)
 from agents.base import AgentInterface
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown"""
+    global agent
+    started = time.perf_counter()
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+    await backend.start()
+    # The provider SDK is imported here rather than at module import time
+    agent = providers.create(settings.ai_provider)
+    startup_timings["startup_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info("AI Agent Service started: %s %s", providers.stats(), startup_timings)
+    yield
+    memory.stop()
+    await loop_monitor.stop()
+    await backend.close()
+    if tracer.exporter is not None:
+        tracer.exporter.shutdown()
+
+
 app = FastAPI(
     title="AI Agent Service",
     description="AI Agent service for port booking system",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -21,10 +84,121 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-agent = GeminiAgent()
+settings = get_settings()
+
+providers = ProviderRegistry()
+# Created in the lifespan hook for the configured provider
+agent: Optional[AgentInterface] = None
+startup_timings: Dict[str, float] = {}
 
 tools = []
 
+router = IntentRouter(
+    booking_id_pattern=settings.booking_id_pattern,
+    enabled=settings.intent_router_enabled,
+)
+
+# LLM work is admitted by role: gate operators first, then admins, then carriers
+admission = AdmissionController(
+    max_concurrency=settings.admission_max_concurrency,
+    classes=[
+        PriorityClass(
+            name=role,
+            priority=priority,
+            max_queue=settings.admission_max_queue.get(role, 64),
+            max_wait=settings.admission_max_wait.get(role, 10.0),
+        )
+        for role, priority in settings.admission_priorities.items()
+    ],
+    default_class=settings.admission_default_class,
+    enabled=settings.admission_enabled,
+)
+
+profiler = SamplingProfiler(
+    interval=settings.profile_interval_ms / 1000,
+    max_overhead=settings.profile_max_overhead,
+    max_seconds=settings.profile_max_seconds,
+    output_path=settings.profile_output_path,
+)
+
+memory = MemoryProfiler(
+    frames=settings.memory_trace_frames,
+    max_snapshots=settings.memory_max_snapshots,
+    max_seconds=settings.memory_trace_max_seconds,
+)
+
+loop_monitor = LoopMonitor(
+    interval=settings.loop_monitor_interval_ms / 1000,
+    block_threshold=settings.loop_block_threshold_ms / 1000,
+    debug=settings.loop_monitor_debug,
+    max_stacks=settings.loop_monitor_max_stacks,
+)
+
+answer_cache = AnswerCache(
+    tools=TOOLS,
+    enabled=settings.answer_cache_enabled,
+    ttl=settings.answer_cache_ttl,
+    max_entries=settings.answer_cache_max_entries,
+    similarity_threshold=settings.answer_cache_similarity,
+)
+
+
+def tool_cache_lookups():
+    for tool, counters in tool_cache.counters.items():
+        for result, count in counters.items():
+            yield (tool, result), count
+
+
+def answer_cache_lookups():
+    for result in ("exact_hits", "near_hits", "misses"):
+        yield (result,), answer_cache.counters[result]
+
+
+def admission_queue_depth():
+    for name, cls in admission.classes.items():
+        yield (name,), cls.queued
+
+
+def admission_wait():
+    for name, cls in admission.classes.items():
+        for q in (0.5, 0.95, 0.99):
+            p = cls.wait.percentile(q)
+            if p is not None:
+                yield (name, q), p
+        yield "_sum", (name,), cls.wait.sum
+        yield "_count", (name,), cls.wait.total
+
+
+# Hit counts and queue state are kept by their owners and read at scrape time
+metrics.collector(
+    "ai_tool_cache_lookups_total",
+    "Tool cache lookups by result",
+    "counter",
+    ["tool", "result"],
+    tool_cache_lookups,
+)
+metrics.collector(
+    "ai_answer_cache_lookups_total",
+    "Answer cache lookups by result",
+    "counter",
+    ["result"],
+    answer_cache_lookups,
+)
+metrics.collector(
+    "ai_admission_queue_depth",
+    "Requests waiting for an LLM slot, by priority class",
+    "gauge",
+    ["class"],
+    admission_queue_depth,
+)
+metrics.collector(
+    "ai_admission_wait_seconds",
+    "Time spent waiting for an LLM slot, by priority class",
+    "summary",
+    ["class", "quantile"],
+    admission_wait,
+)
+
 
 @app.get("/")
 async def root():
@@ -32,46 +206,394 @@ async def root():
     return {"status": "ok", "service": "AI Agent Service"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics for every stage of a chat turn"""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/api/ai/stats")
+async def stats():
+    """Runtime statistics for the service's shared resources"""
+    return {
+        "http_pool": backend.stats(),
+        "tool_cache": tool_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "resilience": resilience.stats(),
+        "availability_index": availability_index.stats(),
+        "history": history_parser.stats(),
+        "batching": {
+            "enabled": settings.tool_batching_enabled,
+            "get_booking_status": booking_status_loader.stats(),
+            "get_port_schedule": port_schedule_loader.stats(),
+        },
+        "intent_router": router.stats(),
+        "answer_cache": answer_cache.stats(),
+        "admission": admission.stats(),
+        "tracing": tracer.stats(),
+        "profiler": profiler.stats(),
+        "event_loop": loop_monitor.stats(),
+        "provider": {**providers.stats(), **startup_timings},
+        "agent": agent.stats() if agent is not None else {},
+    }
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Guard for the admin endpoints; they do not exist without ADMIN_TOKEN"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(
+        x_admin_token, settings.admin_token
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.post("/api/ai/admin/profile", dependencies=[Depends(require_admin)])
+async def start_profile(request: ProfileRequest):
+    """Profile the next N requests to /api/ai/generate and /api/chat
+
+    Stacks are sampled while those requests run and aggregated into folded
+    (flamegraph) format, written to PROFILE_OUTPUT_PATH when the session ends.
+    """
+    if request.requests > settings.profile_max_requests:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.profile_max_requests} requests can be profiled",
+        )
+    profiler.arm(request.requests)
+    return profiler.stats()
+
+
+@app.get("/api/ai/admin/profile", dependencies=[Depends(require_admin)])
+async def get_profile(format: str = "folded"):
+    """The current or last session's folded stacks, or its status as JSON"""
+    if profiler.session is None:
+        raise HTTPException(status_code=404, detail="No profile has been taken")
+    if format == "json":
+        return profiler.stats()
+    return PlainTextResponse(profiler.session.folded())
+
+
+@app.get("/api/ai/admin/loop", dependencies=[Depends(require_admin)])
+async def loop_status():
+    """Loop lag statistics and the stacks captured while the loop was blocked"""
+    return {**loop_monitor.stats(), "stacks": list(loop_monitor.stacks)}
+
+
+@app.get("/api/ai/admin/memory", dependencies=[Depends(require_admin)])
+async def memory_status():
+    """Tracing status, held snapshots and live object counts"""
+    return {**memory.stats(), "objects": memory.object_counts()}
+
+
+@app.post("/api/ai/admin/memory/start", dependencies=[Depends(require_admin)])
+async def start_memory_trace(request: MemoryTraceRequest):
+    """Start tracing allocations; it stops on its own after the duration"""
+    memory.start(frames=request.frames, duration=request.duration)
+    return memory.stats()
+
+
+@app.post("/api/ai/admin/memory/stop", dependencies=[Depends(require_admin)])
+async def stop_memory_trace():
+    memory.stop()
+    return memory.stats()
+
+
+@app.post("/api/ai/admin/memory/snapshot", dependencies=[Depends(require_admin)])
+async def take_memory_snapshot(request: MemorySnapshotRequest, limit: int = 20):
+    """Take a snapshot and report its top allocation sites"""
+    try:
+        snapshot = memory.snapshot(request.label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {**snapshot.summary(), "top": memory.top(snapshot.id, limit=limit)}
+
+
+@app.get("/api/ai/admin/memory/top", dependencies=[Depends(require_admin)])
+async def memory_top(
+    snapshot: Optional[int] = None, group_by: str = "lineno", limit: int = 20
+):
+    """Top allocation sites of a snapshot (the latest by default)"""
+    try:
+        return memory.top(snapshot, group_by=group_by, limit=limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        # Unknown group_by
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/api/ai/admin/memory/diff", dependencies=[Depends(require_admin)])
+async def memory_diff(
+    base: int,
+    target: Optional[int] = None,
+    group_by: str = "lineno",
+    limit: int = 20,
+):
+    """Allocation sites that grew the most from one snapshot to another"""
+    try:
+        return memory.diff(base, target, group_by=group_by, limit=limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        # Unknown group_by
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def resolve_chat_history(request: GenerateRequest) -> List[ChatMessage]:
+    """Use the inline history when provided, otherwise fetch it from the backend"""
+    if request.messages is not None:
+        chat_history = list(request.messages)
+    else:
+        try:
+            with tracer.span("history.fetch"), observed(HISTORY_SECONDS, "history"):
+                chat_history = await get_chat_messages(request.chat_id)
+        except Exception as e:
+            # If we can't get history, continue with empty history
+            logger.warning("Could not fetch chat history: %s", e)
+            return []
+
+    # The backend stores the current message before calling us; the agent
+    # appends it itself, so drop it from the history to avoid sending it twice
+    if (
+        chat_history
+        and chat_history[-1].sender == "human"
+        and chat_history[-1].message == request.message
+    ):
+        chat_history.pop()
+
+    return chat_history
+
+
+@app.post("/api/chat", response_model=GenerateResponse)
 @app.post("/api/ai/generate", response_model=GenerateResponse)
 async def generate(
     request: GenerateRequest,
+    traceparent: Optional[str] = Header(None),
 ):
     """
     Generate AI response for a user message
 
+    `/api/chat` is the contract used by the Laravel backend, which sends the
+    chat history inline in `messages`; `/api/ai/generate` fetches it instead.
+
     Args:
-        request: Contains chat_id and message
-        agent: Injected AI agent instance
-        tools_service: Injected tools service instance
+        request: Contains chat_id, message and optionally the chat history
 
     Returns:
         GenerateResponse with the AI's message
     """
-    try:
-        # Get chat history
-        chat_history: List[ChatMessage] = []
+    with profiler.request() as profiled, tracer.span(
+        "chat generate",
+        kind="server",
+        traceparent=traceparent,
+        **request_attributes(request),
+    ) as span, REQUEST_SECONDS.time(endpoint="generate", outcome="llm") as labels:
         try:
-            chat_history = await get_chat_messages(request.chat_id)
-        except Exception as e:
-            # If we can't get history, continue with empty history
-            print(f"Warning: Could not fetch chat history: {e}")
-
-        # Generate response
-        response_message = await agent.generate(
-            message=request.message,
-            chat_history=chat_history,
-            tools=tools,
-            user_id=request.user_id,
+            return await _generate(request, labels)
+        finally:
+            span.set(**{"chat.outcome": labels["outcome"], "chat.profiled": profiled})
+
+
+def request_attributes(request: GenerateRequest) -> Dict[str, Any]:
+    return {
+        "chat.id": request.chat_id,
+        "user.role": request.user_role or "",
+        "chat.inline_history": request.messages is not None,
+    }
+
+
+async def _generate(request: GenerateRequest, labels: Dict[str, str]):
+    try:
+        # Simple lookups are answered straight from the tools
+        with tracer.span("router.answer"):
+            routed_message = await router.answer(request.message, request.user_id)
+        if routed_message is not None:
+            labels["outcome"] = "routed"
+            return GenerateResponse(message=routed_message)
+
+        # Follow-ups are only cached after the same previous answer
+        chat_history = await resolve_chat_history(request)
+        with tracer.span("answer_cache.lookup"):
+            cached_message = await answer_cache.lookup(
+                request.user_id, request.message, chat_history
+            )
+        if cached_message is not None:
+            labels["outcome"] = "cached"
+            return GenerateResponse(message=cached_message)
+
+        with tracer.span("admission.acquire"):
+            ticket = await admission.acquire(request.user_role)
+        async with ticket:
+            # Generate response, recording the tool data it is built from
+            with recording() as dependencies, tracer.span("agent.generate"):
+                response_message = await agent.generate(
+                    message=request.message,
+                    chat_history=chat_history,
+                    tools=tools,
+                    user_id=request.user_id,
+                )
+
+        answer_cache.store(
+            request.user_id,
+            request.message,
+            chat_history,
+            response_message,
+            dependencies,
         )
 
         return GenerateResponse(message=response_message)
 
+    except AdmissionRejected as e:
+        labels["outcome"] = "rejected"
+        raise overloaded(e)
     except Exception as e:
+        labels["outcome"] = "error"
+        ERRORS.inc(stage="request")
         raise HTTPException(
             status_code=500, detail=f"Error generating response: {str(e)}"
         )
 
 
+def overloaded(e: AdmissionRejected) -> HTTPException:
+    """503 telling the client when to retry"""
+    return HTTPException(
+        status_code=503,
+        detail=f"The assistant is busy: {e.reason}",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def single_chunk(text: str) -> AsyncIterator[str]:
+    """Stream an already complete answer as one chunk"""
+    yield text
+
+
+@app.post("/api/ai/generate/stream")
+async def generate_stream(
+    request: GenerateRequest,
+    traceparent: Optional[str] = Header(None),
+):
+    """
+    Stream the AI response for a user message as Server-Sent Events
+
+    Emits `token` events carrying text chunks as the model produces them,
+    then a `done` event with the full message and timings (time to first
+    token and total, in milliseconds), or an `error` event on failure.
+    """
+    started = time.perf_counter()
+    outcome = "llm"
+    # Ended once the stream is done, not when this handler returns
+    root = tracer.start_span(
+        "chat stream",
+        kind="server",
+        traceparent=traceparent,
+        **request_attributes(request),
+    )
+
+    with tracer.use(root):
+        # Router or answer cache hits are streamed as a single chunk
+        chat_history: List[ChatMessage] = []
+        with tracer.span("router.answer"):
+            ready_message = await router.answer(request.message, request.user_id)
+        if ready_message is not None:
+            outcome = "routed"
+        else:
+            chat_history = await resolve_chat_history(request)
+            with tracer.span("answer_cache.lookup"):
+                ready_message = await answer_cache.lookup(
+                    request.user_id, request.message, chat_history
+                )
+            if ready_message is not None:
+                outcome = "cached"
+
+        # Admission happens before the response starts so overflow is a plain 503
+        ticket = None
+        if ready_message is None:
+            try:
+                with tracer.span("admission.acquire"):
+                    ticket = await admission.acquire(request.user_role)
+            except AdmissionRejected as e:
+                REQUEST_SECONDS.observe(
+                    time.perf_counter() - started,
+                    endpoint="stream",
+                    outcome="rejected",
+                )
+                root.set(**{"chat.outcome": "rejected"})
+                root.end()
+                raise overloaded(e)
+
+    def finish() -> None:
+        if ticket is not None:
+            ticket.release()
+        root.end()
+
+    async def events() -> AsyncIterator[str]:
+        nonlocal outcome
+        chunks: List[str] = []
+        ttft_ms = None
+        try:
+            with recording() as dependencies, tracer.use(root):
+                if ready_message is not None:
+                    stream = single_chunk(ready_message)
+                else:
+                    stream = agent.stream(
+                        message=request.message,
+                        chat_history=chat_history,
+                        tools=tools,
+                        user_id=request.user_id,
+                    )
+
+                async for text in stream:
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                    chunks.append(text)
+                    yield sse_event("token", {"text": text})
+
+            if ready_message is None:
+                answer_cache.store(
+                    request.user_id,
+                    request.message,
+                    chat_history,
+                    "".join(chunks),
+                    dependencies,
+                )
+
+            yield sse_event(
+                "done",
+                {
+                    "message": "".join(chunks),
+                    "ttft_ms": ttft_ms,
+                    "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                },
+            )
+
+        except Exception as e:
+            outcome = "error"
+            ERRORS.inc(stage="request")
+            root.record_exception(e)
+            yield sse_event("error", {"detail": f"Error generating response: {str(e)}"})
+        finally:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started, endpoint="stream", outcome=outcome
+            )
+            root.set(**{"chat.outcome": outcome})
+            finish()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also releases the slot if the body was never iterated
+        background=BackgroundTask(finish),
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
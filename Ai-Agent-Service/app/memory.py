@@ -0,0 +1,211 @@
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import models
+
+# The service's own types whose live instances are counted
+SERVICE_TYPES = (
+    models.ChatMessage,
+    models.Booking,
+    models.PortSchedule,
+    models.ScheduleSlot,
+    models.GenerateRequest,
+)
+# SDK types counted once their module has been imported by a provider
+SDK_TYPES = {
+    "google.genai.types": ("Content", "Part", "GenerateContentResponse"),
+    "ollama": ("Message", "ChatResponse"),
+}
+
+# Allocations made by the profiler itself are left out of the reports
+IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class Snapshot:
+    def __init__(self, id: int, label: str, snapshot: tracemalloc.Snapshot):
+        self.id = id
+        self.label = label
+        self.taken_at = time.time()
+        self.snapshot = snapshot.filter_traces(IGNORED)
+        stats = self.snapshot.statistics("filename")
+        self.size = sum(s.size for s in stats)
+        self.blocks = sum(s.count for s in stats)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "taken_at": self.taken_at,
+            "traced_kb": round(self.size / 1024, 1),
+            "blocks": self.blocks,
+        }
+
+
+def _site(stat) -> str:
+    frame = stat.traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots, diffs and live object counts, switched on at runtime
+
+    Tracing costs memory and CPU on every allocation, so it is off until
+    started and stops on its own after `max_seconds`; the number of stack
+    frames kept per allocation and of snapshots held are bounded too.
+    """
+
+    def __init__(
+        self,
+        frames: int = 5,
+        max_snapshots: int = 5,
+        max_seconds: float = 900.0,
+    ):
+        self.frames = frames
+        self.max_snapshots = max_snapshots
+        self.max_seconds = max_seconds
+        self.snapshots: Deque[Snapshot] = deque(maxlen=max_snapshots)
+        self._next_id = 1
+        self._started: Optional[float] = None
+        self._stop_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: Optional[int] = None, duration: Optional[float] = None):
+        """Start tracing allocations, stopping again after `duration` seconds
+
+        The frame limit is fixed while tracing, so asking for a different one
+        restarts tracing; allocations traced so far are forgotten, held
+        snapshots are kept.
+        """
+        if self.tracing and frames and frames != tracemalloc.get_traceback_limit():
+            tracemalloc.stop()
+        if not self.tracing:
+            tracemalloc.start(frames or self.frames)
+            self._started = time.monotonic()
+
+        duration = min(duration or self.max_seconds, self.max_seconds)
+        if self._stop_handle is not None:
+            self._stop_handle.cancel()
+        self._stop_handle = asyncio.get_running_loop().call_later(duration, self.stop)
+
+    def stop(self) -> None:
+        """Stop tracing; taken snapshots are kept for reports"""
+        if self._stop_handle is not None:
+            self._stop_handle.cancel()
+            self._stop_handle = None
+        if self.tracing:
+            tracemalloc.stop()
+        self._started = None
+
+    def snapshot(self, label: str = "") -> Snapshot:
+        if not self.tracing:
+            raise RuntimeError("Memory tracing is not running")
+        snapshot = Snapshot(self._next_id, label, tracemalloc.take_snapshot())
+        self._next_id += 1
+        self.snapshots.append(snapshot)
+        return snapshot
+
+    def get(self, id: Optional[int] = None) -> Snapshot:
+        """A held snapshot by id, or the latest one"""
+        if not self.snapshots:
+            raise KeyError("No snapshot has been taken")
+        if id is None:
+            return self.snapshots[-1]
+        for snapshot in self.snapshots:
+            if snapshot.id == id:
+                return snapshot
+        raise KeyError(
+            f"Snapshot {id} is not held (only the last {self.max_snapshots} are)"
+        )
+
+    def top(
+        self, id: Optional[int] = None, group_by: str = "lineno", limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """The allocation sites holding the most memory in a snapshot"""
+        snapshot = self.get(id).snapshot
+        # The frame limit tracing ran with when the snapshot was taken
+        frames = snapshot.traceback_limit
+        stats = snapshot.statistics(group_by)
+        return [
+            {
+                "site": _site(stat),
+                "size_kb": round(stat.size / 1024, 1),
+                "blocks": stat.count,
+                "traceback": stat.traceback.format(limit=frames),
+            }
+            for stat in stats[:limit]
+        ]
+
+    def diff(
+        self,
+        base: int,
+        target: Optional[int] = None,
+        group_by: str = "lineno",
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """The allocation sites that grew the most between two snapshots"""
+        older, newer = self.get(base), self.get(target)
+        stats = newer.snapshot.compare_to(older.snapshot, group_by)
+        return [
+            {
+                "site": _site(stat),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "blocks_diff": stat.count_diff,
+                "size_kb": round(stat.size / 1024, 1),
+            }
+            for stat in stats[:limit]
+        ]
+
+    @staticmethod
+    def object_counts() -> Dict[str, int]:
+        """Live instances of the service's own and the provider SDKs' types
+
+        Walks every object the garbage collector tracks, which blocks the
+        loop for a moment on a large heap; it is meant for admin use only.
+        """
+        tracked: Dict[type, str] = {t: t.__name__ for t in SERVICE_TYPES}
+        for module_name, names in SDK_TYPES.items():
+            module = sys.modules.get(module_name)
+            for name in names:
+                cls = getattr(module, name, None) if module else None
+                if isinstance(cls, type):
+                    tracked[cls] = f"{module_name}.{name}"
+
+        counts: Counter = Counter({label: 0 for label in tracked.values()})
+        for obj in gc.get_objects():
+            label = tracked.get(type(obj))
+            if label is not None:
+                counts[label] += 1
+        return dict(counts)
+
+    def stats(self) -> Dict[str, Any]:
+        traced: Tuple[int, int] = (
+            tracemalloc.get_traced_memory() if self.tracing else (0, 0)
+        )
+        return {
+            "tracing": self.tracing,
+            "frames": tracemalloc.get_traceback_limit() if self.tracing else 0,
+            "running_s": (
+                round(time.monotonic() - self._started, 1) if self._started else 0.0
+            ),
+            "traced_kb": round(traced[0] / 1024, 1),
+            "traced_peak_kb": round(traced[1] / 1024, 1),
+            "overhead_kb": (
+                round(tracemalloc.get_tracemalloc_memory() / 1024, 1)
+                if self.tracing
+                else 0.0
+            ),
+            "snapshots": [s.summary() for s in self.snapshots],
+        }
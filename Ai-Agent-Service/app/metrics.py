@@ -0,0 +1,327 @@
+import bisect
+import functools
+import math
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+)
+from tracing import tracer
+
+# Prometheus text exposition format, version 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a cached tool hit up to a slow multi-round LLM answer
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    40.0,
+    80.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {labels}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+    @abstractmethod
+    def _samples(self) -> Iterable[str]:
+        """The exposition lines of the metric's series"""
+        pass
+
+
+class Counter(Metric):
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterable[str]:
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket counts (last one is +Inf), sum
+        self.series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        if key not in self.series:
+            self.series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = self.series[key]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, **labels) -> int:
+        series = self.series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[Dict[str, Any]]:
+        """Observe the duration of the block
+
+        Labels may be changed through the yielded dict before the block ends,
+        e.g. to record its outcome.
+        """
+        labels = dict(labels)
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> Iterable[str]:
+        names = self.labels + ("le",)
+        for key, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {_format_value(total[0])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CollectedMetric(Metric):
+    """Samples read at scrape time from counters kept elsewhere
+
+    `collect` yields (label values, value) pairs, or (suffix, label values,
+    value) for the _sum and _count series of a summary; label values may
+    then be fewer than the labels.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labels: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]],
+    ):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self.collect = collect
+
+    def _samples(self) -> Iterable[str]:
+        for sample in self.collect():
+            suffix, key, value = sample if len(sample) == 3 else ("", *sample)
+            yield (
+                f"{self.name}{suffix}{_format_labels(self.labels, key)} "
+                f"{_format_value(value)}"
+            )
+
+
+class MetricsRegistry:
+    """The metrics exposed on /metrics"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def _add(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def collector(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labels: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]],
+    ) -> CollectedMetric:
+        return self._add(CollectedMetric(name, help, kind, labels, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram(
+    "ai_request_duration_seconds",
+    "Time to answer a chat request, end to end",
+    ["endpoint", "outcome"],
+)
+HISTORY_SECONDS = metrics.histogram(
+    "ai_history_fetch_duration_seconds",
+    "Time to fetch the chat history from the backend",
+    ["outcome"],
+)
+TOOL_SECONDS = metrics.histogram(
+    "ai_tool_duration_seconds",
+    "Time spent in a tool call, cache hits included",
+    ["tool", "outcome"],
+)
+LLM_SECONDS = metrics.histogram(
+    "ai_llm_call_duration_seconds",
+    "Time of one model call; for streams, until the last chunk",
+    ["provider", "call", "outcome"],
+)
+ERRORS = metrics.counter(
+    "ai_errors_total",
+    "Errors by the stage of the chat turn they happened in",
+    ["stage"],
+)
+FUNCTION_CALLS = metrics.counter(
+    "ai_function_calls_total",
+    "Tool calls requested by the model",
+    ["function"],
+)
+TOKENS = metrics.counter(
+    "ai_llm_tokens_total",
+    "Tokens reported in the provider's usage metadata",
+    ["provider", "direction"],
+)
+LOOP_LAG = metrics.histogram(
+    "ai_event_loop_lag_seconds",
+    "How late the event loop ran a timer; time other callbacks held it",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_BLOCKS = metrics.counter(
+    "ai_event_loop_blocked_total",
+    "Times the event loop was held longer than the blocking threshold",
+)
+
+
+def record_tokens(provider: str, prompt: Any, completion: Any) -> None:
+    """Count the prompt and completion tokens of one model call, when reported"""
+    if prompt:
+        TOKENS.inc(prompt, provider=provider, direction="in")
+    if completion:
+        TOKENS.inc(completion, provider=provider, direction="out")
+
+
+@contextmanager
+def observed(histogram: Histogram, stage: str, **labels) -> Iterator[None]:
+    """Time a block, labelling it with its outcome and counting failures as
+    errors of `stage`
+
+    Blocks left by cancellation or a closed generator, e.g. when the client
+    disconnects mid-stream, are recorded as "cancelled", not as errors.
+    """
+    with histogram.time(outcome="ok", **labels) as final:
+        try:
+            yield
+        except Exception:
+            final["outcome"] = "error"
+            ERRORS.inc(stage=stage)
+            raise
+        except BaseException:
+            final["outcome"] = "cancelled"
+            raise
+
+
+def instrumented(name: str):
+    """Decorate an async tool to record its latency and errors, in a span of
+    its own"""
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(f"tool {name}", **{"tool.name": name}):
+                with observed(TOOL_SECONDS, "tool", tool=name):
+                    return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,26 +1,49 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Literal
 from datetime import datetime
 
 
-class GenerateRequest(BaseModel):
-    user_id: str
-    chat_id: str
-    message: str
-
-
 class GenerateResponse(BaseModel):
     message: str
 
 
 class ChatMessage(BaseModel):
-    message_id: str
+    message_id: Optional[str] = None
     sender: Literal["human", "agent"]
     message: str
     index: int
     created_at: str
 
 
+class GenerateRequest(BaseModel):
+    # Laravel sends numeric user ids
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    user_id: str
+    chat_id: str
+    message: str
+    user_name: Optional[str] = None
+    user_role: Optional[str] = None
+    # Full chat history sent inline by the backend; fetched when absent
+    messages: Optional[List[ChatMessage]] = None
+
+
+class ProfileRequest(BaseModel):
+    # Number of upcoming /api/ai/generate requests to profile
+    requests: int = Field(default=10, ge=1)
+
+
+class MemoryTraceRequest(BaseModel):
+    # Stack frames kept per allocation; more frames cost more memory
+    frames: Optional[int] = Field(default=None, ge=1, le=50)
+    # Seconds until tracing stops on its own
+    duration: Optional[float] = Field(default=None, gt=0)
+
+
+class MemorySnapshotRequest(BaseModel):
+    label: str = ""
+
+
 class Timeslot(BaseModel):
     date: str
     hour_start: str
@@ -44,6 +67,41 @@ class PortSchedule(BaseModel):
     schedule: List[ScheduleSlot]
 
 
+class ScheduleGrid(BaseModel):
+    """Port schedule over a date range in columnar form
+
+    Each capacity list has one row per hour and one column per date, so
+    max_capacity[h][d] is the capacity at hours[h] on dates[d]; hours with no
+    slot on a date have a capacity of 0.
+    """
+
+    dates: List[str]
+    hours: List[str]
+    max_capacity: List[List[int]]
+    booked_capacity: List[List[int]]
+    late_capacity: List[List[int]]
+
+
+class AvailableSlot(BaseModel):
+    date: str
+    hour_start: str
+    hours: int
+    # Lowest free capacity over the hours of the slot
+    free_capacity: int
+
+
+class Availability(BaseModel):
+    """Availability answer for a date range"""
+
+    # Earliest slot with room for the requested trucks
+    next_available: Optional[AvailableSlot]
+    # Slot with the most free capacity
+    best_window: Optional[AvailableSlot]
+    dates: List[str]
+    # Booked share of each date's capacity (0-1), None when closed
+    fill_level: List[Optional[float]]
+
+
 # Tool request/response models
 class BookingStatusRequest(BaseModel):
     booking_id: str
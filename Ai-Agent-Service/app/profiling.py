@@ -0,0 +1,165 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def fold_stack(frame) -> str:
+    """Render a frame's stack root first, in the folded format flamegraph.pl reads"""
+    names: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class ProfileSession:
+    """Stacks aggregated over the next `requests` profiled requests"""
+
+    def __init__(self, requests: int, max_seconds: float, max_samples: int):
+        self.requests = requests
+        self.remaining = requests
+        self.max_seconds = max_seconds
+        self.max_samples = max_samples
+
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.active = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.stop_reason = ""
+        # Time the sampler spent taking samples, for the overhead cap
+        self.sampling_seconds = 0.0
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    def folded(self) -> str:
+        # Copied first: the sampler thread may still be adding stacks
+        stacks = dict(self.stacks)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return {
+            "requests": self.requests,
+            "remaining": self.remaining,
+            "active": self.active,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "elapsed_s": round(elapsed, 3),
+            "overhead": round(self.sampling_seconds / elapsed, 4) if elapsed else 0.0,
+            "finished": self.finished is not None,
+            "stop_reason": self.stop_reason,
+        }
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack while profiled requests run
+
+    Armed from the admin endpoint for the next N requests; a background
+    thread then reads the loop thread's current frame every `interval`
+    seconds while at least one of those requests is in flight, and counts
+    the folded stacks. Because the loop is shared, samples taken while a
+    profiled request is waiting show whatever else the loop was running.
+
+    Overhead is capped: the interval doubles whenever sampling costs more
+    than `max_overhead` of the elapsed time, and a session stops after
+    `max_seconds` or `max_samples` regardless of the requests left. The
+    sampler thread writes the folded stacks to `output_path` when the
+    session ends, so the loop never waits on it.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.005,
+        max_overhead: float = 0.05,
+        max_seconds: float = 120.0,
+        max_samples: int = 50_000,
+        output_path: Optional[str] = None,
+    ):
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.max_seconds = max_seconds
+        self.max_samples = max_samples
+        self.output_path = output_path
+        self.session: Optional[ProfileSession] = None
+
+    def arm(self, requests: int) -> ProfileSession:
+        """Profile the next `requests` requests, replacing any running session"""
+        if self.session is not None:
+            self.finish(self.session, "replaced")
+        self.session = ProfileSession(requests, self.max_seconds, self.max_samples)
+        return self.session
+
+    @contextmanager
+    def request(self) -> Iterator[bool]:
+        """Profile the enclosed request if a session still wants one
+
+        Must be entered from the event loop thread, which is the one sampled.
+        """
+        session = self.session
+        if session is None or session.finished is not None or session.remaining <= 0:
+            yield False
+            return
+
+        session.remaining -= 1
+        session.active += 1
+        if session.thread is None:
+            session.thread = threading.Thread(
+                target=self._sample_loop,
+                args=(session, threading.get_ident()),
+                name="sampling-profiler",
+                daemon=True,
+            )
+            session.thread.start()
+        try:
+            yield True
+        finally:
+            session.active -= 1
+            if session.remaining == 0 and session.active == 0:
+                self.finish(session, "completed")
+
+    @staticmethod
+    def finish(session: ProfileSession, reason: str) -> None:
+        if session.finished is None:
+            session.finished = time.monotonic()
+            session.stop_reason = reason
+            session.stopped.set()
+
+    def _sample_loop(self, session: ProfileSession, target: int) -> None:
+        interval = self.interval
+        began = time.monotonic()
+        while not session.stopped.wait(interval):
+            if session.active == 0:
+                continue
+
+            started = time.perf_counter()
+            frame = sys._current_frames().get(target)
+            if frame is not None:
+                session.stacks[fold_stack(frame)] += 1
+                session.samples += 1
+            del frame
+            session.sampling_seconds += time.perf_counter() - started
+
+            elapsed = time.monotonic() - began
+            if session.sampling_seconds > self.max_overhead * elapsed:
+                interval = min(interval * 2, 1.0)
+            if elapsed > session.max_seconds or session.samples >= session.max_samples:
+                self.finish(session, "limit")
+
+        if self.output_path:
+            with open(self.output_path, "w", encoding="utf-8") as f:
+                f.write(session.folded())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": round(self.interval * 1000, 3),
+            "max_overhead": self.max_overhead,
+            "session": self.session.stats() if self.session else None,
+        }
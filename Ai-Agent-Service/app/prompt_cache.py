@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from google.genai import types
+from context import estimate_tokens
+from log import logger
+
+
+class PromptCacheProvider(ABC):
+    """Creates and maintains provider-side cached content handles"""
+
+    @abstractmethod
+    async def create(
+        self,
+        model: str,
+        system_instruction: str,
+        tools: List[types.Tool],
+        ttl_seconds: int,
+    ) -> str:
+        """Cache the static prompt prefix and return its handle name"""
+        pass
+
+    @abstractmethod
+    async def refresh(self, name: str, ttl_seconds: int) -> None:
+        """Extend the lifetime of a cached content handle"""
+        pass
+
+    @abstractmethod
+    async def delete(self, name: str) -> None:
+        pass
+
+
+class GeminiPromptCacheProvider(PromptCacheProvider):
+    """Explicit context caching through the Gemini caches API"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def create(
+        self,
+        model: str,
+        system_instruction: str,
+        tools: List[types.Tool],
+        ttl_seconds: int,
+    ) -> str:
+        cached = await self.client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name="port-booking-agent-prefix",
+                system_instruction=system_instruction,
+                tools=tools,
+                ttl=f"{ttl_seconds}s",
+            ),
+        )
+        return cached.name
+
+    async def refresh(self, name: str, ttl_seconds: int) -> None:
+        await self.client.aio.caches.update(
+            name=name,
+            config=types.UpdateCachedContentConfig(ttl=f"{ttl_seconds}s"),
+        )
+
+    async def delete(self, name: str) -> None:
+        await self.client.aio.caches.delete(name=name)
+
+
+class LocalPromptCacheProvider(PromptCacheProvider):
+    """In-memory stand-in for tests and local development"""
+
+    def __init__(self):
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.created = 0
+        self.refreshed = 0
+        self.deleted = 0
+
+    async def create(
+        self,
+        model: str,
+        system_instruction: str,
+        tools: List[types.Tool],
+        ttl_seconds: int,
+    ) -> str:
+        self.created += 1
+        name = f"cachedContents/local-{self.created}"
+        self.entries[name] = {
+            "model": model,
+            "system_instruction": system_instruction,
+            "tools": tools,
+            "expires_at": time.monotonic() + ttl_seconds,
+        }
+        return name
+
+    async def refresh(self, name: str, ttl_seconds: int) -> None:
+        self.refreshed += 1
+        self.entries[name]["expires_at"] = time.monotonic() + ttl_seconds
+
+    async def delete(self, name: str) -> None:
+        self.deleted += 1
+        self.entries.pop(name, None)
+
+
+class PromptCache:
+    """Keeps a cached-content handle for the system prompt and tool declarations
+
+    The handle is created lazily, its TTL is renewed shortly before expiry,
+    and it is recreated when the prompt file changes on disk. If the provider
+    refuses, callers get None and send the prefix inline; creation is retried
+    after `retry_after` seconds.
+
+    A prefix estimated below `min_tokens`, the model's minimum cacheable size,
+    is never sent to the provider: the cache stays off for that prompt
+    version instead of failing on every retry.
+    """
+
+    def __init__(
+        self,
+        provider: PromptCacheProvider,
+        model: str,
+        tools: List[types.Tool],
+        prompt_path: str = "prompts/system_prompt.txt",
+        default_prompt: str = "",
+        ttl_seconds: int = 3600,
+        renew_before: float = 300.0,
+        check_interval: float = 5.0,
+        retry_after: float = 600.0,
+        min_tokens: int = 1024,
+        enabled: bool = True,
+    ):
+        self.provider = provider
+        self.model = model
+        self.tools = tools
+        self.prompt_path = prompt_path
+        self.default_prompt = default_prompt
+        self.ttl_seconds = ttl_seconds
+        self.renew_before = renew_before
+        self.check_interval = check_interval
+        self.retry_after = retry_after
+        self.min_tokens = min_tokens
+        self.enabled = enabled
+
+        self.system_prompt = default_prompt
+        self.version = ""
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+        self._name: Optional[str] = None
+        self._name_version = ""
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+        # Prompt version whose prefix is too small to cache
+        self._too_small = ""
+        self._lock = asyncio.Lock()
+
+        self.counters = {"created": 0, "renewed": 0, "recreated": 0, "failures": 0}
+        self._apply(*self._read_prompt(None))
+
+    async def reload_prompt(self) -> bool:
+        """Re-read the prompt file if it changed; returns True when it did
+
+        The stat and the read run in a worker thread, off the event loop.
+        """
+        now = time.monotonic()
+        if self.version and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+
+        read = await asyncio.to_thread(self._read_prompt, self._mtime)
+        if read is None:
+            return False
+        return self._apply(*read)
+
+    def _read_prompt(self, known_mtime: Optional[float]):
+        """The file's (mtime, text), or None if unchanged since `known_mtime`"""
+        try:
+            mtime = os.stat(self.prompt_path).st_mtime
+        except OSError:
+            mtime = None
+        if self.version and mtime == known_mtime:
+            return None
+
+        try:
+            with open(self.prompt_path, "r") as f:
+                prompt = f.read()
+        except OSError:
+            prompt = self.default_prompt
+        return mtime, prompt
+
+    def _apply(self, mtime: Optional[float], prompt: str) -> bool:
+        self._mtime = mtime
+        version = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+        changed = version != self.version
+        self.system_prompt, self.version = prompt, version
+        return changed
+
+    async def handle(self) -> Optional[str]:
+        """Return a live cached-content name, or None to send the prefix inline"""
+        if not self.enabled:
+            return None
+
+        await self.reload_prompt()
+        now = time.monotonic()
+        if (
+            self._name is not None
+            and self._name_version == self.version
+            and now < self._expires_at - self.renew_before
+        ):
+            return self._name
+        if self._name is None and (
+            now < self._retry_at or self._too_small == self.version
+        ):
+            return None
+
+        async with self._lock:
+            try:
+                return await self._ensure(time.monotonic())
+            except Exception as e:
+                logger.warning("Prompt cache unavailable, sending prompt inline: %s", e)
+                self.counters["failures"] += 1
+                self._name = None
+                self._retry_at = time.monotonic() + self.retry_after
+                return None
+
+    def prefix_tokens(self) -> int:
+        """Estimated tokens in the system prompt and tool declarations"""
+        declarations = "".join(
+            tool.model_dump_json(exclude_none=True) for tool in self.tools
+        )
+        return estimate_tokens(self.system_prompt + declarations)
+
+    async def _ensure(self, now: float) -> Optional[str]:
+        if self._name is not None and self._name_version != self.version:
+            # Prompt changed: replace the stale handle
+            stale, self._name = self._name, None
+            self.counters["recreated"] += 1
+            try:
+                await self.provider.delete(stale)
+            except Exception:
+                pass  # It expires on its own
+
+        if self._name is not None and now >= self._expires_at:
+            self._name = None
+
+        if self._name is None:
+            tokens = self.prefix_tokens()
+            if tokens < self.min_tokens:
+                self._too_small = self.version
+                logger.info(
+                    "Prompt prefix is about %d tokens, below the %d the provider "
+                    "caches; prompt cache off, sending the prompt inline",
+                    tokens,
+                    self.min_tokens,
+                )
+                return None
+            self._name = await self.provider.create(
+                model=self.model,
+                system_instruction=self.system_prompt,
+                tools=self.tools,
+                ttl_seconds=self.ttl_seconds,
+            )
+            self._name_version = self.version
+            self._expires_at = now + self.ttl_seconds
+            self.counters["created"] += 1
+        elif now >= self._expires_at - self.renew_before:
+            await self.provider.refresh(self._name, self.ttl_seconds)
+            self._expires_at = now + self.ttl_seconds
+            self.counters["renewed"] += 1
+
+        return self._name
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "active": self._name is not None,
+            "below_min_tokens": self._too_small == self.version,
+            "prompt_version": self.version,
+            **self.counters,
+        }
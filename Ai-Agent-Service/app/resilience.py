@@ -0,0 +1,230 @@
+import asyncio
+import functools
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+
+class BackendUnavailable(Exception):
+    """A tool call was rejected without reaching the backend"""
+
+
+class CircuitOpenError(BackendUnavailable):
+    pass
+
+
+class ConcurrencyLimitError(BackendUnavailable):
+    pass
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Errors that say the backend is struggling, as opposed to a bad request"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a rolling window of outcomes
+
+    Opens when at least `min_calls` of the last `window` calls were made and
+    `failure_rate` of them failed. While open, calls are rejected until
+    `reset_timeout` has passed; then up to `half_open_calls` trial calls are
+    let through, and the breaker closes on success or reopens on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 5,
+        reset_timeout: float = 15.0,
+        half_open_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+
+        self.state = self.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trials = 0
+        self.counters = {"failures": 0, "rejections": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        """Whether a call may go through now"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self.counters["rejections"] += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._trials = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._trials >= self.half_open_calls:
+                self.counters["rejections"] += 1
+                return False
+            self._trials += 1
+        return True
+
+    def release(self) -> None:
+        """Give back a call allowed by allow() that ends without an outcome"""
+        if self.state == self.HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def record(self, success: bool) -> None:
+        if not success:
+            self.counters["failures"] += 1
+
+        if self.state == self.HALF_OPEN:
+            if success:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(success)
+        calls = len(self._outcomes)
+        failures = calls - sum(self._outcomes)
+        if calls >= self.min_calls and failures / calls >= self.failure_rate:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.counters["opened"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, **self.counters}
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent outbound calls
+
+    The limit grows by one per limit's worth of fast successful calls and is
+    cut by `backoff` when a call fails or is slower than `latency_threshold`.
+    Calls over the limit are rejected immediately rather than queued, so a
+    slow backend is not buried under retries of work it cannot absorb.
+    """
+
+    def __init__(
+        self,
+        initial: int = 20,
+        minimum: int = 2,
+        maximum: int = 100,
+        latency_threshold: float = 2.0,
+        backoff: float = 0.7,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_threshold = latency_threshold
+        self.backoff = backoff
+        self.in_flight = 0
+        self.rejections = 0
+
+    def acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            self.rejections += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, success: bool, latency: float) -> None:
+        self.in_flight -= 1
+        if success and latency <= self.latency_threshold:
+            self.limit = min(self.limit + 1 / self.limit, self.maximum)
+        else:
+            self.limit = max(self.limit * self.backoff, self.minimum)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "rejections": self.rejections,
+        }
+
+
+class Resilience:
+    """Per-tool circuit breakers behind one adaptive limiter for the backend"""
+
+    def __init__(
+        self,
+        limiter: AdaptiveLimiter,
+        breaker_factory: Callable[[str], CircuitBreaker],
+        enabled: bool = True,
+    ):
+        self.limiter = limiter
+        self.breaker_factory = breaker_factory
+        self.enabled = enabled
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        if name not in self.breakers:
+            self.breakers[name] = self.breaker_factory(name)
+        return self.breakers[name]
+
+    def guarded(self, name: str):
+        """Decorate an async tool so its backend calls go through the breaker and limiter"""
+
+        def decorator(func: Callable[..., Awaitable[Any]]):
+            breaker = self.breaker(name)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await func(*args, **kwargs)
+
+                if not breaker.allow():
+                    raise CircuitOpenError(
+                        f"The booking system is not responding ({name}); try again shortly"
+                    )
+                if not self.limiter.acquire():
+                    # Rejected before reaching the backend: says nothing of
+                    # its health, and must not use up a half-open trial
+                    breaker.release()
+                    raise ConcurrencyLimitError(
+                        f"The booking system is overloaded ({name}); try again shortly"
+                    )
+
+                started = time.monotonic()
+                success, cancelled = True, False
+                try:
+                    return await func(*args, **kwargs)
+                except asyncio.CancelledError:
+                    cancelled = True
+                    raise
+                except Exception as e:
+                    success = not is_backend_failure(e)
+                    raise
+                finally:
+                    self.limiter.release(success, time.monotonic() - started)
+                    # A cancelled call never got its answer; it neither
+                    # closes nor reopens the breaker
+                    if cancelled:
+                        breaker.release()
+                    else:
+                        breaker.record(success)
+
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "limiter": self.limiter.stats(),
+            "breakers": {name: b.stats() for name, b in self.breakers.items()},
+        }
@@ -0,0 +1,233 @@
+import re
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+from pydantic import BaseModel
+
+from models import Booking, PortSchedule
+from resilience import BackendUnavailable
+from tools import get_booking_status, get_port_schedule, get_user_bookings
+
+WEEKDAYS = [
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+]
+
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_EU_DATE = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\b")
+_RELATIVE_DATE = re.compile(
+    r"\b(day after tomorrow|today|tonight|tomorrow|"
+    r"(?:next\s+)?(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday))\b"
+)
+_HOUR = re.compile(
+    r"\b(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm|h\b|o'?clock)|"
+    r"\b(\d{1,2}):(\d{2})\b|"
+    r"\bat\s+(\d{1,2})\b"
+)
+
+_STATUS_WORDS = re.compile(
+    r"\b(status|check|show|where|what|about|tell|details?|state|info)\b"
+)
+_MY_BOOKINGS = re.compile(r"\bmy\s+(bookings?|appointments?|reservations?)\b")
+_AVAILABILITY = re.compile(r"\b(availab\w*|free|open|schedule|slots?|capacity|room)\b")
+# Anything that needs reasoning or an action goes to the LLM, as do terminal
+# specific questions since the schedule tool cannot filter by terminal
+_COMPLEX = re.compile(
+    r"\b(reschedul\w*|cancel\w*|change|move|modify|why|how|compare|best|"
+    r"should|instead|book\s+(?:a|me)|create|delete|options?|terminal)\b"
+)
+
+
+class Intent(BaseModel):
+    """A request the router can answer without the LLM"""
+
+    name: str
+    arguments: Dict[str, Any]
+
+
+class IntentRouter:
+    """Deterministic fast path for simple, high-confidence questions
+
+    Booking status lookups, "my bookings" at a given date and hour, and
+    availability for a date are recognised with compiled patterns, answered
+    straight from the tool functions and rendered with a template. Anything
+    ambiguous or needing reasoning returns None and falls through to the LLM.
+    """
+
+    def __init__(self, booking_id_pattern: str = r"\bBK\d+\b", enabled: bool = True):
+        self.booking_id = re.compile(booking_id_pattern, re.IGNORECASE)
+        self.enabled = enabled
+        self.counters: Dict[str, int] = {
+            "booking_status": 0,
+            "user_bookings": 0,
+            "availability": 0,
+            "fallthrough": 0,
+            "degraded": 0,
+        }
+
+    # Parsing ---------------------------------------------------------------
+
+    @staticmethod
+    def parse_date(text: str, today: date) -> Optional[str]:
+        """Resolve an explicit or relative date to YYYY-MM-DD"""
+        dates = set()
+        for year, month, day in _ISO_DATE.findall(text):
+            dates.add(f"{year}-{month}-{day}")
+        for day, month, year in _EU_DATE.findall(text):
+            try:
+                dates.add(date(int(year), int(month), int(day)).isoformat())
+            except ValueError:
+                return None
+        for word in _RELATIVE_DATE.findall(text):
+            word = word.replace("next ", "").strip()
+            if word in ("today", "tonight"):
+                dates.add(today.isoformat())
+            elif word == "tomorrow":
+                dates.add((today + timedelta(days=1)).isoformat())
+            elif word == "day after tomorrow":
+                dates.add((today + timedelta(days=2)).isoformat())
+            else:
+                ahead = (WEEKDAYS.index(word) - today.weekday()) % 7
+                dates.add((today + timedelta(days=ahead)).isoformat())
+
+        # Several different dates is not a simple question
+        return dates.pop() if len(dates) == 1 else None
+
+    @staticmethod
+    def parse_hour(text: str) -> Optional[str]:
+        """Resolve an hour mention ("2pm", "14:00", "at 9") to HH"""
+        hours = set()
+        for match in _HOUR.finditer(text):
+            h12, _, suffix, h24, _, bare = match.groups()
+            if h12 is not None:
+                hour = int(h12)
+                if suffix == "pm" and hour < 12:
+                    hour += 12
+                elif suffix == "am" and hour == 12:
+                    hour = 0
+            else:
+                hour = int(h24 if h24 is not None else bare)
+            if hour > 23:
+                return None
+            hours.add(f"{hour:02d}")
+        return hours.pop() if len(hours) == 1 else None
+
+    def classify(self, message: str, today: Optional[date] = None) -> Optional[Intent]:
+        """Map a message to a single high-confidence intent, or None"""
+        text = message.lower()
+        if _COMPLEX.search(text):
+            return None
+
+        today = today or date.today()
+        booking_ids = {b.upper() for b in self.booking_id.findall(message)}
+
+        if booking_ids:
+            if len(booking_ids) == 1 and (
+                _STATUS_WORDS.search(text) or len(text.split()) <= 3
+            ):
+                return Intent(
+                    name="booking_status",
+                    arguments={"booking_id": booking_ids.pop()},
+                )
+            return None
+
+        day = self.parse_date(text, today)
+        hour = self.parse_hour(text)
+
+        if _MY_BOOKINGS.search(text):
+            if day and hour:
+                return Intent(
+                    name="user_bookings", arguments={"date": day, "hour": hour}
+                )
+            return None
+
+        if _AVAILABILITY.search(text) and day:
+            return Intent(name="availability", arguments={"date": day, "hour": hour})
+
+        return None
+
+    # Answering -------------------------------------------------------------
+
+    async def answer(self, message: str, user_id: str) -> Optional[str]:
+        """Answer the message from the tools, or None to fall through to the LLM"""
+        if not self.enabled:
+            return None
+
+        intent = self.classify(message)
+        if intent is None:
+            self.counters["fallthrough"] += 1
+            return None
+
+        try:
+            args = intent.arguments
+            if intent.name == "booking_status":
+                text = await self._booking_status(args["booking_id"], user_id)
+            elif intent.name == "user_bookings":
+                bookings = await get_user_bookings(
+                    user_id=user_id, date=args["date"], hour=args["hour"]
+                )
+                text = self._render_user_bookings(bookings, args["date"], args["hour"])
+            else:
+                schedule = await get_port_schedule(date=args["date"])
+                text = self._render_availability(schedule, args["hour"])
+        except BackendUnavailable:
+            # The LLM would hit the same wall; answer right away instead
+            self.counters["degraded"] += 1
+            return (
+                "The booking system is temporarily unavailable, "
+                "please try again in a moment."
+            )
+        except Exception:
+            # The LLM can still explain a backend problem better than a template
+            self.counters["fallthrough"] += 1
+            return None
+
+        self.counters[intent.name] += 1
+        return text
+
+    @staticmethod
+    async def _booking_status(booking_id: str, user_id: str) -> str:
+        try:
+            booking = await get_booking_status(booking_id=booking_id, user_id=user_id)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (403, 404):
+                return f"I couldn't find booking {booking_id} for your account. Please check the booking ID."
+            raise
+        return (
+            f"Booking {booking.booking_id} is {booking.status}. "
+            f"It is scheduled for {booking.timeslot.date} at {booking.timeslot.hour_start}:00."
+        )
+
+    @staticmethod
+    def _render_user_bookings(bookings: List[Booking], day: str, hour: str) -> str:
+        if not bookings:
+            return f"You have no bookings on {day} at {hour}:00."
+        lines = [f"You have {len(bookings)} booking(s) on {day} at {hour}:00:"]
+        lines += [f"- {b.booking_id}: {b.status}" for b in bookings]
+        return "\n".join(lines)
+
+    @staticmethod
+    def _render_availability(schedule: PortSchedule, hour: Optional[str]) -> str:
+        slots = schedule.schedule
+        if hour is not None:
+            slots = [s for s in slots if s.hour_start.zfill(2)[:2] == hour]
+        if not slots:
+            when = f"at {hour}:00 " if hour is not None else ""
+            return f"There are no time slots scheduled {when}on {schedule.date}."
+
+        lines = [f"Availability on {schedule.date}:"]
+        for slot in slots:
+            available = max(slot.max_capacity - slot.booked_capacity, 0)
+            lines.append(
+                f"- {slot.hour_start}:00: {available}/{slot.max_capacity} slots available"
+            )
+        return "\n".join(lines)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, **self.counters}
@@ -0,0 +1,74 @@
+import asyncio
+import functools
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+def normalize_arguments(
+    signature: inspect.Signature, args: Tuple, kwargs: Dict[str, Any]
+) -> Tuple:
+    """Build a hashable, order-independent key from a call's arguments"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return tuple(sorted((k, str(v).strip()) for k, v in bound.arguments.items()))
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one in-flight execution
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it runs await the same task instead of issuing their own request.
+    The task is shielded so a cancelled caller does not cancel it for the
+    others.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn once for all concurrent callers sharing the same key"""
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception so it is not reported as unhandled when
+        # every caller was cancelled before the task finished
+        if not task.cancelled():
+            task.exception()
+
+    def coalesced_call(self, name: str):
+        """Decorate an async tool function so identical concurrent calls share one execution"""
+
+        def decorator(func: Callable[..., Awaitable[Any]]):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await func(*args, **kwargs)
+                key = (name, normalize_arguments(signature, args, kwargs))
+                return await self.do(key, lambda: func(*args, **kwargs))
+
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
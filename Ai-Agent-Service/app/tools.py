@@ -1,65 +1,371 @@
+import asyncio
+import datetime
 import httpx
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from answer_cache import tracked
+from availability import AvailabilityIndex, parse_hour
+from backend import backend
+from batching import BatchLoader
+from cache import CachePolicy, LRUCacheBackend, ToolCache
 from config import get_settings
+from history import HistoryParser
+from metrics import instrumented
+from resilience import AdaptiveLimiter, CircuitBreaker, Resilience
+from singleflight import SingleFlight
+from tracing import tracer
 from models import (
+    Availability,
+    AvailableSlot,
     Booking,
     PortSchedule,
     ChatMessage,
+    ScheduleGrid,
 )
 
 settings = get_settings()
-base_url = settings.api_base_url
-headers = {
-    "Authorization": f"Bearer {settings.api_service_token}",
-    "Content-Type": "application/json",
-}
+
+tool_cache = ToolCache(
+    LRUCacheBackend(
+        max_entries=settings.tool_cache_max_entries,
+        max_bytes=settings.tool_cache_max_bytes,
+    ),
+    policies={
+        "get_booking_status": CachePolicy(
+            ttl=settings.booking_status_cache_ttl,
+            negative_ttl=settings.booking_status_negative_ttl,
+            user_arg="user_id",
+        ),
+        "get_user_bookings": CachePolicy(
+            ttl=settings.user_bookings_cache_ttl,
+            user_arg="user_id",
+        ),
+        "get_port_schedule": CachePolicy(ttl=settings.port_schedule_cache_ttl),
+    },
+    enabled=settings.tool_cache_enabled,
+)
+
+# Sits behind the cache: concurrent misses for the same call share one request
+single_flight = SingleFlight(enabled=settings.tool_single_flight_enabled)
+
+# Innermost: only calls that actually go to the backend are limited
+resilience = Resilience(
+    AdaptiveLimiter(
+        initial=settings.tool_concurrency_initial,
+        minimum=settings.tool_concurrency_min,
+        maximum=settings.tool_concurrency_max,
+        latency_threshold=settings.tool_latency_threshold,
+    ),
+    breaker_factory=lambda name: CircuitBreaker(
+        name,
+        failure_rate=settings.circuit_failure_rate,
+        window=settings.circuit_window,
+        min_calls=settings.circuit_min_calls,
+        reset_timeout=settings.circuit_reset_timeout,
+    ),
+    enabled=settings.resilience_enabled,
+)
+
+
+# Free capacity by date and hour, fed by every schedule fetched from the backend
+availability_index = AvailabilityIndex(max_dates=settings.availability_max_dates)
+
+# Parsed chat histories, extended with each turn's new messages
+history_parser = HistoryParser(
+    max_chats=settings.history_cache_max_chats,
+    enabled=settings.history_cache_enabled,
+)
+
+
+@resilience.guarded("get_chat_messages")
+async def get_chat_messages(
+    chat_id: str, tail: Optional[int] = None
+) -> List[ChatMessage]:
+    """Get messages from a chat, only the last `tail` of them if set
+
+    `tail` defaults to HISTORY_TAIL_MESSAGES (0 = the whole chat).
+    """
+    if tail is None:
+        tail = settings.history_tail_messages
+    response = await backend.get(f"/api/chat/{chat_id}/messages")
+    response.raise_for_status()
+    with tracer.span(
+        "history.parse", **{"history.bytes": len(response.content)}
+    ) as span:
+        messages, mode = history_parser.parse(chat_id, response.content, tail)
+        span.set(**{"history.parse_mode": mode, "history.messages": len(messages)})
+        return messages
 
 
-async def get_chat_messages(chat_id: str) -> List[ChatMessage]:
-    """Get messages from a chat"""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{base_url}/api/chat/{chat_id}/messages", headers=headers
+def _item_error(response: httpx.Response, status_code: int, detail: str):
+    """Turn a failed item of a bulk response into the error a single call raises"""
+    item = httpx.Response(status_code, json={"error": detail}, request=response.request)
+    return httpx.HTTPStatusError(
+        f"{status_code} {detail}", request=response.request, response=item
+    )
+
+
+@resilience.guarded("get_booking_status_batch")
+async def _fetch_booking_statuses(
+    keys: List[Tuple[str, str]],
+) -> Dict[Tuple[str, str], Any]:
+    """Resolve (user_id, booking_id) keys with one bulk request per user"""
+    by_user: Dict[str, List[str]] = {}
+    for user_id, booking_id in keys:
+        by_user.setdefault(user_id, []).append(booking_id)
+
+    results: Dict[Tuple[str, str], Any] = {}
+    for user_id, booking_ids in by_user.items():
+        response = await backend.post(
+            "/api/internal/tools/booking-status/batch",
+            json={"booking_ids": booking_ids, "user_id": user_id},
         )
         response.raise_for_status()
-        data = response.json()
-        return [ChatMessage(**msg) for msg in data]
+        for item in response.json()["results"]:
+            key = (user_id, item["booking_id"])
+            if item["status_code"] == 200:
+                results[key] = Booking(**item["booking"])
+            else:
+                results[key] = _item_error(
+                    response, item["status_code"], item.get("error", "")
+                )
+    return results
+
 
+@resilience.guarded("get_port_schedule_batch")
+async def _fetch_port_schedules(dates: List[str]) -> Dict[str, Any]:
+    """Resolve several schedule dates with one bulk request"""
+    response = await backend.post(
+        "/api/internal/tools/port-schedule/batch",
+        json={"dates": dates},
+    )
+    response.raise_for_status()
+    return {
+        schedule["date"]: PortSchedule(**schedule)
+        for schedule in response.json()["schedules"]
+    }
 
+
+# Batch the individual calls made within a short window into bulk requests.
+# Off by default: the bulk endpoints are the contract in test/mock/mock_api.py
+booking_status_loader = BatchLoader(
+    _fetch_booking_statuses,
+    window=settings.tool_batch_window_ms / 1000,
+    max_batch=settings.tool_batch_max_size,
+)
+port_schedule_loader = BatchLoader(
+    _fetch_port_schedules,
+    window=settings.tool_batch_window_ms / 1000,
+    max_batch=settings.tool_batch_max_size,
+)
+
+
+@resilience.guarded("get_booking_status")
+async def _fetch_booking_status(booking_id: str, user_id: str) -> Booking:
+    response = await backend.post(
+        "/api/internal/tools/booking-status",
+        json={"booking_id": booking_id, "user_id": user_id},
+    )
+    response.raise_for_status()
+    return Booking(**response.json())
+
+
+@instrumented("get_booking_status")
+@tracked("get_booking_status")
+@tool_cache.cached("get_booking_status")
+@single_flight.coalesced_call("get_booking_status")
 async def get_booking_status(booking_id: str, user_id: str) -> Booking:
     """Get booking status"""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{base_url}/api/internal/tools/booking-status",
-            json={"booking_id": booking_id, "user_id": user_id},
-            headers=headers,
-        )
-        response.raise_for_status()
-        return Booking(**response.json())
+    if settings.tool_batching_enabled:
+        return await booking_status_loader.load((user_id, booking_id))
+    return await _fetch_booking_status(booking_id, user_id)
 
 
+@instrumented("get_user_bookings")
+@tracked("get_user_bookings")
+@tool_cache.cached("get_user_bookings")
+@single_flight.coalesced_call("get_user_bookings")
+@resilience.guarded("get_user_bookings")
 async def get_user_bookings(user_id: str, date: str, hour: str) -> List[Booking]:
     """Get user bookings for a specific date and hour"""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{base_url}/api/internal/tools/user-bookings",
-            json={"user_id": user_id, "date": date, "hour": hour},
-            headers=headers,
-        )
-        response.raise_for_status()
-        data = response.json()
-        return [Booking(**booking) for booking in data]
+    response = await backend.post(
+        "/api/internal/tools/user-bookings",
+        json={"user_id": user_id, "date": date, "hour": hour},
+    )
+    response.raise_for_status()
+    data = response.json()
+    return [Booking(**booking) for booking in data]
+
+
+@resilience.guarded("get_port_schedule")
+async def _fetch_port_schedule(date: str) -> PortSchedule:
+    response = await backend.post(
+        "/api/internal/tools/port-schedule",
+        json={
+            "date": date,
+        },
+    )
+    response.raise_for_status()
+    return PortSchedule(**response.json())
 
 
+@instrumented("get_port_schedule")
+@tracked("get_port_schedule")
+@tool_cache.cached("get_port_schedule")
+@single_flight.coalesced_call("get_port_schedule")
 async def get_port_schedule(date: str) -> PortSchedule:
     """Get port schedule for a terminal"""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{base_url}/api/internal/tools/port-schedule",
-            json={
-                "date": date,
-            },
-            headers=headers,
+    if settings.tool_batching_enabled:
+        schedule = await port_schedule_loader.load(date)
+    else:
+        schedule = await _fetch_port_schedule(date)
+    availability_index.update(schedule)
+    return schedule
+
+
+@instrumented("get_port_schedule_range")
+@tracked("get_port_schedule_range")
+async def get_port_schedule_range(
+    start_date: str,
+    end_date: str,
+    hour_from: Optional[str] = None,
+    hour_to: Optional[str] = None,
+) -> ScheduleGrid:
+    """Get the port schedule for every date from start_date to end_date, as
+    capacity tables with one row per hour and one column per date
+
+    Args:
+        start_date: First date, YYYY-MM-DD
+        end_date: Last date (inclusive), YYYY-MM-DD
+        hour_from: Only include hours from this one on, HH (optional)
+        hour_to: Only include hours up to this one (inclusive), HH (optional)
+    """
+    # One cached call per date; concurrent, so batching can merge them
+    dates = _date_range(start_date, end_date)
+    first = parse_hour(hour_from, "hour_from")
+    last = parse_hour(hour_to, "hour_to")
+    schedules = await asyncio.gather(*(get_port_schedule(date=d) for d in dates))
+    return _schedule_grid(dates, schedules, first, last)
+
+
+def _date_range(start_date: str, end_date: str) -> List[str]:
+    first = datetime.date.fromisoformat(start_date)
+    last = datetime.date.fromisoformat(end_date)
+    days = (last - first).days + 1
+    if days < 1:
+        raise ValueError("end_date must not be before start_date")
+    if days > settings.schedule_range_max_days:
+        raise ValueError(
+            f"Date ranges are limited to {settings.schedule_range_max_days} days"
         )
-        response.raise_for_status()
-        return PortSchedule(**response.json())
+    return [(first + datetime.timedelta(days=i)).isoformat() for i in range(days)]
+
+
+def _schedule_grid(
+    dates: List[str],
+    schedules: List[PortSchedule],
+    first: Optional[int],
+    last: Optional[int],
+) -> ScheduleGrid:
+    slots: Dict[Tuple[str, int], Any] = {}
+    for column, schedule in enumerate(schedules):
+        for slot in schedule.schedule:
+            try:
+                hour = parse_hour(slot.hour_start)
+            except ValueError:
+                continue
+            if hour is not None:
+                slots[(f"{hour:02d}", column)] = slot
+
+    hours = sorted(
+        hour
+        for hour in {hour for hour, _ in slots}
+        if (first is None or int(hour) >= first) and (last is None or int(hour) <= last)
+    )
+
+    def column(field: str) -> List[List[int]]:
+        return [
+            [
+                getattr(slots[(h, d)], field) if (h, d) in slots else 0
+                for d in range(len(dates))
+            ]
+            for h in hours
+        ]
+
+    return ScheduleGrid(
+        dates=dates,
+        hours=hours,
+        max_capacity=column("max_capacity"),
+        booked_capacity=column("booked_capacity"),
+        late_capacity=column("late_capacity"),
+    )
+
+
+@instrumented("find_availability")
+@tracked("find_availability")
+async def find_availability(
+    start_date: str,
+    end_date: str,
+    trucks: int = 1,
+    hours: int = 1,
+    hour_from: Optional[str] = None,
+    hour_to: Optional[str] = None,
+) -> Availability:
+    """Find the next slot with room for a number of trucks, the slot with the most
+    room, and how full each day is, between start_date and end_date
+
+    Args:
+        start_date: First date, YYYY-MM-DD
+        end_date: Last date (inclusive), YYYY-MM-DD
+        trucks: Free capacity needed in every hour of the slot
+        hours: Number of consecutive hours the slot must cover
+        hour_from: Earliest hour the slot may start, HH (optional)
+        hour_to: Latest hour the slot may cover, HH (optional)
+    """
+    dates = _date_range(start_date, end_date)
+    if not 1 <= hours <= 24:
+        raise ValueError("hours must be between 1 and 24")
+    if trucks < 1:
+        raise ValueError("trucks must be at least 1")
+    first = parse_hour(hour_from, "hour_from")
+    last = parse_hour(hour_to, "hour_to")
+
+    # Only dates the index lacks, or holds for longer than the cache would,
+    # are fetched (a cache hit does not pass through the index on its own)
+    stale = availability_index.missing(dates, settings.port_schedule_cache_ttl)
+    for schedule in await asyncio.gather(*(get_port_schedule(date=d) for d in stale)):
+        availability_index.update(schedule)
+
+    windows = availability_index.windows(
+        dates,
+        hours=hours,
+        hour_from=0 if first is None else first,
+        hour_to=23 if last is None else last,
+    )
+
+    def slot(found: Optional[tuple]) -> Optional[AvailableSlot]:
+        if found is None:
+            return None
+        day, hour = found
+        return AvailableSlot(
+            date=dates[day],
+            hour_start=f"{hour:02d}",
+            hours=hours,
+            free_capacity=int(windows[day, hour]),
+        )
+
+    return Availability(
+        next_available=slot(availability_index.next_available(windows, trucks)),
+        best_window=slot(availability_index.best_window(windows, trucks)),
+        dates=dates,
+        fill_level=availability_index.fill_level(dates),
+    )
+
+
+# Tool functions by name, as the model refers to them
+TOOLS = {
+    "get_booking_status": get_booking_status,
+    "get_user_bookings": get_user_bookings,
+    "get_port_schedule": get_port_schedule,
+    "get_port_schedule_range": get_port_schedule_range,
+    "find_availability": find_availability,
+}
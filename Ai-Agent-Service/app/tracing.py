@@ -0,0 +1,356 @@
+import functools
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+from config import get_settings
+
+# W3C Trace Context: version-traceid-parentid-flags
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Trace:
+    """The spans of one request recorded in this process"""
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        # Head-based decision; slow or failed traces are kept regardless
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+        self.dropped_spans = 0
+        self.error = False
+
+
+class Span:
+    """One timed operation, shaped after the OpenTelemetry span model"""
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        trace: Trace,
+        name: str,
+        parent_id: Optional[str],
+        kind: str,
+        attributes: Dict[str, Any],
+    ):
+        self.tracer = tracer
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes)
+        self.events: List[Dict[str, Any]] = []
+        self.status = "UNSET"
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        # The first span of a trace in this process ends the trace
+        self.is_local_root = False
+
+    @property
+    def traceparent(self) -> str:
+        flags = "01" if self.trace.sampled else "00"
+        return f"00-{self.trace.trace_id}-{self.span_id}-{flags}"
+
+    @property
+    def duration(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        self.events.append(
+            {"name": name, "timeUnixNano": time.time_ns(), "attributes": attributes}
+        )
+
+    def record_exception(self, error: BaseException) -> None:
+        self.status = "ERROR"
+        self.status_message = str(error)
+        self.trace.error = True
+        self.add_event(
+            "exception",
+            **{"exception.type": type(error).__name__, "exception.message": str(error)},
+        )
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self.tracer._ended(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """OTLP/JSON style span record"""
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+class NoopSpan:
+    """Stands in for a span when tracing is off"""
+
+    traceparent = None
+    duration = 0.0
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        pass
+
+    def record_exception(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class JsonlExporter:
+    """Appends finished traces to a JSON Lines file, one span per line
+
+    Writes happen on a background thread so the event loop never waits on
+    the disk.
+    """
+
+    def __init__(self, path: str, service_name: str = "ai-agent-service"):
+        self.path = path
+        self.service_name = service_name
+        self._queue: "queue.SimpleQueue[Optional[List[Dict[str, Any]]]]" = (
+            queue.SimpleQueue()
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exported = 0
+
+    def export(self, spans: List[Span]) -> None:
+        records = [
+            {"resource": {"service.name": self.service_name}, **s.to_dict()}
+            for s in spans
+        ]
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._write_loop, name="trace-exporter", daemon=True
+                )
+                self._thread.start()
+        self._queue.put(records)
+
+    def _write_loop(self) -> None:
+        while True:
+            records = self._queue.get()
+            if records is None:
+                return
+            with open(self.path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+            self.exported += len(records)
+
+    def shutdown(self) -> None:
+        """Flush queued traces and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+class Tracer:
+    """Request tracing with head sampling and tail-based retention
+
+    Every trace is recorded in memory while the request runs. When its local
+    root span ends the trace is exported if it was head-sampled (the incoming
+    traceparent's flag, or `sample_rate`), took at least `slow_threshold`
+    seconds, or contains an error; otherwise it is dropped. The current span
+    is carried in a context variable and its traceparent is sent to the
+    backend, so the backend's spans can join the same trace.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[JsonlExporter] = None,
+        sample_rate: float = 1.0,
+        slow_threshold: float = 0.0,
+        max_spans: int = 512,
+        enabled: bool = True,
+    ):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.max_spans = max_spans
+        self.enabled = enabled
+        self._current: ContextVar[Optional[Span]] = ContextVar(
+            "current_span", default=None
+        )
+        self.counters = {
+            "traces": 0,
+            "kept_sampled": 0,
+            "kept_slow": 0,
+            "kept_error": 0,
+            "dropped": 0,
+        }
+
+    def current(self) -> Optional[Span]:
+        return self._current.get()
+
+    def start_span(
+        self,
+        name: str,
+        kind: str = "internal",
+        traceparent: Optional[str] = None,
+        **attributes: Any,
+    ):
+        """Start a span under the current one, or a new trace
+
+        A root span continues the trace of a valid incoming traceparent.
+        The span is not made current; see span() and use().
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+
+        parent = self._current.get()
+        if parent is not None:
+            trace, parent_id, is_root = parent.trace, parent.span_id, False
+        else:
+            match = TRACEPARENT.match((traceparent or "").strip().lower())
+            if match:
+                trace_id, parent_id, flags = match.groups()
+                sampled = bool(int(flags, 16) & 1)
+            else:
+                trace_id, parent_id = os.urandom(16).hex(), None
+                sampled = random.random() < self.sample_rate
+            trace, is_root = Trace(trace_id, sampled), True
+            self.counters["traces"] += 1
+
+        span = Span(self, trace, name, parent_id, kind, attributes)
+        span.is_local_root = is_root
+        return span
+
+    @contextmanager
+    def use(self, span) -> Iterator[Any]:
+        """Make a span current for the block without ending it"""
+        if isinstance(span, NoopSpan):
+            yield span
+            return
+        token = self._current.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            try:
+                self._current.reset(token)
+            except ValueError:
+                # Left from another context, e.g. a closed async generator
+                pass
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: str = "internal",
+        traceparent: Optional[str] = None,
+        activate: bool = True,
+        **attributes: Any,
+    ):
+        """Run the block in a new child span
+
+        Pass activate=False around a yield in an async generator, so the span
+        does not become the consumer's current span.
+        """
+        span = self.start_span(name, kind=kind, traceparent=traceparent, **attributes)
+        try:
+            if activate:
+                with self.use(span):
+                    yield span
+            else:
+                try:
+                    yield span
+                except Exception as e:
+                    span.record_exception(e)
+                    raise
+        finally:
+            span.end()
+
+    def traced(self, name: str, kind: str = "internal"):
+        """Decorate an async function to run in its own span"""
+
+        def decorator(func: Callable[..., Awaitable[Any]]):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.span(name, kind=kind):
+                    return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def headers(self) -> Dict[str, str]:
+        """Trace context headers for an outgoing request"""
+        span = self._current.get()
+        return {"traceparent": span.traceparent} if span is not None else {}
+
+    def _ended(self, span: Span) -> None:
+        trace = span.trace
+        if len(trace.spans) < self.max_spans:
+            trace.spans.append(span)
+        else:
+            trace.dropped_spans += 1
+        if not span.is_local_root:
+            return
+
+        if trace.sampled:
+            kept = "kept_sampled"
+        elif self.slow_threshold and span.duration >= self.slow_threshold:
+            kept = "kept_slow"
+        elif trace.error:
+            kept = "kept_error"
+        else:
+            self.counters["dropped"] += 1
+            return
+
+        self.counters[kept] += 1
+        span.set(**{"trace.kept": kept[5:], "trace.dropped_spans": trace.dropped_spans})
+        if self.exporter is not None:
+            self.exporter.export(trace.spans)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_threshold_s": self.slow_threshold,
+            **self.counters,
+            "exported_spans": self.exporter.exported if self.exporter else 0,
+        }
+
+
+settings = get_settings()
+
+tracer = Tracer(
+    exporter=JsonlExporter(settings.tracing_export_path),
+    sample_rate=settings.tracing_sample_rate,
+    slow_threshold=settings.tracing_slow_threshold,
+    max_spans=settings.tracing_max_spans,
+    enabled=settings.tracing_enabled,
+)
@@ -0,0 +1,16 @@
+"""
+Shared pytest setup for the unit tests
+
+The service modules use flat imports relative to app/ (e.g. `from tools import ...`),
+so app/ is put on the path and the required settings are given test defaults.
+"""
+
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "app")
+sys.path.insert(0, APP_DIR)
+
+os.environ.setdefault("API_BASE_URL", "http://localhost:8000")
+os.environ.setdefault("API_SERVICE_TOKEN", "mock-service-token")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
@@ -0,0 +1,412 @@
+"""
+Load-test harness for the AI Agent Service
+
+Drives the FastAPI app in-process with a configurable number of concurrent
+clients and a weighted mix of requests. The backend is the mock API
+(test/mock/mock_api.py), mounted in-process unless --backend-url points at a
+running one, and the LLM is replaced by the stub agent
+(test/mock/stub_agent.py), so no Gemini quota is used. Reports throughput and
+p50/p95/p99 latency per stage: total, router, answer cache, history fetch,
+each LLM call and each tool call.
+
+Run with: python test/load_test.py --concurrency 32 --requests 2000
+Run cold: python test/load_test.py --cold --llm-latency lognormal:1.2,0.4
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(TEST_DIR), "app"))
+sys.path.insert(0, os.path.join(TEST_DIR, "mock"))
+
+os.environ.setdefault("API_BASE_URL", "http://mock-api")
+os.environ.setdefault("API_SERVICE_TOKEN", "mock-service-token")
+os.environ.setdefault("GEMINI_API_KEY", "load-test")
+
+import httpx
+
+import main
+import mock_api
+from backend import backend
+from stub_agent import LatencyDistribution, ScriptedTurn, StubAgent
+from tools import single_flight, tool_cache
+
+# (name, weight, message, scripted function-call rounds, final answer)
+# Messages and arguments refer to the mock API's static data
+DEFAULT_MIX: List[Tuple[str, int, str, List[List[Tuple[str, Dict]]], str]] = [
+    (
+        "status",
+        4,
+        "What is the status of booking BK123?",
+        [[("get_booking_status", {"booking_id": "BK123"})]],
+        "Booking BK123 is confirmed for 2024-02-07 at 14:00.",
+    ),
+    (
+        "reschedule",
+        3,
+        "I want to reschedule BK123, show me the options on 2024-02-08",
+        [
+            [("get_booking_status", {"booking_id": "BK123"})],
+            [("get_port_schedule", {"date": "2024-02-08"})],
+        ],
+        "BK123 can move to 2024-02-08; 15:00 has the most free capacity.",
+    ),
+    (
+        "compare",
+        2,
+        "Compare availability between 2024-02-07 and 2024-02-08",
+        [
+            [
+                ("get_port_schedule", {"date": "2024-02-07"}),
+                ("get_port_schedule", {"date": "2024-02-08"}),
+            ]
+        ],
+        "2024-02-08 is much less busy than 2024-02-07.",
+    ),
+    (
+        "my_bookings",
+        2,
+        "Which of my bookings are on 2024-02-07 at 14:00?",
+        [[("get_user_bookings", {"date": "2024-02-07", "hour": "14"})]],
+        "You have one booking at 14:00 on 2024-02-07: BK123.",
+    ),
+    (
+        "chitchat",
+        1,
+        "Hello, what can you help me with?",
+        [],
+        "I can check bookings, availability and help with rescheduling.",
+    ),
+]
+
+ENDPOINTS = {
+    "generate": "/api/ai/generate",
+    "chat": "/api/chat",
+    "stream": "/api/ai/generate/stream",
+}
+
+_stages: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar(
+    "load_test_stages", default=None
+)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Attribute a timing to the request currently being driven"""
+    stages = _stages.get()
+    if stages is not None:
+        stages.setdefault(stage, []).append(seconds)
+
+
+def timed(stage: str, func):
+    """Wrap an async callable so each call is recorded as a stage"""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            record_stage(stage, time.perf_counter() - started)
+
+    return wrapper
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+@contextmanager
+def instrumented(agent: StubAgent, cold: bool, single_flight_enabled: bool) -> Iterator:
+    """Swap in the stub agent and stage timers, restoring everything afterwards"""
+    saved = {
+        "agent": main.agent,
+        "resolve_chat_history": main.resolve_chat_history,
+        "router_answer": main.router.__dict__.get("answer"),
+        "cache_lookup": main.answer_cache.__dict__.get("lookup"),
+        "router_enabled": main.router.enabled,
+        "answer_cache_enabled": main.answer_cache.enabled,
+        "tool_cache_enabled": tool_cache.enabled,
+        "single_flight_enabled": single_flight.enabled,
+    }
+
+    main.agent = agent
+    main.resolve_chat_history = timed("history", saved["resolve_chat_history"])
+    main.router.answer = timed("router", main.router.answer)
+    main.answer_cache.lookup = timed("answer_cache", main.answer_cache.lookup)
+    if cold:
+        main.router.enabled = False
+        main.answer_cache.enabled = False
+        tool_cache.enabled = False
+    single_flight.enabled = single_flight_enabled
+
+    try:
+        yield
+    finally:
+        main.agent = saved["agent"]
+        main.resolve_chat_history = saved["resolve_chat_history"]
+        for obj, attr, value in (
+            (main.router, "answer", saved["router_answer"]),
+            (main.answer_cache, "lookup", saved["cache_lookup"]),
+        ):
+            if value is None:
+                obj.__dict__.pop(attr, None)
+            else:
+                setattr(obj, attr, value)
+        main.router.enabled = saved["router_enabled"]
+        main.answer_cache.enabled = saved["answer_cache_enabled"]
+        tool_cache.enabled = saved["tool_cache_enabled"]
+        single_flight.enabled = saved["single_flight_enabled"]
+
+
+async def run_load(
+    concurrency: int = 16,
+    requests: int = 500,
+    endpoint: str = "generate",
+    mix: Optional[Dict[str, int]] = None,
+    llm_latency: str = "lognormal:0.8,0.4",
+    token_latency: str = "fixed:0.01",
+    backend_url: Optional[str] = None,
+    cold: bool = False,
+    single_flight_enabled: bool = True,
+    seed: int = 42,
+) -> Dict[str, Any]:
+    """Run one load test and return the report"""
+    rng = random.Random(seed)
+    weights = mix or {name: weight for name, weight, *_ in DEFAULT_MIX}
+    scenarios = [s for s in DEFAULT_MIX if weights.get(s[0], 0) > 0]
+    if not scenarios:
+        raise ValueError("The request mix selects no scenario")
+
+    agent = StubAgent(
+        scripts=[
+            ScriptedTurn(re.escape(msg), rounds, answer)
+            for _, _, msg, rounds, answer in scenarios
+        ],
+        llm_latency=LatencyDistribution.parse(llm_latency, rng),
+        token_latency=LatencyDistribution.parse(token_latency, rng),
+        on_stage=record_stage,
+    )
+    plan = rng.choices(
+        scenarios, weights=[weights[s[0]] for s in scenarios], k=requests
+    )
+
+    history = mock_api.CHAT_MESSAGES_DB["chat_abc123"]
+    samples: Dict[str, List[float]] = {}
+    per_scenario: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+
+    await backend.close()
+    backend_settings = backend.settings
+    if backend_url:
+        backend.settings = backend_settings.model_copy(
+            update={"api_base_url": backend_url}
+        )
+        await backend.start()
+    else:
+        await backend.start(transport=httpx.ASGITransport(app=mock_api.app))
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while not queue.empty():
+            name, _, message, _, _ = queue.get_nowait()
+            body = {"chat_id": "chat_abc123", "user_id": "U456", "message": message}
+            if endpoint == "chat":
+                body["messages"] = history
+
+            stages: Dict[str, List[float]] = {}
+            token = _stages.set(stages)
+            started = time.perf_counter()
+            try:
+                response = await client.post(ENDPOINTS[endpoint], json=body)
+                elapsed = time.perf_counter() - started
+                if response.status_code != 200:
+                    key = str(response.status_code)
+                    errors[key] = errors.get(key, 0) + 1
+                    continue
+                if endpoint == "stream":
+                    done = _sse_done(response.text)
+                    if done is None:
+                        errors["stream"] = errors.get("stream", 0) + 1
+                        continue
+                    stages["first_token"] = [done["ttft_ms"] / 1000]
+            except Exception as e:
+                key = type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+                continue
+            finally:
+                _stages.reset(token)
+
+            stages["total"] = [elapsed]
+            per_scenario.setdefault(name, []).append(elapsed)
+            for stage, values in stages.items():
+                samples.setdefault(stage, []).extend(values)
+
+    with instrumented(agent, cold, single_flight_enabled):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://ai-service", timeout=None
+        ) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            duration = time.perf_counter() - started
+        backend_stats = backend.stats()
+        await backend.close()
+        backend.settings = backend_settings
+
+    completed = len(samples.get("total", []))
+    return {
+        "config": {
+            "concurrency": concurrency,
+            "requests": requests,
+            "endpoint": endpoint,
+            "mix": {s[0]: weights[s[0]] for s in scenarios},
+            "llm_latency": llm_latency,
+            "token_latency": token_latency,
+            "backend": backend_url or "in-process mock",
+            "cold": cold,
+            "single_flight": single_flight_enabled,
+            "seed": seed,
+        },
+        "duration_s": round(duration, 3),
+        "completed": completed,
+        "errors": errors,
+        "throughput_rps": round(completed / duration, 2) if duration else 0.0,
+        "stages": {stage: summarize(v) for stage, v in sorted(samples.items())},
+        "scenarios": {name: summarize(v) for name, v in sorted(per_scenario.items())},
+        "backend_requests": backend_stats["requests_total"],
+    }
+
+
+def _sse_done(text: str) -> Optional[Dict[str, Any]]:
+    """Return the payload of the `done` event of an SSE body"""
+    for block in text.split("\n\n"):
+        lines = block.splitlines()
+        if lines and lines[0] == "event: done":
+            return json.loads(lines[1][len("data: ") :])
+    return None
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    config = report["config"]
+    print("=" * 78)
+    print(
+        f"{config['requests']} requests to {ENDPOINTS[config['endpoint']]} "
+        f"with {config['concurrency']} concurrent clients"
+    )
+    print(f"LLM latency {config['llm_latency']}, backend: {config['backend']}")
+    print(f"Mix: {config['mix']}  cold: {config['cold']}")
+    print("=" * 78)
+    print(
+        f"Completed {report['completed']} in {report['duration_s']}s: "
+        f"{report['throughput_rps']} req/s, errors: {report['errors'] or 0}, "
+        f"backend requests: {report['backend_requests']}"
+    )
+
+    for title, rows in (("Stage", report["stages"]), ("Scenario", report["scenarios"])):
+        print()
+        print(
+            f"{title:<26}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+        )
+        for name, s in rows.items():
+            print(
+                f"{name:<26}{s['count']:>7}{s['mean_ms']:>10}{s['p50_ms']:>10}"
+                f"{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}"
+            )
+    print("\n(latencies in ms)")
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """Parse "status=4,reschedule=1" into scenario weights"""
+    mix = {}
+    known = {name for name, *_ in DEFAULT_MIX}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in known:
+            raise argparse.ArgumentTypeError(
+                f"unknown scenario {name!r}, expected one of {sorted(known)}"
+            )
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="generate")
+    parser.add_argument(
+        "--mix", type=parse_mix, help="Scenario weights, e.g. status=4,reschedule=1"
+    )
+    parser.add_argument(
+        "--llm-latency",
+        default="lognormal:0.8,0.4",
+        help="Latency of each model call (fixed / uniform / normal / lognormal / exponential)",
+    )
+    parser.add_argument(
+        "--token-latency", default="fixed:0.01", help="Delay between streamed tokens"
+    )
+    parser.add_argument(
+        "--backend-url", help="Use a running mock API instead of the in-process one"
+    )
+    parser.add_argument(
+        "--cold",
+        action="store_true",
+        help="Disable the intent router, answer cache and tool cache",
+    )
+    parser.add_argument("--no-single-flight", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        run_load(
+            concurrency=args.concurrency,
+            requests=args.requests,
+            endpoint=args.endpoint,
+            mix=args.mix,
+            llm_latency=args.llm_latency,
+            token_latency=args.token_latency,
+            backend_url=args.backend_url,
+            cold=args.cold,
+            single_flight_enabled=not args.no_single_flight,
+            seed=args.seed,
+        )
+    )
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -78,6 +78,18 @@ class PortScheduleRequest(BaseModel):
     user_role: str
 
 
+class BookingStatusBatchRequest(BaseModel):
+    booking_ids: List[str]
+    user_id: str
+
+
+class PortScheduleBatchRequest(BaseModel):
+    dates: List[str]
+    terminal_id: str = "T1"
+    user_id: Optional[str] = None
+    user_role: Optional[str] = None
+
+
 class ScheduleSlot(BaseModel):
     hour_start: str
     max_capacity: int
@@ -530,6 +542,75 @@ async def get_port_schedule(
     return {"date": request.date, "schedule": schedule}
 
 
+@app.post("/api/internal/tools/booking-status/batch")
+async def get_booking_status_batch(
+    request: BookingStatusBatchRequest, authorization: Optional[str] = Header(None)
+):
+    """Get the status of several bookings at once
+
+    Reference contract for batched tool calls: every requested ID gets a
+    result carrying the status code its single call would have returned.
+    """
+    verify_token(authorization)
+
+    results = []
+    for booking_id in dict.fromkeys(request.booking_ids):
+        booking = BOOKINGS_DB.get(booking_id)
+
+        if not booking:
+            results.append(
+                {
+                    "booking_id": booking_id,
+                    "status_code": 404,
+                    "error": f"Booking {booking_id} not found",
+                }
+            )
+        elif booking["user_id"] != request.user_id:
+            results.append(
+                {
+                    "booking_id": booking_id,
+                    "status_code": 403,
+                    "error": "You don't have access to this booking",
+                }
+            )
+        else:
+            results.append(
+                {
+                    "booking_id": booking_id,
+                    "status_code": 200,
+                    "booking": {
+                        "booking_id": booking["booking_id"],
+                        "timeslot": booking["timeslot"],
+                        "status": booking["status"],
+                    },
+                }
+            )
+
+    return {"results": results}
+
+
+@app.post("/api/internal/tools/port-schedule/batch")
+async def get_port_schedule_batch(
+    request: PortScheduleBatchRequest, authorization: Optional[str] = Header(None)
+):
+    """Get port schedules for a terminal on several dates at once"""
+    verify_token(authorization)
+
+    terminal_schedules = TERMINAL_SCHEDULES.get(request.terminal_id)
+
+    if not terminal_schedules:
+        raise HTTPException(
+            status_code=404, detail=f"Terminal {request.terminal_id} not found"
+        )
+
+    return {
+        "schedules": [
+            {"date": date, "schedule": terminal_schedules.get(date, [])}
+            for date in dict.fromkeys(request.dates)
+        ]
+    }
+
+
 # ============================================================================
 # ADDITIONAL ENDPOINTS (for future expansion)
 # ============================================================================
@@ -673,6 +754,8 @@ if __name__ == "__main__":
     print("  • POST /api/internal/tools/booking-status")
     print("  • POST /api/internal/tools/user-bookings")
     print("  • POST /api/internal/tools/port-schedule")
+    print("  • POST /api/internal/tools/booking-status/batch")
+    print("  • POST /api/internal/tools/port-schedule/batch")
     print()
     print("Sample bookings:")
     for bid, booking in list(BOOKINGS_DB.items())[:3]:
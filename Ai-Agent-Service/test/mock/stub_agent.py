@@ -0,0 +1,165 @@
+"""
+Stub Agent
+
+Implements AgentInterface without calling an LLM, for load testing the
+service without spending Gemini quota. Every model call sleeps for a latency
+drawn from a configurable distribution, and the function calls the model
+would make are scripted per message. Scripted calls go through the real tool
+functions, so the backend client, tool cache and single-flight behave as in
+production.
+"""
+
+import asyncio
+import inspect
+import random
+import re
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from agents.base import AgentInterface
+from models import ChatMessage
+from tools import TOOLS
+
+ToolCall = Tuple[str, Dict[str, str]]
+
+
+class LatencyDistribution:
+    """Samples latencies in seconds from a spec such as "lognormal:0.8,0.5"
+
+    Supported specs:
+        fixed:SECONDS
+        uniform:LOW,HIGH
+        normal:MEAN,STDDEV
+        lognormal:MEDIAN,SIGMA
+        exponential:MEAN
+    """
+
+    ARITY = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+
+    def __init__(
+        self,
+        kind: str,
+        params: Tuple[float, ...],
+        rng: Optional[random.Random] = None,
+    ):
+        if kind not in self.ARITY:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        if len(params) != self.ARITY[kind]:
+            raise ValueError(f"{kind} takes {self.ARITY[kind]} parameter(s)")
+        self.kind = kind
+        self.params = params
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def parse(cls, spec: str, rng: Optional[random.Random] = None):
+        kind, _, raw = spec.partition(":")
+        params = tuple(float(p) for p in raw.split(",")) if raw else ()
+        return cls(kind.strip().lower(), params, rng)
+
+    def sample(self) -> float:
+        rng, p = self.rng, self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            # Parametrised by the median, which is what latency reports show
+            value = p[0] * rng.lognormvariate(0.0, p[1])
+        else:
+            value = rng.expovariate(1.0 / p[0])
+        return max(value, 0.0)
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+
+class ScriptedTurn:
+    """What the stub model does for messages matching a pattern
+
+    Each entry of `rounds` is one model response: the function calls it
+    requests, run concurrently. A final model call then returns `answer`.
+    """
+
+    def __init__(self, pattern: str, rounds: List[List[ToolCall]], answer: str):
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.rounds = rounds
+        self.answer = answer
+
+
+class StubAgent(AgentInterface):
+    """Scripted, latency-simulating stand-in for the LLM agents"""
+
+    def __init__(
+        self,
+        scripts: Sequence[ScriptedTurn],
+        llm_latency: LatencyDistribution,
+        token_latency: Optional[LatencyDistribution] = None,
+        on_stage: Optional[Callable[[str, float], None]] = None,
+    ):
+        self.scripts = list(scripts)
+        self.llm_latency = llm_latency
+        self.token_latency = token_latency or LatencyDistribution("fixed", (0.0,))
+        self.on_stage = on_stage or (lambda stage, seconds: None)
+        self.fallback = ScriptedTurn(".*", [], "I can help with port bookings.")
+
+    def _script_for(self, message: str) -> ScriptedTurn:
+        for script in self.scripts:
+            if script.pattern.search(message):
+                return script
+        return self.fallback
+
+    async def _model_call(self) -> None:
+        started = time.perf_counter()
+        await asyncio.sleep(self.llm_latency.sample())
+        self.on_stage("llm", time.perf_counter() - started)
+
+    async def _call_tool(self, name: str, args: Dict[str, str], user_id: str):
+        tool = TOOLS[name]
+        if "user_id" in inspect.signature(tool).parameters:
+            args = {"user_id": user_id, **args}
+
+        started = time.perf_counter()
+        try:
+            return await tool(**args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.on_stage("tool", elapsed)
+            self.on_stage(f"tool:{name}", elapsed)
+
+    async def _run_rounds(self, script: ScriptedTurn, user_id: str) -> None:
+        for calls in script.rounds:
+            await self._model_call()
+            # Like the real agent, failed calls are handed back to the model
+            await asyncio.gather(
+                *(self._call_tool(name, args, user_id) for name, args in calls),
+                return_exceptions=True,
+            )
+
+    async def generate(
+        self,
+        message: str,
+        chat_history: List[ChatMessage],
+        user_id: str,
+        tools: List,
+    ) -> str:
+        script = self._script_for(message)
+        await self._run_rounds(script, user_id)
+        await self._model_call()
+        return script.answer
+
+    async def stream(
+        self,
+        message: str,
+        chat_history: List[ChatMessage],
+        user_id: str,
+        tools: List,
+    ) -> AsyncIterator[str]:
+        script = self._script_for(message)
+        await self._run_rounds(script, user_id)
+        await self._model_call()
+        for i, word in enumerate(script.answer.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_latency.sample())
+            yield word if i == 0 else f" {word}"
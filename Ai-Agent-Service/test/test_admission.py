@@ -0,0 +1,126 @@
+"""
+Unit tests for the priority admission controller
+
+Run with: pytest test/test_admission.py -v
+"""
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import main
+from admission import AdmissionController, AdmissionRejected, PriorityClass
+from answer_cache import AnswerCache
+from router import IntentRouter
+
+
+def make_controller(max_concurrency=1, max_queue=8, max_wait=1.0):
+    return AdmissionController(
+        max_concurrency=max_concurrency,
+        classes=[
+            PriorityClass("operator", 0, max_queue, max_wait),
+            PriorityClass("carrier", 2, max_queue, max_wait),
+        ],
+        default_class="carrier",
+    )
+
+
+class TestAdmissionController:
+    """Test priority ordering, queue bounds and queue-time limits"""
+
+    def test_operators_are_served_before_queued_carriers(self):
+        controller = make_controller()
+        order = []
+
+        async def request(role, name):
+            async with await controller.acquire(role):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            holder = await controller.acquire("carrier")
+            tasks = [
+                asyncio.create_task(request("carrier", "carrier-1")),
+                asyncio.create_task(request("transiter", "carrier-2")),
+            ]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(request("operator", "operator")))
+            await asyncio.sleep(0)
+            holder.release()
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+
+        assert order == ["operator", "carrier-1", "carrier-2"]
+
+    def test_full_queue_is_rejected_with_retry_after(self):
+        controller = make_controller(max_queue=1)
+
+        async def run():
+            await controller.acquire("carrier")
+            waiting = asyncio.create_task(controller.acquire("carrier"))
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as rejected:
+                await controller.acquire("carrier")
+            waiting.cancel()
+            return rejected.value
+
+        rejected = asyncio.run(run())
+
+        assert rejected.retry_after >= 1
+        assert controller.stats()["classes"]["carrier"]["rejected_full"] == 1
+
+    def test_wait_is_bounded(self):
+        controller = make_controller(max_wait=0.05)
+
+        async def run():
+            await controller.acquire("operator")
+            with pytest.raises(AdmissionRejected):
+                await controller.acquire("carrier")
+
+        asyncio.run(run())
+
+        carrier = controller.stats()["classes"]["carrier"]
+        assert carrier["timed_out"] == 1
+        assert carrier["queue_depth"] == 0
+
+    def test_slot_is_passed_on_when_a_waiter_gives_up(self):
+        controller = make_controller(max_wait=0.05)
+
+        async def run():
+            holder = await controller.acquire("carrier")
+            with pytest.raises(AdmissionRejected):
+                await controller.acquire("carrier")
+            holder.release()
+            ticket = await asyncio.wait_for(controller.acquire("carrier"), 0.5)
+            ticket.release()
+
+        asyncio.run(run())
+
+        assert controller.stats()["in_use"] == 0
+
+
+class TestOverloadResponse:
+    """Test the 503 returned when a request is not admitted"""
+
+    def test_generate_returns_503_with_retry_after(self, monkeypatch):
+        monkeypatch.setattr(
+            main, "admission", make_controller(max_concurrency=0, max_queue=0)
+        )
+        monkeypatch.setattr(main, "answer_cache", AnswerCache(tools=main.TOOLS))
+        monkeypatch.setattr(main, "router", IntentRouter(enabled=False))
+        client = TestClient(main.app)
+
+        for path in ("/api/chat", "/api/ai/generate/stream"):
+            response = client.post(
+                path,
+                json={
+                    "chat_id": "c1",
+                    "user_id": "U456",
+                    "user_role": "carrier",
+                    "message": "Hi",
+                    "messages": [],
+                },
+            )
+
+            assert response.status_code == 503
+            assert int(response.headers["Retry-After"]) >= 1
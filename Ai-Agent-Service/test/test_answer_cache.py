@@ -0,0 +1,127 @@
+"""
+Unit tests for the answer cache
+
+Run with: pytest test/test_answer_cache.py -v
+"""
+
+import asyncio
+from answer_cache import (
+    AnswerCache,
+    anchor_tokens,
+    is_follow_up,
+    normalize_message,
+    recording,
+    tracked,
+)
+from models import ChatMessage
+
+
+def make_cache(schedule):
+    """Answer cache over a single fake port schedule tool"""
+
+    @tracked("get_port_schedule")
+    async def get_port_schedule(date: str):
+        return dict(schedule)
+
+    return (
+        AnswerCache(tools={"get_port_schedule": get_port_schedule}),
+        get_port_schedule,
+    )
+
+
+def answer(cache, tool, user_id, message, text, history=()):
+    """Simulate an agent answering `message` after calling the tool"""
+
+    async def run():
+        with recording() as dependencies:
+            await tool(date="2024-02-07")
+        cache.store(user_id, message, history, text, dependencies)
+
+    asyncio.run(run())
+
+
+def lookup(cache, user_id, message, history=()):
+    return asyncio.run(cache.lookup(user_id, message, history))
+
+
+def agent_turn(text: str) -> ChatMessage:
+    return ChatMessage(
+        sender="agent", message=text, index=1, created_at="2024-02-07T10:00:00Z"
+    )
+
+
+class TestNormalization:
+    """Test message normalization and anchors"""
+
+    def test_normalize(self):
+        assert normalize_message("  Status of BK123?? ") == "status of bk123"
+
+    def test_anchor_tokens(self):
+        assert anchor_tokens("availability tomorrow at 14") == ("14", "tomorrow")
+
+    def test_follow_ups(self):
+        assert is_follow_up("yes please")
+        assert is_follow_up("what about tomorrow")
+        assert is_follow_up("and at 14")
+        assert not is_follow_up("status of bk123")
+        assert not is_follow_up("how busy is the port today")
+
+
+class TestAnswerCache:
+    """Test lookups, near-duplicates and invalidation"""
+
+    def test_exact_and_near_duplicate_hits(self):
+        cache, tool = make_cache({"booked": 3})
+        answer(
+            cache, tool, "U456", "What is the availability tomorrow?", "Plenty of room"
+        )
+
+        assert lookup(cache, "U456", "what is the availability tomorrow") == (
+            "Plenty of room"
+        )
+        assert lookup(cache, "U456", "What is the availability for tomorrow?") == (
+            "Plenty of room"
+        )
+        assert cache.stats()["exact_hits"] == 1
+        assert cache.stats()["near_hits"] == 1
+
+    def test_different_anchor_or_user_misses(self):
+        cache, tool = make_cache({"booked": 3})
+        answer(cache, tool, "U456", "Status of BK123", "BK123 is confirmed")
+
+        assert lookup(cache, "U456", "Status of BK124") is None
+        assert lookup(cache, "U789", "Status of BK123") is None
+
+    def test_follow_ups_only_hit_after_the_same_answer(self):
+        cache, tool = make_cache({"booked": 3})
+        offer = [agent_turn("Shall I check the 14:00 slot?")]
+        answer(cache, tool, "U456", "Yes please", "14:00 has room", offer)
+
+        other = [agent_turn("Shall I cancel BK123?")]
+        assert lookup(cache, "U456", "Yes please", other) is None
+        assert lookup(cache, "U456", "Yes please", offer) == "14:00 has room"
+
+    def test_questions_hit_after_any_answer(self):
+        cache, tool = make_cache({"booked": 3})
+        first = [agent_turn("Hello! How can I help?")]
+        answer(cache, tool, "U456", "Status of BK123", "BK123 is confirmed", first)
+
+        later = [agent_turn("BK123 is confirmed")]
+        assert lookup(cache, "U456", "Status of BK123", later) == "BK123 is confirmed"
+        assert lookup(cache, "U456", "Status of BK123") == "BK123 is confirmed"
+
+    def test_answers_without_tool_calls_are_not_stored(self):
+        cache, _ = make_cache({"booked": 3})
+        cache.store("U456", "Thanks!", [], "You're welcome", [])
+
+        assert cache.stats()["entries"] == 0
+
+    def test_invalidated_when_tool_data_changes(self):
+        schedule = {"booked": 3}
+        cache, tool = make_cache(schedule)
+        answer(cache, tool, "U456", "Availability today?", "3 slots booked")
+
+        schedule["booked"] = 4
+
+        assert lookup(cache, "U456", "Availability today?") is None
+        assert cache.stats()["invalidations"] == 1
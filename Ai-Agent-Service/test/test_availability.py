@@ -0,0 +1,192 @@
+"""
+Unit tests for the availability index and the find_availability tool
+
+Run with: pytest test/test_availability.py -v
+"""
+
+import asyncio
+import pytest
+import tools
+from answer_cache import AnswerCache, recording
+from availability import UNKNOWN, AvailabilityIndex
+from models import PortSchedule, ScheduleSlot
+
+
+def schedule(date: str, *slots) -> PortSchedule:
+    return PortSchedule(
+        date=date,
+        schedule=[
+            ScheduleSlot(
+                hour_start=hour,
+                max_capacity=capacity,
+                booked_capacity=booked,
+                late_capacity=0,
+            )
+            for hour, capacity, booked in slots
+        ],
+    )
+
+
+DAY_1 = schedule("2024-02-07", ("08", 10, 10), ("09", 10, 8), ("10", 10, 9))
+DAY_2 = schedule("2024-02-08", ("08", 10, 2), ("09", 10, 4), ("10", 10, 10))
+
+
+class TestAvailabilityIndex:
+    """Test the date x hour matrix and its queries"""
+
+    def test_free_capacity_matrix(self):
+        index = AvailabilityIndex()
+        index.update(DAY_1)
+
+        free = index.free(["2024-02-07", "2024-02-09"])
+
+        assert free[0, 8:11].tolist() == [0, 2, 1]
+        assert free[0, 11] == 0  # no slot at 11: closed
+        assert (free[1] == UNKNOWN).all()
+
+    def test_updates_replace_rows(self):
+        index = AvailabilityIndex()
+        index.update(DAY_1)
+        index.update(schedule("2024-02-07", ("08", 10, 3)))
+
+        assert index.free(["2024-02-07"])[0, 8:10].tolist() == [7, 0]
+        assert index.stats()["dates"] == 1
+
+    def test_next_and_best_windows(self):
+        index = AvailabilityIndex()
+        index.update(DAY_1)
+        index.update(DAY_2)
+        dates = ["2024-02-07", "2024-02-08"]
+
+        single = index.windows(dates)
+        assert index.next_available(single, trucks=2) == (0, 9)
+        assert index.best_window(single, trucks=2) == (1, 8)
+
+        pairs = index.windows(dates, hours=2)
+        assert pairs[1, 8] == 6
+        assert index.next_available(pairs, trucks=5) == (1, 8)
+        assert index.next_available(pairs, trucks=7) is None
+
+        late = index.windows(dates, hour_from=9, hour_to=9)
+        assert index.best_window(late, trucks=1) == (1, 9)
+
+    def test_fill_level(self):
+        index = AvailabilityIndex()
+        index.update(DAY_2)
+        index.update(schedule("2024-02-09"))
+
+        levels = index.fill_level(["2024-02-08", "2024-02-09", "2024-02-10"])
+
+        assert levels == [0.533, None, None]
+
+    def test_reuses_oldest_row_when_full(self):
+        index = AvailabilityIndex(max_dates=2)
+        index.update(DAY_1)
+        index.update(DAY_2)
+        index.update(schedule("2024-02-09", ("08", 5, 0)))
+
+        assert index.missing(["2024-02-07", "2024-02-08"], max_age=60) == ["2024-02-07"]
+        assert index.stats()["evictions"] == 1
+
+    def test_parses_hours_like_the_tools(self):
+        index = AvailabilityIndex()
+        odd = schedule(
+            "2024-02-07", ("8:00", 10, 4), ("9", 10, 5), ("noon", 10, 0), ("24", 9, 0)
+        )
+
+        index.update(odd)
+
+        assert index.free(["2024-02-07"])[0, 7:11].tolist() == [0, 6, 5, 0]
+
+    def test_odd_slots_do_not_break_the_schedule_tool(self, monkeypatch):
+        monkeypatch.setattr(tools.tool_cache, "enabled", False)
+        monkeypatch.setattr(tools.settings, "tool_batching_enabled", False)
+        monkeypatch.setattr(tools, "availability_index", AvailabilityIndex())
+        odd = schedule("2024-02-07", ("8:00", 10, 4), ("noon", 10, 0))
+
+        async def fetch(date: str) -> PortSchedule:
+            return odd
+
+        monkeypatch.setattr(tools, "_fetch_port_schedule", fetch)
+
+        assert asyncio.run(tools.get_port_schedule(date="2024-02-07")) == odd
+        assert tools.availability_index.free(["2024-02-07"])[0, 8] == 6
+
+
+class TestFindAvailability:
+    """Test the agent tool on top of the index"""
+
+    @pytest.fixture
+    def fetched(self, monkeypatch):
+        calls = []
+        data = {DAY_1.date: DAY_1, DAY_2.date: DAY_2}
+
+        async def get_port_schedule(date: str) -> PortSchedule:
+            calls.append(date)
+            return data.get(date, schedule(date))
+
+        monkeypatch.setattr(tools, "get_port_schedule", get_port_schedule)
+        monkeypatch.setattr(tools, "availability_index", AvailabilityIndex())
+        return calls
+
+    def test_answers_in_one_call(self, fetched):
+        result = asyncio.run(
+            tools.find_availability("2024-02-07", "2024-02-09", trucks=3, hours=2)
+        )
+
+        assert fetched == ["2024-02-07", "2024-02-08", "2024-02-09"]
+        assert result.next_available.date == "2024-02-08"
+        assert result.next_available.hour_start == "08"
+        assert result.next_available.free_capacity == 6
+        assert result.best_window == result.next_available
+        assert result.fill_level == [0.9, 0.533, None]
+
+    def test_known_dates_are_not_fetched_again(self, fetched):
+        asyncio.run(tools.find_availability("2024-02-07", "2024-02-08"))
+        asyncio.run(tools.find_availability("2024-02-07", "2024-02-09"))
+
+        assert fetched == ["2024-02-07", "2024-02-08", "2024-02-09"]
+
+    def test_no_room(self, fetched):
+        result = asyncio.run(
+            tools.find_availability("2024-02-07", "2024-02-08", trucks=9)
+        )
+        assert result.next_available is None
+        assert result.best_window is None
+
+    def test_hour_arguments_match_the_range_tool(self, fetched):
+        result = asyncio.run(
+            tools.find_availability(
+                "2024-02-07", "2024-02-08", trucks=3, hour_from="09:00", hour_to="10"
+            )
+        )
+        assert result.next_available.date == "2024-02-08"
+        assert result.next_available.hour_start == "09"
+
+    def test_rejects_bad_arguments(self, fetched):
+        for kwargs in ({"trucks": 0}, {"hour_from": "25"}, {"hour_to": "noon"}):
+            with pytest.raises(ValueError):
+                asyncio.run(
+                    tools.find_availability("2024-02-07", "2024-02-08", **kwargs)
+                )
+        assert fetched == []
+
+    def test_cached_answers_depend_on_every_date(self, fetched):
+        cache = AnswerCache(tools={"find_availability": tools.find_availability})
+        # Index both dates first, so the recorded call fetches neither
+        asyncio.run(tools.find_availability("2024-02-07", "2024-02-08"))
+
+        async def answer():
+            with recording() as dependencies:
+                await tools.find_availability("2024-02-07", "2024-02-08", trucks=3)
+            cache.store("U456", "Room for 3 trucks today?", [], "Yes", dependencies)
+
+        def lookup():
+            return asyncio.run(cache.lookup("U456", "Room for 3 trucks today?", []))
+
+        asyncio.run(answer())
+        assert lookup() == "Yes"
+        # Another call refreshes one of the dates
+        tools.availability_index.update(schedule("2024-02-08", ("08", 10, 10)))
+
+        assert lookup() is None
@@ -0,0 +1,118 @@
+"""
+Unit tests for batching tool calls into bulk backend requests
+
+Run with: pytest test/test_batching.py -v
+"""
+
+import asyncio
+import os
+import sys
+import httpx
+import pytest
+import tools
+from backend import backend
+from batching import BatchLoader
+from config import get_settings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "mock"))
+import mock_api  # noqa: E402
+
+
+class TestBatchLoader:
+    """Test collecting loads into batches"""
+
+    def test_loads_in_one_window_share_a_batch(self):
+        calls = []
+
+        async def batch_fn(keys):
+            calls.append(keys)
+            return {key: key * 2 for key in keys}
+
+        async def run():
+            loader = BatchLoader(batch_fn, window=0.01)
+            results = await asyncio.gather(*(loader.load(k) for k in (1, 2, 2, 3)))
+            return loader, results
+
+        loader, results = asyncio.run(run())
+
+        assert results == [2, 4, 4, 6]
+        assert calls == [[1, 2, 3]]
+        assert loader.stats()["largest_batch"] == 3
+
+    def test_full_batch_is_sent_early(self):
+        calls = []
+
+        async def batch_fn(keys):
+            calls.append(keys)
+            return {key: key for key in keys}
+
+        async def run():
+            loader = BatchLoader(batch_fn, window=10.0, max_batch=2)
+            return await asyncio.wait_for(
+                asyncio.gather(loader.load(1), loader.load(2)), timeout=1
+            )
+
+        assert asyncio.run(run()) == [1, 2]
+        assert calls == [[1, 2]]
+
+    def test_errors_are_per_key(self):
+        async def batch_fn(keys):
+            return {"ok": "value", "bad": ValueError("bad key")}
+
+        async def run():
+            loader = BatchLoader(batch_fn, window=0.0)
+            return await asyncio.gather(
+                loader.load("ok"),
+                loader.load("bad"),
+                loader.load("missing"),
+                return_exceptions=True,
+            )
+
+        ok, bad, missing = asyncio.run(run())
+        assert ok == "value"
+        assert isinstance(bad, ValueError)
+        assert isinstance(missing, KeyError)
+
+
+class TestBatchedTools:
+    """Test the tools against the bulk endpoints of the mock API"""
+
+    @pytest.fixture
+    def batching(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "tool_batching_enabled", True)
+        monkeypatch.setattr(tools.tool_cache, "enabled", False)
+        asyncio.run(backend.start(transport=httpx.ASGITransport(app=mock_api.app)))
+        yield
+        asyncio.run(backend.close())
+
+    def test_booking_statuses_are_fetched_together(self, batching):
+        async def run():
+            before = tools.booking_status_loader.batches
+            results = await asyncio.gather(
+                tools.get_booking_status("BK123", "U456"),
+                tools.get_booking_status("BK456", "U456"),
+                tools.get_booking_status("BK999", "U456"),
+                return_exceptions=True,
+            )
+            return results, tools.booking_status_loader.batches - before
+
+        (first, second, forbidden), batches = asyncio.run(run())
+
+        assert first.booking_id == "BK123"
+        assert second.booking_id == "BK456"
+        # Items the backend refuses fail like their single call would
+        assert isinstance(forbidden, httpx.HTTPStatusError)
+        assert forbidden.response.status_code == 403
+        assert batches == 1
+
+    def test_port_schedules_are_fetched_together(self, batching):
+        async def run():
+            return await asyncio.gather(
+                tools.get_port_schedule("2024-02-07"),
+                tools.get_port_schedule("2024-02-08"),
+            )
+
+        first, second = asyncio.run(run())
+
+        assert first.date == "2024-02-07" and first.schedule
+        assert second.date == "2024-02-08" and second.schedule
@@ -0,0 +1,112 @@
+"""
+Unit tests for the tool result cache
+
+Run with: pytest test/test_cache.py -v
+"""
+
+import asyncio
+import httpx
+import pytest
+from cache import CachePolicy, LRUCacheBackend, ToolCache
+
+
+def make_cache(**backend_kwargs) -> ToolCache:
+    return ToolCache(
+        LRUCacheBackend(**backend_kwargs),
+        policies={
+            "lookup": CachePolicy(ttl=60, negative_ttl=60, user_arg="user_id"),
+        },
+    )
+
+
+def not_found(booking_id: str) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://backend/booking-status")
+    response = httpx.Response(404, request=request)
+    return httpx.HTTPStatusError(
+        f"{booking_id} not found", request=request, response=response
+    )
+
+
+class TestToolCache:
+    """Test caching behaviour of decorated tools"""
+
+    def test_hit_after_miss(self):
+        cache = make_cache()
+        calls = []
+
+        @cache.cached("lookup")
+        async def lookup(booking_id: str, user_id: str):
+            calls.append(booking_id)
+            return {"booking_id": booking_id}
+
+        async def run():
+            await lookup("BK123", "U456")
+            await lookup(booking_id="BK123", user_id="U456")
+
+        asyncio.run(run())
+
+        assert calls == ["BK123"]
+        assert cache.stats()["tools"]["lookup"]["hits"] == 1
+        assert cache.stats()["tools"]["lookup"]["misses"] == 1
+
+    def test_scoped_per_user(self):
+        cache = make_cache()
+        calls = []
+
+        @cache.cached("lookup")
+        async def lookup(booking_id: str, user_id: str):
+            calls.append(user_id)
+            return booking_id
+
+        async def run():
+            await lookup("BK123", "U456")
+            await lookup("BK123", "U789")
+            await cache.invalidate(user_id="U456")
+            await lookup("BK123", "U456")
+            await lookup("BK123", "U789")
+
+        asyncio.run(run())
+
+        assert calls == ["U456", "U789", "U456"]
+
+    def test_negative_caching(self):
+        cache = make_cache()
+        calls = []
+
+        @cache.cached("lookup")
+        async def lookup(booking_id: str, user_id: str):
+            calls.append(booking_id)
+            raise not_found(booking_id)
+
+        async def run():
+            errors = []
+            for _ in range(3):
+                with pytest.raises(httpx.HTTPStatusError) as raised:
+                    await lookup("BK999999", "U456")
+                errors.append(raised.value)
+            return errors
+
+        errors = asyncio.run(run())
+
+        assert calls == ["BK999999"]
+        assert cache.stats()["tools"]["lookup"]["negative_hits"] == 2
+        # Each hit raises a fresh error, so no traceback accumulates on the entry
+        assert len({id(e) for e in errors}) == 3
+        assert errors[2].response.status_code == 404
+
+    def test_lru_entry_bound(self):
+        cache = make_cache(max_entries=2)
+
+        @cache.cached("lookup")
+        async def lookup(booking_id: str, user_id: str):
+            return booking_id
+
+        async def run():
+            for booking_id in ["BK1", "BK2", "BK3"]:
+                await lookup(booking_id, "U456")
+
+        asyncio.run(run())
+
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert stats["evictions"] == 1
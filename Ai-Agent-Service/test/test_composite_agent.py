@@ -0,0 +1,160 @@
+"""
+Unit tests for hedging and failover in the composite agent
+
+Run with: pytest test/test_composite_agent.py -v
+"""
+
+import asyncio
+import time
+import pytest
+from agents.base import AgentInterface
+from agents.composite_agent import CompositeAgent
+from latency import LatencyHistogram
+
+
+class TimedAgent(AgentInterface):
+    """Answers after a delay, or fails"""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.started = 0
+        self.cancelled = 0
+
+    async def generate(self, message, chat_history, user_id, tools):
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return f"{self.name}: {message}"
+
+    async def stream(self, message, chat_history, user_id, tools):
+        self.started += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        for word in [self.name, ":", " ", message]:
+            yield word
+
+
+@pytest.fixture
+def settings():
+    def configure(agent, **overrides):
+        agent.settings = agent.settings.model_copy(update=overrides)
+        return agent
+
+    return configure
+
+
+def ask(agent, message="hi"):
+    return asyncio.run(agent.generate(message, [], "U456", []))
+
+
+class TestHedging:
+    """Test hedge requests to the secondary provider"""
+
+    def test_fast_primary_is_not_hedged(self, settings):
+        primary, secondary = TimedAgent("gemini", 0.01), TimedAgent("llama")
+        agent = settings(
+            CompositeAgent([("gemini", primary), ("llama", secondary)]),
+            hedge_initial_delay=0.2,
+        )
+
+        assert ask(agent) == "gemini: hi"
+        assert secondary.started == 0
+
+    def test_slow_primary_is_hedged_and_cancelled(self, settings):
+        primary, secondary = TimedAgent("gemini", 1.0), TimedAgent("llama", 0.01)
+        agent = settings(
+            CompositeAgent([("gemini", primary), ("llama", secondary)]),
+            hedge_initial_delay=0.05,
+        )
+
+        started = time.perf_counter()
+        assert ask(agent) == "llama: hi"
+        assert time.perf_counter() - started < 0.5
+        assert primary.cancelled == 1
+        assert agent.stats()["hedges"] == 1
+
+    def test_hedge_delay_follows_latency_percentile(self, settings):
+        agent = settings(
+            CompositeAgent([("gemini", TimedAgent("gemini"))]),
+            hedge_min_samples=10,
+            hedge_min_delay=0.1,
+            hedge_max_delay=30.0,
+        )
+        provider = agent.providers[0]
+        for _ in range(95):
+            provider.latency["generate"].observe(1.0)
+        for _ in range(5):
+            provider.latency["generate"].observe(8.0)
+
+        assert 1.0 <= agent.hedge_delay(provider) < 1.3
+
+
+class TestFailover:
+    """Test failing over when a provider errors or is unhealthy"""
+
+    def test_failure_fails_over_immediately(self, settings):
+        primary, secondary = TimedAgent("gemini", fail=True), TimedAgent("llama")
+        agent = settings(
+            CompositeAgent([("gemini", primary), ("llama", secondary)]),
+            hedge_initial_delay=5.0,
+        )
+
+        assert ask(agent) == "llama: hi"
+        assert agent.stats()["failovers"] == 1
+
+    def test_unhealthy_provider_is_skipped_until_cooldown(self, settings):
+        primary, secondary = TimedAgent("gemini", fail=True), TimedAgent("llama")
+        agent = settings(
+            CompositeAgent([("gemini", primary), ("llama", secondary)]),
+            provider_failure_threshold=2,
+            provider_cooldown=60.0,
+        )
+
+        for _ in range(4):
+            assert ask(agent) == "llama: hi"
+
+        assert primary.started == 2
+        assert agent.stats()["providers"]["gemini"]["healthy"] is False
+
+    def test_all_providers_failing_raises(self):
+        agent = CompositeAgent(
+            [
+                ("gemini", TimedAgent("gemini", fail=True)),
+                ("llama", TimedAgent("llama", fail=True)),
+            ]
+        )
+
+        with pytest.raises(RuntimeError):
+            ask(agent)
+
+    def test_stream_fails_over_before_first_token(self):
+        agent = CompositeAgent(
+            [
+                ("gemini", TimedAgent("gemini", fail=True)),
+                ("llama", TimedAgent("llama")),
+            ]
+        )
+
+        async def collect():
+            return [c async for c in agent.stream("hi", [], "U456", [])]
+
+        assert "".join(asyncio.run(collect())) == "llama: hi"
+
+
+class TestLatencyHistogram:
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for seconds in (0.1, 0.2, 0.3, 5.0):
+            histogram.observe(seconds)
+
+        assert histogram.percentile(0.5) < 0.3
+        assert histogram.percentile(0.99) >= 5.0
+        assert LatencyHistogram().percentile(0.5) is None
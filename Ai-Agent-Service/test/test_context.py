@@ -0,0 +1,70 @@
+"""
+Unit tests for the token-budgeted conversation context builder
+
+Run with: pytest test/test_context.py -v
+"""
+
+from context import ContextBuilder, estimate_tokens
+from models import ChatMessage
+
+
+def history(*texts: str):
+    return [
+        ChatMessage(
+            sender="human" if i % 2 == 0 else "agent",
+            message=text,
+            index=i,
+            created_at=f"2024-02-07T10:{i:02d}:00Z",
+        )
+        for i, text in enumerate(texts)
+    ]
+
+
+class TestContextBuilder:
+    """Test packing, truncation and rolling summaries"""
+
+    def test_short_chat_fits_entirely(self):
+        builder = ContextBuilder(max_tokens=2000)
+        chat = history(*(f"message {i}" for i in range(30)))
+
+        context = builder.build(chat)
+
+        assert len(context.messages) == 30
+        assert context.summary is None
+
+    def test_budget_keeps_most_recent_turns(self):
+        builder = ContextBuilder(max_tokens=100, message_max_tokens=50)
+        chat = history(*("x" * 100 for _ in range(10)))
+
+        context = builder.build(chat)
+
+        assert [m.index for m in context.messages] == [7, 8, 9]
+        assert context.summary.count("\n") == 6
+
+    def test_long_message_is_truncated(self):
+        builder = ContextBuilder(max_tokens=1000, message_max_tokens=50)
+        chat = history("a" * 10_000)
+
+        context = builder.build(chat)
+
+        assert estimate_tokens(context.messages[0].message) <= 50
+        assert context.messages[0].message.endswith("[...truncated]")
+        assert chat[0].message == "a" * 10_000
+
+    def test_summary_is_rolled_forward(self):
+        summarized = []
+
+        def summarizer(messages):
+            summarized.append([m.index for m in messages])
+            return [m.message for m in messages]
+
+        builder = ContextBuilder(
+            max_tokens=40, message_max_tokens=20, summarizer=summarizer
+        )
+        chat = history(*(f"turn {i} " + "y" * 40 for i in range(6)))
+
+        builder.build(chat[:4])
+        builder.build(chat)
+
+        assert summarized == [[0, 1], [2, 3]]
+        assert builder.build(chat).summary.startswith("turn 0")
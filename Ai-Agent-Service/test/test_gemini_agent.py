@@ -0,0 +1,120 @@
+"""
+Unit tests for the Gemini agent tool loop with a scripted model
+
+Run with: pytest test/test_gemini_agent.py -v
+"""
+
+import asyncio
+import time
+import pytest
+from google.genai import types
+from agents.gemini_agent import GeminiAgent
+
+
+def call(name: str, **args) -> types.Part:
+    return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+
+def response(*parts: types.Part) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(content=types.Content(role="model", parts=list(parts)))
+        ]
+    )
+
+
+class ScriptedModels:
+    """Returns one scripted response per generate_content call"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.configs = []
+
+    async def generate_content(self, model, contents, config):
+        self.configs.append(config)
+        return self.responses.pop(0)
+
+
+class ScriptedClient:
+    def __init__(self, responses):
+        self.models = ScriptedModels(responses)
+        self.aio = self
+
+
+@pytest.fixture
+def agent():
+    agent = GeminiAgent()
+    agent.prompt_cache.enabled = False
+    return agent
+
+
+class TestToolLoop:
+    """Test the multi-round function calling loop"""
+
+    def test_function_calls_run_concurrently(self, agent):
+        agent.client = ScriptedClient(
+            [
+                response(
+                    call("get_booking_status", booking_id="BK123", user_id="U456"),
+                    call("get_booking_status", booking_id="BK456", user_id="U456"),
+                ),
+                response(types.Part(text="Both bookings are confirmed")),
+            ]
+        )
+
+        async def slow_tool(name, args):
+            await asyncio.sleep(0.2)
+            return {"booking_id": args["booking_id"], "status": "confirmed"}
+
+        agent._execute_function = slow_tool
+
+        started = time.perf_counter()
+        answer = asyncio.run(
+            agent.generate("Status of BK123 and BK456?", [], "U456", [])
+        )
+        elapsed = time.perf_counter() - started
+
+        assert answer == "Both bookings are confirmed"
+        assert elapsed < 0.35
+
+    def test_answer_forced_when_rounds_are_spent(self, agent):
+        agent.settings = agent.settings.model_copy(update={"agent_max_tool_rounds": 1})
+        agent.client = ScriptedClient(
+            [
+                response(call("get_port_schedule", date="2024-02-07")),
+                response(types.Part(text="Here is the schedule")),
+            ]
+        )
+
+        async def tool(name, args):
+            return {"date": args["date"], "slots": []}
+
+        agent._execute_function = tool
+
+        answer = asyncio.run(agent.generate("Schedule?", [], "U456", []))
+
+        assert answer == "Here is the schedule"
+        configs = agent.client.models.configs
+        assert configs[0] is agent.config
+        assert configs[1] is agent.final_config
+
+    def test_tools_cut_off_by_time_budget(self, agent):
+        agent.settings = agent.settings.model_copy(update={"agent_time_budget": 0.1})
+        agent.client = ScriptedClient(
+            [
+                response(call("get_port_schedule", date="2024-02-07")),
+                response(types.Part(text="The schedule is unavailable right now")),
+            ]
+        )
+
+        async def hanging_tool(name, args):
+            await asyncio.sleep(5)
+
+        agent._execute_function = hanging_tool
+
+        started = time.perf_counter()
+        answer = asyncio.run(agent.generate("Schedule?", [], "U456", []))
+
+        assert time.perf_counter() - started < 1
+        assert answer == "The schedule is unavailable right now"
+        assert agent.client.models.configs[1] is agent.final_config
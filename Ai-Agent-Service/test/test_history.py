@@ -0,0 +1,85 @@
+"""
+Unit tests for chat history parsing
+
+Run with: pytest test/test_history.py -v
+"""
+
+import json
+import pytest
+from pydantic import ValidationError
+from history import HistoryParser
+
+
+def body(count: int) -> bytes:
+    messages = [
+        {
+            "message_id": str(i),
+            "sender": "human" if i % 2 == 0 else "agent",
+            "message": f"message {i}, with {{braces}} and [brackets]",
+            "index": i,
+            "created_at": "2026-02-07T10:00:00+00:00",
+        }
+        for i in range(count)
+    ]
+    return json.dumps(messages, separators=(",", ":")).encode()
+
+
+class TestHistoryParser:
+    """Test reuse across turns and the tail mode"""
+
+    def test_parses_only_appended_messages(self):
+        parser = HistoryParser()
+
+        first, first_mode = parser.parse("c1", body(3))
+        second, second_mode = parser.parse("c1", body(5))
+
+        assert (first_mode, second_mode) == ("full", "incremental")
+        assert [m.index for m in second] == [0, 1, 2, 3, 4]
+        # Messages parsed on the first turn are reused, not rebuilt
+        assert second[0] is first[0]
+
+    def test_unchanged_history_is_not_parsed_again(self):
+        parser = HistoryParser()
+        parser.parse("c1", body(4))
+
+        messages, mode = parser.parse("c1", body(4))
+        # Callers may trim their copy without touching the kept one
+        messages.pop()
+
+        assert mode == "unchanged"
+        assert len(parser.parse("c1", body(4))[0]) == 4
+
+    def test_edited_history_is_parsed_in_full(self):
+        parser = HistoryParser()
+        parser.parse("c1", body(4))
+
+        edited = body(5).replace(b"message 1,", b"edited 1,")
+        messages, mode = parser.parse("c1", edited)
+
+        assert mode == "full"
+        assert messages[1].message.startswith("edited 1")
+
+    def test_tail_validates_only_the_last_messages(self):
+        parser = HistoryParser()
+
+        messages, mode = parser.parse("c1", body(100), tail=10)
+
+        assert mode == "tail"
+        assert [m.index for m in messages] == list(range(90, 100))
+        assert parser.stats()["chats"] == 0
+
+    def test_invalid_appended_message_raises(self):
+        parser = HistoryParser()
+        parser.parse("c1", body(2))
+
+        broken = body(2)[:-1] + b',{"sender":"robot"}]'
+        with pytest.raises(ValidationError):
+            parser.parse("c1", broken)
+
+    def test_keeps_a_bounded_number_of_chats(self):
+        parser = HistoryParser(max_chats=2)
+        for chat_id in ("c1", "c2", "c3"):
+            parser.parse(chat_id, body(2))
+
+        assert parser.parse("c1", body(2))[1] == "full"
+        assert parser.stats()["chats"] == 2
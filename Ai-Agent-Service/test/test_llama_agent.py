@@ -0,0 +1,142 @@
+"""
+Unit tests for the Ollama agent with a scripted client
+
+Run with: pytest test/test_llama_agent.py -v
+"""
+
+import asyncio
+import pytest
+import ollama
+from agents.llama_agent import LlamaAgent
+
+
+def reply(content: str = "", **tool_args) -> ollama.ChatResponse:
+    tool_calls = [
+        ollama.Message.ToolCall(
+            function=ollama.Message.ToolCall.Function(name=name, arguments=args)
+        )
+        for name, args in tool_args.items()
+    ]
+    return ollama.ChatResponse(
+        message=ollama.Message(
+            role="assistant", content=content, tool_calls=tool_calls or None
+        )
+    )
+
+
+class ScriptedOllama:
+    """Returns one scripted response per chat call and tracks concurrency"""
+
+    def __init__(self, responses, delay: float = 0.0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+    async def chat(self, model, messages, tools=None, stream=False):
+        self.calls.append({"messages": list(messages), "tools": tools})
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            response = self.responses.pop(0)
+        finally:
+            self.active -= 1
+
+        if not stream:
+            return response
+
+        async def chunks():
+            words = (response.message.content or "").split(" ")
+            for i, word in enumerate(words):
+                yield ollama.ChatResponse(
+                    message=ollama.Message(
+                        role="assistant",
+                        content=word if i == 0 else f" {word}",
+                        tool_calls=response.message.tool_calls if i == 0 else None,
+                    )
+                )
+
+        return chunks()
+
+
+@pytest.fixture
+def agent():
+    return LlamaAgent()
+
+
+class TestToolCalling:
+    """Test native tool calling through the chat API"""
+
+    def test_tool_results_are_sent_back(self, agent):
+        agent.client = ScriptedOllama(
+            [
+                reply(get_booking_status={"booking_id": "BK123", "user_id": "U999"}),
+                reply("BK123 is confirmed"),
+            ]
+        )
+        seen = []
+
+        async def fake_tool(name, args):
+            seen.append((name, args))
+            return {"booking_id": args["booking_id"], "status": "confirmed"}
+
+        agent._execute_function = fake_tool
+
+        answer = asyncio.run(agent.generate("Status of BK123?", [], "U456", []))
+
+        assert answer == "BK123 is confirmed"
+        # The requesting user wins over whatever the model filled in
+        assert seen == [
+            ("get_booking_status", {"booking_id": "BK123", "user_id": "U456"})
+        ]
+        tool_message = agent.client.calls[1]["messages"][-1]
+        assert tool_message["role"] == "tool"
+        assert tool_message["tool_name"] == "get_booking_status"
+        assert agent.client.calls[0]["tools"] == agent.tools
+
+    def test_final_round_disables_tools(self, agent):
+        agent.settings = agent.settings.model_copy(update={"agent_max_tool_rounds": 1})
+        agent.client = ScriptedOllama(
+            [reply(get_port_schedule={"date": "2024-02-08"}), reply("Here it is")]
+        )
+
+        async def fake_tool(name, args):
+            return {"date": args["date"], "slots": []}
+
+        agent._execute_function = fake_tool
+
+        assert asyncio.run(agent.generate("Schedule?", [], "U456", [])) == "Here it is"
+        assert agent.client.calls[1]["tools"] is None
+
+    def test_stream_yields_tokens_after_tool_round(self, agent):
+        agent.client = ScriptedOllama(
+            [reply(get_port_schedule={"date": "2024-02-08"}), reply("Slots are free")]
+        )
+
+        async def fake_tool(name, args):
+            return {"date": args["date"], "slots": []}
+
+        agent._execute_function = fake_tool
+
+        async def collect():
+            return [t async for t in agent.stream("Schedule?", [], "U456", [])]
+
+        assert asyncio.run(collect()) == ["Slots", " are", " free"]
+
+
+class TestConcurrency:
+    """Test the bound on concurrent model calls"""
+
+    def test_model_calls_are_bounded(self, agent):
+        agent.concurrency = asyncio.Semaphore(2)
+        agent.client = ScriptedOllama([reply("ok") for _ in range(6)], delay=0.05)
+
+        async def run():
+            return await asyncio.gather(
+                *(agent.generate("Hi", [], "U456", []) for _ in range(6))
+            )
+
+        assert asyncio.run(run()) == ["ok"] * 6
+        assert agent.client.peak == 2
@@ -0,0 +1,61 @@
+"""
+Unit tests for the load-test harness and the stub agent
+
+Run with: pytest test/test_load_harness.py -v
+"""
+
+import asyncio
+import random
+import pytest
+import main
+import load_test
+from stub_agent import LatencyDistribution
+
+
+class TestLatencyDistribution:
+    """Test parsing and sampling of latency specs"""
+
+    def test_parse_and_sample(self):
+        rng = random.Random(1)
+        assert LatencyDistribution.parse("fixed:0.25", rng).sample() == 0.25
+        uniform = LatencyDistribution.parse("uniform:0.1,0.2", rng)
+        assert all(0.1 <= uniform.sample() <= 0.2 for _ in range(100))
+        assert LatencyDistribution.parse("normal:0,1", rng).sample() >= 0
+
+    def test_rejects_unknown_specs(self):
+        with pytest.raises(ValueError):
+            LatencyDistribution.parse("gamma:1,2")
+        with pytest.raises(ValueError):
+            LatencyDistribution.parse("uniform:1")
+
+
+class TestRunLoad:
+    """Test a small in-process load run against the mock API"""
+
+    def test_reports_stages_and_restores_app(self):
+        agent = main.agent
+
+        report = asyncio.run(
+            load_test.run_load(
+                concurrency=4,
+                requests=20,
+                mix={"reschedule": 1, "compare": 1},
+                llm_latency="fixed:0.001",
+                cold=True,
+            )
+        )
+
+        assert report["completed"] == 20
+        assert report["errors"] == {}
+        for stage in ("total", "history", "llm", "tool", "tool:get_port_schedule"):
+            assert report["stages"][stage]["count"] > 0
+        assert report["stages"]["llm"]["count"] >= 40
+        assert report["throughput_rps"] > 0
+        assert main.agent is agent
+        assert main.answer_cache.enabled
+
+    def test_percentile_uses_nearest_rank(self):
+        values = [float(i) for i in range(1, 101)]
+        assert load_test.percentile(values, 50) == 50.0
+        assert load_test.percentile(values, 99) == 99.0
+        assert load_test.percentile([], 95) == 0.0
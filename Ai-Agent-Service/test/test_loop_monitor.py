@@ -0,0 +1,89 @@
+"""
+Unit tests for the event loop lag monitor
+
+Run with: pytest test/test_loop_monitor.py -v
+"""
+
+import asyncio
+import time
+from fastapi.testclient import TestClient
+import main
+from config import get_settings
+from loop_monitor import LoopMonitor
+from metrics import LOOP_BLOCKS, LOOP_LAG
+
+
+def blocking_call(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+class TestLoopMonitor:
+    """Test lag sampling and the debug watchdog"""
+
+    def test_measures_lag_without_blocking(self):
+        monitor = LoopMonitor(interval=0.01, block_threshold=0.05)
+
+        async def run():
+            monitor.start()
+            await asyncio.sleep(0.1)
+            await monitor.stop()
+
+        asyncio.run(run())
+
+        assert monitor.samples > 3
+        assert monitor.blocked == 0
+        assert not monitor.running
+
+    def test_counts_blocked_loop(self):
+        monitor = LoopMonitor(interval=0.01, block_threshold=0.05)
+        observed, blocks = LOOP_LAG.count(), LOOP_BLOCKS.value()
+
+        async def run():
+            monitor.start()
+            await asyncio.sleep(0.03)
+            blocking_call(0.15)
+            await asyncio.sleep(0.03)
+            await monitor.stop()
+
+        asyncio.run(run())
+
+        assert monitor.blocked == 1
+        assert monitor.max_lag >= 0.1
+        assert LOOP_LAG.count() - observed == monitor.samples
+        assert LOOP_BLOCKS.value() - blocks == 1
+        # Stacks are only captured in debug mode
+        assert len(monitor.stacks) == 0
+
+    def test_debug_mode_captures_the_blocking_stack(self):
+        monitor = LoopMonitor(interval=0.01, block_threshold=0.05, debug=True)
+
+        async def run():
+            monitor.start()
+            await asyncio.sleep(0.03)
+            blocking_call(0.2)
+            await asyncio.sleep(0.03)
+            await monitor.stop()
+
+        asyncio.run(run())
+
+        assert len(monitor.stacks) == 1
+        captured = monitor.stacks[0]
+        assert "blocking_call (test_loop_monitor.py:" in captured["stack"]
+        assert captured["blocked_ms"] >= 50
+
+
+class TestLoopEndpoint:
+    """Test the guarded admin endpoint"""
+
+    def test_reports_captured_stacks(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "admin_token", "secret")
+        monitor = LoopMonitor(debug=True)
+        monitor.stacks.append({"at": 0.0, "blocked_ms": 120.0, "stack": "a;b"})
+        monkeypatch.setattr(main, "loop_monitor", monitor)
+
+        response = TestClient(main.app).get(
+            "/api/ai/admin/loop", headers={"X-Admin-Token": "secret"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["stacks"][0]["stack"] == "a;b"
@@ -0,0 +1,239 @@
+"""
+Unit tests for the FastAPI routes with a fake agent
+
+Run with: pytest test/test_main.py -v
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from answer_cache import AnswerCache, tracked
+from router import IntentRouter
+
+
+class FakeAgent:
+    """Records the arguments of each generate call"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def generate(self, message, chat_history, user_id, tools):
+        self.calls.append({"message": message, "chat_history": chat_history})
+        return f"echo: {message}"
+
+    async def stream(self, message, chat_history, user_id, tools):
+        self.calls.append({"message": message, "chat_history": chat_history})
+        for word in ["echo:", " ", message]:
+            yield word
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    agent = FakeAgent()
+    monkeypatch.setattr(main, "agent", agent)
+    return agent
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "answer_cache", AnswerCache(tools=main.TOOLS))
+    monkeypatch.setattr(main, "router", IntentRouter(enabled=False))
+    return TestClient(main.app)
+
+
+class TestChatContract:
+    """Test the /api/chat contract used by the Laravel backend"""
+
+    def test_inline_history_skips_fetch(self, client, fake_agent, monkeypatch):
+        async def fail_fetch(chat_id):
+            raise AssertionError("history should not be fetched")
+
+        monkeypatch.setattr(main, "get_chat_messages", fail_fetch)
+
+        response = client.post(
+            "/api/chat",
+            json={
+                "chat_id": "chat_12",
+                "user_id": 7,
+                "user_name": "Carrier",
+                "user_role": "carrier",
+                "message": "Status of BK123",
+                "messages": [
+                    {
+                        "sender": "human",
+                        "message": "Hello",
+                        "index": 0,
+                        "created_at": "2026-02-07T10:00:00+00:00",
+                    },
+                    {
+                        "sender": "agent",
+                        "message": "Hi, how can I help?",
+                        "index": 1,
+                        "created_at": "2026-02-07T10:00:02+00:00",
+                    },
+                    {
+                        "sender": "human",
+                        "message": "Status of BK123",
+                        "index": 2,
+                        "created_at": "2026-02-07T10:01:00+00:00",
+                    },
+                ],
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"message": "echo: Status of BK123"}
+        history = fake_agent.calls[0]["chat_history"]
+        assert [m.message for m in history] == ["Hello", "Hi, how can I help?"]
+
+    def test_generate_falls_back_to_fetch(self, client, fake_agent, monkeypatch):
+        fetched = []
+
+        async def fetch(chat_id):
+            fetched.append(chat_id)
+            return []
+
+        monkeypatch.setattr(main, "get_chat_messages", fetch)
+
+        response = client.post(
+            "/api/ai/generate",
+            json={"chat_id": "chat_abc123", "user_id": "U456", "message": "Hi"},
+        )
+
+        assert response.status_code == 200
+        assert fetched == ["chat_abc123"]
+
+
+class TestStreaming:
+    """Test the Server-Sent Events endpoint"""
+
+    def test_stream_emits_tokens_then_done(self, client, fake_agent):
+        response = client.post(
+            "/api/ai/generate/stream",
+            json={
+                "chat_id": "chat_abc123",
+                "user_id": "U456",
+                "message": "Hi",
+                "messages": [],
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = [block for block in response.text.split("\n\n") if block]
+        assert [e.splitlines()[0] for e in events] == [
+            "event: token",
+            "event: token",
+            "event: token",
+            "event: done",
+        ]
+        assert '"message": "echo: Hi"' in events[-1]
+        assert '"ttft_ms"' in events[-1]
+
+
+class ScheduleAgent(FakeAgent):
+    """Answers from a tracked schedule tool, like the real agents"""
+
+    def __init__(self, tool):
+        super().__init__()
+        self.tool = tool
+
+    async def generate(self, message, chat_history, user_id, tools):
+        self.calls.append({"message": message, "chat_history": chat_history})
+        schedule = await self.tool(date="2024-02-07")
+        return f"{schedule['booked']} trucks booked"
+
+
+class TestAnswerCache:
+    """Test that repeated questions are answered from the answer cache"""
+
+    @pytest.fixture
+    def schedule_agent(self, monkeypatch):
+        @tracked("get_port_schedule")
+        async def get_port_schedule(date: str):
+            return {"booked": 3}
+
+        agent = ScheduleAgent(get_port_schedule)
+        monkeypatch.setattr(main, "agent", agent)
+        monkeypatch.setattr(
+            main,
+            "answer_cache",
+            AnswerCache(tools={"get_port_schedule": get_port_schedule}),
+        )
+        return agent
+
+    def test_repeated_question_skips_agent(self, client, schedule_agent):
+        question = "How busy is the port today?"
+        history = []
+
+        def ask(chat_id, message):
+            response = client.post(
+                "/api/ai/generate",
+                json={
+                    "chat_id": chat_id,
+                    "user_id": "U456",
+                    "message": message,
+                    "messages": history,
+                },
+            )
+            answer = response.json()["message"]
+            # The backend keeps the history growing, as in a real chat
+            for sender, text in (("human", message), ("agent", answer)):
+                history.append(
+                    {
+                        "sender": sender,
+                        "message": text,
+                        "index": len(history),
+                        "created_at": "2026-02-07T10:00:00+00:00",
+                    }
+                )
+            return answer
+
+        answers = [
+            ask("chat_1", question),
+            ask("chat_1", "how busy is the port today"),
+            ask("chat_1", question),
+        ]
+        history = []
+        answers.append(ask("chat_2", question))
+
+        assert len(set(answers)) == 1
+        assert len(schedule_agent.calls) == 1
+
+    def test_follow_up_after_another_answer_is_answered_again(
+        self, client, schedule_agent
+    ):
+        def body(chat_id, last_answer):
+            return {
+                "chat_id": chat_id,
+                "user_id": "U456",
+                "message": "What about tomorrow?",
+                "messages": [
+                    {
+                        "sender": "agent",
+                        "message": last_answer,
+                        "index": 0,
+                        "created_at": "2026-02-07T10:00:00+00:00",
+                    }
+                ],
+            }
+
+        client.post("/api/ai/generate", json=body("chat_1", "BK123 is confirmed"))
+        client.post("/api/ai/generate", json=body("chat_2", "08:00 has 4 free slots"))
+        client.post("/api/ai/generate", json=body("chat_3", "BK123 is confirmed"))
+
+        assert len(schedule_agent.calls) == 2
+
+    def test_answers_without_tool_data_are_not_cached(self, client, fake_agent):
+        body = {
+            "chat_id": "chat_1",
+            "user_id": "U456",
+            "message": "Yes please",
+            "messages": [],
+        }
+
+        client.post("/api/ai/generate", json=body)
+        client.post("/api/ai/generate", json=body)
+
+        assert len(fake_agent.calls) == 2
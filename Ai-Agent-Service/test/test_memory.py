@@ -0,0 +1,141 @@
+"""
+Unit tests for the memory profiling admin surface
+
+Run with: pytest test/test_memory.py -v
+"""
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import main
+from config import get_settings
+from memory import MemoryProfiler
+from models import Booking, Timeslot
+
+# Keeps allocations alive between snapshots
+retained = []
+
+
+def allocate_bookings(n: int) -> None:
+    retained.extend(
+        Booking(
+            booking_id=f"BK{i}",
+            timeslot=Timeslot(date="2024-02-07", hour_start="08"),
+            status="confirmed",
+        )
+        for i in range(n)
+    )
+
+
+class TestMemoryProfiler:
+    """Test snapshots, diffs and object counts"""
+
+    @pytest.fixture
+    def profiler(self):
+        profiler = MemoryProfiler(frames=3, max_snapshots=2)
+        yield profiler
+        profiler.stop()
+        retained.clear()
+
+    def test_diff_points_at_the_growing_site(self, profiler):
+        async def run():
+            profiler.start()
+            first = profiler.snapshot("before")
+            allocate_bookings(2000)
+            second = profiler.snapshot("after")
+            return profiler.diff(first.id, second.id, limit=5)
+
+        diff = asyncio.run(run())
+
+        assert any("test_memory.py" in row["site"] for row in diff)
+        assert diff[0]["size_diff_kb"] > 0
+
+    def test_snapshots_are_bounded(self, profiler):
+        async def run():
+            profiler.start()
+            return [profiler.snapshot(str(i)).id for i in range(3)]
+
+        ids = asyncio.run(run())
+
+        assert [s["id"] for s in profiler.stats()["snapshots"]] == ids[1:]
+        with pytest.raises(KeyError):
+            profiler.get(ids[0])
+
+    def test_restarts_with_a_new_frame_limit(self, profiler):
+        def nested(depth: int) -> None:
+            if depth:
+                nested(depth - 1)
+            else:
+                allocate_bookings(500)
+
+        async def run():
+            profiler.start()
+            profiler.start(frames=8)
+            nested(10)
+            return profiler.snapshot()
+
+        snapshot = asyncio.run(run())
+        top = profiler.top(snapshot.id, group_by="traceback", limit=1)
+
+        assert profiler.stats()["frames"] == 8
+        # Two lines per frame: the location and its source
+        assert len(top[0]["traceback"]) == 16
+
+    def test_stops_after_duration(self, profiler):
+        async def run():
+            profiler.start(duration=0.01)
+            assert profiler.tracing
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        assert not profiler.tracing
+        with pytest.raises(RuntimeError):
+            profiler.snapshot()
+
+    def test_counts_service_objects(self, profiler):
+        before = profiler.object_counts()["Booking"]
+        allocate_bookings(10)
+        assert profiler.object_counts()["Booking"] == before + 10
+
+
+class TestMemoryEndpoints:
+    """Test the admin endpoints"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "admin_token", "secret")
+        monkeypatch.setattr(main, "memory", MemoryProfiler(frames=2))
+        client = TestClient(main.app, headers={"X-Admin-Token": "secret"})
+        yield client
+        main.memory.stop()
+
+    def test_snapshot_flow(self, client):
+        assert client.post("/api/ai/admin/memory/snapshot", json={}).status_code == 409
+
+        started = client.post("/api/ai/admin/memory/start", json={"frames": 2})
+        assert started.json()["tracing"]
+
+        first = client.post("/api/ai/admin/memory/snapshot", json={"label": "a"})
+        second = client.post("/api/ai/admin/memory/snapshot", json={"label": "b"})
+        assert first.json()["label"] == "a" and first.json()["top"]
+
+        diff = client.get(
+            "/api/ai/admin/memory/diff",
+            params={"base": first.json()["id"], "target": second.json()["id"]},
+        )
+        assert diff.status_code == 200
+        assert client.get("/api/ai/admin/memory/diff?base=99").status_code == 404
+        assert client.get("/api/ai/admin/memory/top?group_by=x").status_code == 422
+
+        status = client.get("/api/ai/admin/memory").json()
+        assert "ChatMessage" in status["objects"]
+        assert len(status["snapshots"]) == 2
+
+        stopped = client.post("/api/ai/admin/memory/stop")
+        assert not stopped.json()["tracing"]
+
+    def test_requires_admin_token(self, client):
+        response = client.get(
+            "/api/ai/admin/memory", headers={"X-Admin-Token": "wrong"}
+        )
+        assert response.status_code == 403
@@ -0,0 +1,150 @@
+"""
+Unit tests for the Prometheus metrics
+
+Run with: pytest test/test_metrics.py -v
+"""
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import main
+from admission import AdmissionController, PriorityClass
+from answer_cache import AnswerCache
+from metrics import (
+    ERRORS,
+    LLM_SECONDS,
+    TOOL_SECONDS,
+    MetricsRegistry,
+    instrumented,
+    observed,
+)
+from router import IntentRouter
+
+
+class TestRegistry:
+    """Test the text exposition format"""
+
+    def test_counter_and_histogram_rendering(self):
+        registry = MetricsRegistry()
+        calls = registry.counter("calls_total", "Calls", ["tool"])
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+
+        calls.inc(tool="a")
+        calls.inc(2, tool='say "hi"')
+        latency.observe(0.1)
+        latency.observe(0.5)
+        latency.observe(3)
+
+        text = registry.render()
+
+        assert "# TYPE calls_total counter" in text
+        assert 'calls_total{tool="a"} 1' in text
+        assert 'calls_total{tool="say \\"hi\\""} 2' in text
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert "latency_seconds_sum 3.6" in text
+        assert "latency_seconds_count 3" in text
+
+    def test_rejects_wrong_labels(self):
+        counter = MetricsRegistry().counter("calls_total", "Calls", ["tool"])
+        with pytest.raises(ValueError):
+            counter.inc(function="a")
+
+    def test_timer_records_outcome(self):
+        errors = ERRORS.value(stage="tool")
+
+        @instrumented("flaky_tool")
+        async def flaky(fail: bool):
+            if fail:
+                raise RuntimeError("backend down")
+            return "ok"
+
+        asyncio.run(flaky(False))
+        with pytest.raises(RuntimeError):
+            asyncio.run(flaky(True))
+
+        assert TOOL_SECONDS.count(tool="flaky_tool", outcome="ok") == 1
+        assert TOOL_SECONDS.count(tool="flaky_tool", outcome="error") == 1
+        assert ERRORS.value(stage="tool") == errors + 1
+
+    def test_cancelled_blocks_are_not_ok(self):
+        errors = ERRORS.value(stage="llm")
+
+        @instrumented("slow_tool")
+        async def slow():
+            await asyncio.sleep(10)
+
+        async def cancel():
+            task = asyncio.ensure_future(slow())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        def chunks():
+            with observed(LLM_SECONDS, "llm", provider="test", call="stream"):
+                yield "a"
+                yield "b"
+
+        asyncio.run(cancel())
+        # The client went away after the first chunk
+        stream = chunks()
+        next(stream)
+        stream.close()
+
+        assert TOOL_SECONDS.count(tool="slow_tool", outcome="cancelled") == 1
+        assert TOOL_SECONDS.count(tool="slow_tool", outcome="ok") == 0
+        labels = {"provider": "test", "call": "stream"}
+        assert LLM_SECONDS.count(outcome="cancelled", **labels) == 1
+        assert LLM_SECONDS.count(outcome="ok", **labels) == 0
+        assert ERRORS.value(stage="llm") == errors
+
+
+class TestMetricsEndpoint:
+    """Test /metrics after a chat request"""
+
+    def test_exposes_request_and_cache_metrics(self, monkeypatch):
+        class Agent:
+            async def generate(self, message, chat_history, user_id, tools):
+                return "hello"
+
+        monkeypatch.setattr(main, "agent", Agent())
+        monkeypatch.setattr(main, "answer_cache", AnswerCache(tools=main.TOOLS))
+        monkeypatch.setattr(main, "router", IntentRouter(enabled=False))
+        client = TestClient(main.app)
+
+        client.post(
+            "/api/chat",
+            json={"chat_id": "c1", "user_id": "U1", "message": "Hi", "messages": []},
+        )
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        assert (
+            'ai_request_duration_seconds_count{endpoint="generate",outcome="llm"}'
+            in text
+        )
+        assert 'ai_answer_cache_lookups_total{result="misses"} 1' in text
+        assert "# TYPE ai_tool_cache_lookups_total counter" in text
+
+    def test_exposes_admission_queues_per_class(self, monkeypatch):
+        controller = AdmissionController(
+            max_concurrency=1,
+            classes=[PriorityClass("operator", 0, max_queue=4, max_wait=1.0)],
+            default_class="operator",
+        )
+        controller.classes["operator"].queued = 2
+        controller.classes["operator"].wait.observe(0.25)
+        monkeypatch.setattr(main, "admission", controller)
+
+        text = TestClient(main.app).get("/metrics").text
+
+        assert "# TYPE ai_admission_queue_depth gauge" in text
+        assert 'ai_admission_queue_depth{class="operator"} 2' in text
+        assert "# TYPE ai_admission_wait_seconds summary" in text
+        assert 'ai_admission_wait_seconds{class="operator",quantile="0.5"}' in text
+        assert 'ai_admission_wait_seconds_sum{class="operator"} 0.25' in text
+        assert 'ai_admission_wait_seconds_count{class="operator"} 1' in text
@@ -0,0 +1,133 @@
+"""
+Unit tests for the on-demand sampling profiler
+
+Run with: pytest test/test_profiling.py -v
+"""
+
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+import main
+from answer_cache import AnswerCache
+from config import get_settings
+from profiling import SamplingProfiler
+from router import IntentRouter
+
+
+def busy_work(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestSamplingProfiler:
+    """Test sessions, stack folding and the limits"""
+
+    def test_profiles_the_next_requests_only(self, tmp_path):
+        output = tmp_path / "profile.folded"
+        profiler = SamplingProfiler(interval=0.001, output_path=str(output))
+        session = profiler.arm(2)
+
+        async def handle():
+            with profiler.request() as profiled:
+                busy_work(0.05)
+                return profiled
+
+        async def run():
+            return [await handle() for _ in range(3)]
+
+        assert asyncio.run(run()) == [True, True, False]
+        session.thread.join(timeout=2)
+
+        assert session.stop_reason == "completed"
+        assert session.samples > 0
+        text = output.read_text()
+        assert "busy_work (test_profiling.py:" in text
+        # Folded format: frames joined by ';', then the sample count
+        stack, count = text.splitlines()[0].rsplit(" ", 1)
+        assert ";" in stack and int(count) > 0
+
+    def test_stops_at_the_sample_limit(self):
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.max_samples = 3
+        session = profiler.arm(1)
+
+        async def run():
+            with profiler.request():
+                busy_work(0.1)
+
+        asyncio.run(run())
+        session.thread.join(timeout=2)
+
+        assert session.stop_reason == "limit"
+        assert session.samples == 3
+
+    def test_backs_off_when_over_the_overhead_cap(self):
+        profiler = SamplingProfiler(interval=0.001, max_overhead=0.0)
+        session = profiler.arm(1)
+
+        async def run():
+            with profiler.request():
+                busy_work(0.1)
+
+        asyncio.run(run())
+        session.thread.join(timeout=2)
+
+        # The interval doubles after every sample: far fewer than 100 taken
+        assert 0 < session.samples < 10
+
+
+class TestProfileEndpoints:
+    """Test the guarded admin endpoints"""
+
+    @pytest.fixture
+    def client(self, monkeypatch, tmp_path):
+        class Agent:
+            async def generate(self, message, chat_history, user_id, tools):
+                busy_work(0.02)
+                return "hello"
+
+        monkeypatch.setattr(main, "agent", Agent())
+        monkeypatch.setattr(main, "answer_cache", AnswerCache(tools=main.TOOLS))
+        monkeypatch.setattr(main, "router", IntentRouter(enabled=False))
+        monkeypatch.setattr(
+            main,
+            "profiler",
+            SamplingProfiler(interval=0.001, output_path=str(tmp_path / "p.folded")),
+        )
+        return TestClient(main.app)
+
+    def test_disabled_without_token(self, client, monkeypatch):
+        monkeypatch.setattr(get_settings(), "admin_token", "")
+        response = client.post("/api/ai/admin/profile", json={"requests": 1})
+        assert response.status_code == 404
+
+    def test_rejects_wrong_token(self, client, monkeypatch):
+        monkeypatch.setattr(get_settings(), "admin_token", "secret")
+        response = client.post(
+            "/api/ai/admin/profile",
+            json={"requests": 1},
+            headers={"X-Admin-Token": "guess"},
+        )
+        assert response.status_code == 403
+
+    def test_profiles_a_generate_request(self, client, monkeypatch):
+        monkeypatch.setattr(get_settings(), "admin_token", "secret")
+        headers = {"X-Admin-Token": "secret"}
+
+        armed = client.post(
+            "/api/ai/admin/profile", json={"requests": 1}, headers=headers
+        )
+        assert armed.json()["session"]["remaining"] == 1
+
+        client.post(
+            "/api/chat",
+            json={"chat_id": "c1", "user_id": "U1", "message": "Hi", "messages": []},
+        )
+        main.profiler.session.thread.join(timeout=2)
+
+        status = client.get("/api/ai/admin/profile?format=json", headers=headers)
+        assert status.json()["session"]["stop_reason"] == "completed"
+        folded = client.get("/api/ai/admin/profile", headers=headers)
+        assert "busy_work" in folded.text
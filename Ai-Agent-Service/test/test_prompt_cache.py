@@ -0,0 +1,137 @@
+"""
+Unit tests for the provider-side prompt prefix cache
+
+Run with: pytest test/test_prompt_cache.py -v
+"""
+
+import asyncio
+import os
+import time
+from google.genai import types
+from agents.gemini_agent import GeminiAgent
+from prompt_cache import LocalPromptCacheProvider, PromptCache
+
+
+def make_cache(tmp_path, **kwargs) -> PromptCache:
+    prompt = tmp_path / "system_prompt.txt"
+    prompt.write_text("You are a port booking assistant.")
+    kwargs.setdefault("min_tokens", 0)
+    return PromptCache(
+        provider=LocalPromptCacheProvider(),
+        model="gemini-2.0-flash-lite",
+        tools=[],
+        prompt_path=str(prompt),
+        check_interval=0,
+        **kwargs,
+    )
+
+
+class TestPromptCache:
+    """Test creation, reuse, renewal and recreation of the cached prefix"""
+
+    def test_handle_is_created_once_and_reused(self, tmp_path):
+        cache = make_cache(tmp_path)
+
+        async def run():
+            return [await cache.handle() for _ in range(3)]
+
+        names = asyncio.run(run())
+
+        assert names[0] is not None
+        assert names == [names[0]] * 3
+        assert cache.provider.created == 1
+        entry = cache.provider.entries[names[0]]
+        assert entry["system_instruction"] == "You are a port booking assistant."
+
+    def test_ttl_is_renewed_before_expiry(self, tmp_path):
+        cache = make_cache(tmp_path, ttl_seconds=60, renew_before=30)
+
+        async def run():
+            first = await cache.handle()
+            cache._expires_at = time.monotonic() + 10
+            return first, await cache.handle()
+
+        first, second = asyncio.run(run())
+
+        assert first == second
+        assert cache.provider.refreshed == 1
+        assert cache.counters["renewed"] == 1
+
+    def test_prompt_change_recreates_handle(self, tmp_path):
+        cache = make_cache(tmp_path)
+
+        async def run():
+            first = await cache.handle()
+            prompt = tmp_path / "system_prompt.txt"
+            prompt.write_text("You are a terse port booking assistant.")
+            os.utime(prompt, (time.time() + 5, time.time() + 5))
+            return first, await cache.handle()
+
+        first, second = asyncio.run(run())
+
+        assert first != second
+        assert cache.provider.deleted == 1
+        assert first not in cache.provider.entries
+        assert (
+            cache.provider.entries[second]["system_instruction"]
+            == "You are a terse port booking assistant."
+        )
+
+    def test_provider_failure_falls_back_inline(self, tmp_path):
+        class FailingProvider(LocalPromptCacheProvider):
+            async def create(self, *args, **kwargs):
+                raise RuntimeError("cached content is too small")
+
+        cache = make_cache(tmp_path)
+        cache.provider = FailingProvider()
+
+        async def run():
+            return [await cache.handle(), await cache.handle()]
+
+        assert asyncio.run(run()) == [None, None]
+        # The second call waits for the retry window instead of retrying
+        assert cache.counters["failures"] == 1
+
+    def test_prefix_below_minimum_is_not_sent(self, tmp_path, monkeypatch):
+        cache = make_cache(tmp_path, min_tokens=1024, retry_after=0)
+        logged = []
+        monkeypatch.setattr(
+            "prompt_cache.logger.info", lambda *args: logged.append(args)
+        )
+
+        async def run():
+            return [await cache.handle() for _ in range(3)]
+
+        assert asyncio.run(run()) == [None, None, None]
+        assert cache.provider.created == 0
+        assert cache.counters["failures"] == 0
+        assert cache.stats()["below_min_tokens"]
+        assert len(logged) == 1
+
+
+class TestAgentConfig:
+    """Test that the agent sends the cached prefix instead of the inline prompt"""
+
+    def test_tool_rounds_use_cached_content(self, tmp_path):
+        agent = GeminiAgent()
+        agent.prompt_cache = make_cache(tmp_path)
+        agent.prompt_cache.tools = agent.tool_declarations
+
+        config = asyncio.run(agent._request_config(final=False))
+
+        assert config.cached_content is not None
+        assert config.system_instruction is None
+        assert config.tools is None
+
+    def test_final_round_sends_prompt_inline(self, tmp_path):
+        agent = GeminiAgent()
+        agent.prompt_cache = make_cache(tmp_path)
+
+        config = asyncio.run(agent._request_config(final=True))
+
+        assert config.cached_content is None
+        assert config.system_instruction == "You are a port booking assistant."
+        assert (
+            config.tool_config.function_calling_config.mode
+            == types.FunctionCallingConfigMode.NONE
+        )
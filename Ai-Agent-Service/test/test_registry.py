@@ -0,0 +1,73 @@
+"""
+Unit tests for the AI provider registry
+
+Run with: pytest test/test_registry.py -v
+"""
+
+import os
+import subprocess
+import sys
+import pytest
+from fastapi.testclient import TestClient
+import main
+from agents.base import AgentInterface
+from agents.registry import ProviderRegistry
+
+
+class EchoAgent(AgentInterface):
+    async def generate(self, message, chat_history, user_id, tools):
+        return f"echo: {message}"
+
+    async def stream(self, message, chat_history, user_id, tools):
+        yield f"echo: {message}"
+
+
+class TestProviderRegistry:
+    """Test provider selection and lazy construction"""
+
+    def test_creates_registered_provider(self):
+        registry = ProviderRegistry(providers={"echo": "test_registry:EchoAgent"})
+
+        agent = registry.create("Echo")
+
+        assert isinstance(agent, EchoAgent)
+        stats = registry.stats()
+        assert stats["provider"] == "echo"
+        assert "import_ms" in stats and "init_ms" in stats
+
+    def test_unknown_provider_is_rejected(self):
+        with pytest.raises(ValueError, match="gemini, llama"):
+            ProviderRegistry().load("openai")
+
+    def test_importing_main_does_not_import_provider_sdks(self):
+        app_dir = os.path.dirname(main.__file__)
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, main; "
+                "print('google.genai' in sys.modules, 'ollama' in sys.modules)",
+            ],
+            cwd=app_dir,
+            env={**os.environ, "PYTHONPATH": app_dir},
+            capture_output=True,
+            text=True,
+        )
+
+        assert result.stdout.strip() == "False False", result.stderr
+
+    def test_lifespan_constructs_configured_agent(self, monkeypatch):
+        monkeypatch.setattr(
+            main, "providers", ProviderRegistry({"echo": "test_registry:EchoAgent"})
+        )
+        monkeypatch.setattr(
+            main, "settings", main.settings.model_copy(update={"ai_provider": "echo"})
+        )
+        monkeypatch.setattr(main, "agent", None)
+
+        with TestClient(main.app) as client:
+            assert isinstance(main.agent, EchoAgent)
+            provider = client.get("/api/ai/stats").json()["provider"]
+
+        assert provider["provider"] == "echo"
+        assert "startup_ms" in provider
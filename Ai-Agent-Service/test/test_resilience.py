@@ -0,0 +1,182 @@
+"""
+Unit tests for the circuit breakers and the adaptive concurrency limiter
+
+Run with: pytest test/test_resilience.py -v
+"""
+
+import asyncio
+import httpx
+import pytest
+from resilience import (
+    AdaptiveLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    ConcurrencyLimitError,
+    Resilience,
+)
+
+
+def http_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://backend/port-schedule")
+    response = httpx.Response(status, request=request)
+    return httpx.HTTPStatusError(f"{status}", request=request, response=response)
+
+
+def make_resilience(**breaker_args) -> Resilience:
+    return Resilience(
+        AdaptiveLimiter(initial=4, minimum=1, maximum=8, latency_threshold=1.0),
+        breaker_factory=lambda name: CircuitBreaker(
+            name, **{"min_calls": 3, "reset_timeout": 60.0, **breaker_args}
+        ),
+    )
+
+
+class TestCircuitBreaker:
+    """Test the closed / open / half-open transitions"""
+
+    def test_opens_on_failure_rate_and_rejects(self):
+        breaker = CircuitBreaker("tool", failure_rate=0.5, min_calls=4)
+        for success in (True, False, True, False):
+            assert breaker.allow()
+            breaker.record(success)
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        assert breaker.stats()["rejections"] == 1
+
+    def test_half_open_trial_closes_or_reopens(self):
+        breaker = CircuitBreaker("tool", min_calls=1, reset_timeout=0.0)
+        breaker.record(False)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        assert breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # Only one trial call at a time
+        assert not breaker.allow()
+        breaker.record(False)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        assert breaker.allow()
+        breaker.record(True)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestAdaptiveLimiter:
+    """Test the AIMD limit"""
+
+    def test_increases_additively_and_decreases_multiplicatively(self):
+        limiter = AdaptiveLimiter(initial=10, minimum=2, latency_threshold=1.0)
+        for _ in range(10):
+            assert limiter.acquire()
+            limiter.release(True, 0.1)
+        assert 10.5 < limiter.limit < 11
+
+        limiter.acquire()
+        limiter.release(True, 5.0)  # Too slow counts as congestion
+        assert limiter.limit < 10
+
+    def test_rejects_over_limit(self):
+        limiter = AdaptiveLimiter(initial=2)
+        assert limiter.acquire() and limiter.acquire()
+        assert not limiter.acquire()
+        assert limiter.stats()["rejections"] == 1
+
+
+class TestGuardedTool:
+    """Test the decorator placed on the tool functions"""
+
+    def test_server_errors_open_the_circuit(self):
+        resilience = make_resilience()
+        calls = []
+
+        @resilience.guarded("get_port_schedule")
+        async def get_port_schedule(date):
+            calls.append(date)
+            raise http_error(503)
+
+        async def run():
+            for _ in range(3):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await get_port_schedule("2024-02-07")
+            with pytest.raises(CircuitOpenError):
+                await get_port_schedule("2024-02-07")
+
+        asyncio.run(run())
+
+        assert len(calls) == 3
+        assert resilience.stats()["breakers"]["get_port_schedule"]["state"] == "open"
+
+    def test_not_found_is_not_a_backend_failure(self):
+        resilience = make_resilience()
+
+        @resilience.guarded("get_booking_status")
+        async def get_booking_status(booking_id, user_id):
+            raise http_error(404)
+
+        async def run():
+            for _ in range(5):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await get_booking_status("BK000", "U456")
+
+        asyncio.run(run())
+
+        assert resilience.breaker("get_booking_status").state == "closed"
+
+    def test_calls_over_the_limit_fail_fast(self):
+        resilience = make_resilience()
+
+        @resilience.guarded("get_port_schedule")
+        async def get_port_schedule(date):
+            await asyncio.sleep(0.05)
+            return date
+
+        async def run():
+            return await asyncio.gather(
+                *(get_port_schedule(str(i)) for i in range(6)), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+
+        rejected = [r for r in results if isinstance(r, ConcurrencyLimitError)]
+        assert len(rejected) == 2
+        assert resilience.stats()["limiter"]["rejections"] == 2
+
+    def test_limiter_rejection_keeps_the_half_open_trial(self):
+        resilience = make_resilience(min_calls=1, reset_timeout=0.0)
+        breaker = resilience.breaker("get_port_schedule")
+        breaker.record(False)
+
+        @resilience.guarded("get_port_schedule")
+        async def get_port_schedule(date):
+            return date
+
+        async def run():
+            in_flight = resilience.limiter.in_flight
+            resilience.limiter.in_flight = int(resilience.limiter.limit)
+            with pytest.raises(ConcurrencyLimitError):
+                await get_port_schedule("2024-02-07")
+            resilience.limiter.in_flight = in_flight
+            return await get_port_schedule("2024-02-07")
+
+        assert asyncio.run(run()) == "2024-02-07"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_cancelled_half_open_trial_is_neutral(self):
+        resilience = make_resilience(min_calls=1, reset_timeout=0.0)
+        breaker = resilience.breaker("get_port_schedule")
+        breaker.record(False)
+
+        @resilience.guarded("get_port_schedule")
+        async def get_port_schedule(date):
+            await asyncio.sleep(1)
+            return date
+
+        async def run():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(get_port_schedule("2024-02-07"), 0.01)
+
+        asyncio.run(run())
+
+        # Not closed by the cancelled trial, and the trial is free again
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()
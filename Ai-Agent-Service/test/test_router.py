@@ -0,0 +1,141 @@
+"""
+Unit tests for the deterministic intent router
+
+Run with: pytest test/test_router.py -v
+"""
+
+import asyncio
+from datetime import date
+import pytest
+import router as router_module
+from models import Booking, PortSchedule, ScheduleSlot, Timeslot
+from resilience import CircuitOpenError
+from router import IntentRouter
+
+# A Wednesday
+TODAY = date(2024, 2, 7)
+
+
+@pytest.fixture
+def router():
+    return IntentRouter()
+
+
+class TestClassify:
+    """Test intent classification"""
+
+    @pytest.mark.parametrize(
+        "message",
+        [
+            "What is the status of booking BK123?",
+            "Show me BK123",
+            "bk123 status please",
+            "BK123",
+        ],
+    )
+    def test_booking_status(self, router, message):
+        intent = router.classify(message, TODAY)
+
+        assert intent.name == "booking_status"
+        assert intent.arguments == {"booking_id": "BK123"}
+
+    def test_user_bookings_needs_date_and_hour(self, router):
+        intent = router.classify("What are my bookings today at 2pm?", TODAY)
+
+        assert intent.name == "user_bookings"
+        assert intent.arguments == {"date": "2024-02-07", "hour": "14"}
+        assert router.classify("What are my bookings today?", TODAY) is None
+
+    @pytest.mark.parametrize(
+        "message, day, hour",
+        [
+            ("Availability tomorrow", "2024-02-08", None),
+            ("Any free slots on Monday at 9am?", "2024-02-12", "09"),
+            ("What's the schedule for 2024-02-10 at 16:00", "2024-02-10", "16"),
+            ("capacity on 09/02/2024", "2024-02-09", None),
+        ],
+    )
+    def test_availability(self, router, message, day, hour):
+        intent = router.classify(message, TODAY)
+
+        assert intent.name == "availability"
+        assert intent.arguments == {"date": day, "hour": hour}
+
+    @pytest.mark.parametrize(
+        "message",
+        [
+            "I want to reschedule BK123 to tomorrow",
+            "Status of BK123 and BK456",
+            "Show me available slots at Terminal T1 for tomorrow",
+            "Availability today or tomorrow?",
+            "What is a port terminal?",
+        ],
+    )
+    def test_falls_through(self, router, message):
+        assert router.classify(message, TODAY) is None
+
+
+class TestAnswer:
+    """Test template answers built from the tools"""
+
+    def test_booking_status_answer(self, router, monkeypatch):
+        async def get_booking_status(booking_id, user_id):
+            return Booking(
+                booking_id=booking_id,
+                timeslot=Timeslot(date="2024-02-07", hour_start="14"),
+                status="confirmed",
+            )
+
+        monkeypatch.setattr(router_module, "get_booking_status", get_booking_status)
+
+        text = asyncio.run(router.answer("Status of BK123", "U456"))
+
+        assert "BK123 is confirmed" in text
+        assert router.stats()["booking_status"] == 1
+
+    def test_availability_answer_for_hour(self, router, monkeypatch):
+        async def get_port_schedule(date):
+            return PortSchedule(
+                date=date,
+                schedule=[
+                    ScheduleSlot(
+                        hour_start="08",
+                        max_capacity=10,
+                        booked_capacity=7,
+                        late_capacity=0,
+                    ),
+                    ScheduleSlot(
+                        hour_start="09",
+                        max_capacity=10,
+                        booked_capacity=5,
+                        late_capacity=1,
+                    ),
+                ],
+            )
+
+        monkeypatch.setattr(router_module, "get_port_schedule", get_port_schedule)
+
+        text = asyncio.run(router.answer("Availability on 2024-02-07 at 9am", "U456"))
+
+        assert "09:00: 5/10 slots available" in text
+        assert "08:00" not in text
+
+    def test_backend_error_falls_through(self, router, monkeypatch):
+        async def get_port_schedule(date):
+            raise RuntimeError("backend down")
+
+        monkeypatch.setattr(router_module, "get_port_schedule", get_port_schedule)
+
+        assert asyncio.run(router.answer("Availability tomorrow", "U456")) is None
+        assert router.stats()["fallthrough"] == 1
+
+    def test_open_circuit_gives_degraded_answer(self, router, monkeypatch):
+        async def get_port_schedule(date):
+            raise CircuitOpenError("backend not responding")
+
+        monkeypatch.setattr(router_module, "get_port_schedule", get_port_schedule)
+
+        text = asyncio.run(router.answer("Availability tomorrow", "U456"))
+
+        assert "temporarily unavailable" in text
+        assert router.stats()["degraded"] == 1
@@ -0,0 +1,76 @@
+"""
+Unit tests for single-flight coalescing of tool calls
+
+Run with: pytest test/test_singleflight.py -v
+"""
+
+import asyncio
+import pytest
+from singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test that identical concurrent calls share one execution"""
+
+    def test_concurrent_identical_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+
+        @flight.coalesced_call("get_port_schedule")
+        async def get_port_schedule(date: str):
+            calls.append(date)
+            await asyncio.sleep(0.05)
+            return {"date": date}
+
+        async def run():
+            return await asyncio.gather(
+                get_port_schedule("2024-02-07"),
+                get_port_schedule(date=" 2024-02-07"),
+                get_port_schedule("2024-02-08"),
+            )
+
+        results = asyncio.run(run())
+
+        assert calls == ["2024-02-07", "2024-02-08"]
+        assert results[0] == results[1] == {"date": "2024-02-07"}
+        assert flight.stats()["coalesced"] == 1
+        assert flight.stats()["in_flight"] == 0
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight()
+
+        @flight.coalesced_call("get_booking_status")
+        async def get_booking_status(booking_id: str, user_id: str):
+            await asyncio.sleep(0.01)
+            raise ValueError(f"{booking_id} not found")
+
+        async def run():
+            return await asyncio.gather(
+                get_booking_status("BK1", "U456"),
+                get_booking_status("BK1", "U456"),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flight.stats()["executions"] == 1
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        flight = SingleFlight()
+
+        @flight.coalesced_call("get_port_schedule")
+        async def get_port_schedule(date: str):
+            await asyncio.sleep(0.05)
+            return date
+
+        async def run():
+            first = asyncio.ensure_future(get_port_schedule("2024-02-07"))
+            second = asyncio.ensure_future(get_port_schedule("2024-02-07"))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await second
+
+        assert asyncio.run(run()) == "2024-02-07"
@@ -0,0 +1,99 @@
+"""
+Unit tests for the date-range schedule tool
+
+Run with: pytest test/test_tools.py -v
+"""
+
+import asyncio
+import os
+import sys
+import httpx
+import pytest
+import tools
+from backend import backend
+from config import get_settings
+from models import PortSchedule, ScheduleSlot
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "mock"))
+import mock_api  # noqa: E402
+
+
+def slot(hour: str, capacity: int, booked: int, late: int = 0) -> ScheduleSlot:
+    return ScheduleSlot(
+        hour_start=hour,
+        max_capacity=capacity,
+        booked_capacity=booked,
+        late_capacity=late,
+    )
+
+
+class TestPortScheduleRange:
+    """Test fetching and reshaping schedules over a date range"""
+
+    @pytest.fixture
+    def schedules(self, monkeypatch):
+        calls = []
+        data = {
+            "2024-02-07": [slot("08", 10, 7), slot("09", 10, 5, 1)],
+            "2024-02-09": [slot("9:00", 12, 2), slot("14", 8, 8), slot("noon", 1, 0)],
+        }
+
+        async def get_port_schedule(date: str) -> PortSchedule:
+            calls.append(date)
+            return PortSchedule(date=date, schedule=data.get(date, []))
+
+        monkeypatch.setattr(tools, "get_port_schedule", get_port_schedule)
+        return calls
+
+    def test_builds_hour_by_date_tables(self, schedules):
+        grid = asyncio.run(tools.get_port_schedule_range("2024-02-07", "2024-02-09"))
+
+        assert schedules == ["2024-02-07", "2024-02-08", "2024-02-09"]
+        assert grid.dates == schedules
+        assert grid.hours == ["08", "09", "14"]
+        assert grid.max_capacity == [[10, 0, 0], [10, 0, 12], [0, 0, 8]]
+        assert grid.booked_capacity == [[7, 0, 0], [5, 0, 2], [0, 0, 8]]
+        assert grid.late_capacity == [[0, 0, 0], [1, 0, 0], [0, 0, 0]]
+
+    def test_hour_window(self, schedules):
+        grid = asyncio.run(
+            tools.get_port_schedule_range(
+                "2024-02-07", "2024-02-09", hour_from="9", hour_to="10"
+            )
+        )
+        assert grid.hours == ["09"]
+        assert grid.max_capacity == [[10, 0, 12]]
+        # Hours may be given as HH:MM too
+        same = asyncio.run(
+            tools.get_port_schedule_range(
+                "2024-02-07", "2024-02-09", hour_from="09:00", hour_to="10:00"
+            )
+        )
+        assert same == grid
+
+    def test_rejects_bad_ranges(self, schedules, monkeypatch):
+        monkeypatch.setattr(get_settings(), "schedule_range_max_days", 7)
+        with pytest.raises(ValueError):
+            asyncio.run(tools.get_port_schedule_range("2024-02-09", "2024-02-07"))
+        with pytest.raises(ValueError):
+            asyncio.run(tools.get_port_schedule_range("2024-02-01", "2024-02-08"))
+        assert schedules == []
+
+    def test_one_bulk_request_when_batching(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "tool_batching_enabled", True)
+        monkeypatch.setattr(tools.tool_cache, "enabled", False)
+
+        async def run():
+            await backend.start(transport=httpx.ASGITransport(app=mock_api.app))
+            try:
+                before = tools.port_schedule_loader.batches
+                grid = await tools.get_port_schedule_range("2024-02-07", "2024-02-08")
+                return grid, tools.port_schedule_loader.batches - before
+            finally:
+                await backend.close()
+
+        grid, batches = asyncio.run(run())
+
+        assert batches == 1
+        assert grid.dates == ["2024-02-07", "2024-02-08"]
+        assert grid.hours[0] == "08" and grid.max_capacity[0] == [10, 10]
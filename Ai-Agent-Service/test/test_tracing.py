@@ -0,0 +1,155 @@
+"""
+Unit tests for request tracing
+
+Run with: pytest test/test_tracing.py -v
+"""
+
+import asyncio
+import json
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+import main
+from answer_cache import AnswerCache
+from backend import BackendClient
+from router import IntentRouter
+from tracing import JsonlExporter, Tracer, tracer
+
+
+class Collector:
+    """Exporter keeping the exported spans in memory"""
+
+    def __init__(self):
+        self.spans = []
+        self.exported = 0
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def collected(monkeypatch):
+    """Turn the service's tracer on, exporting every trace into memory"""
+    collector = Collector()
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    monkeypatch.setattr(tracer, "exporter", collector)
+    return collector
+
+
+class TestTracer:
+    """Test span nesting, sampling and retention"""
+
+    def test_spans_nest_and_share_the_trace(self):
+        collector = Collector()
+        tracer = Tracer(exporter=collector)
+
+        with tracer.span("root") as root:
+            with tracer.span("child") as child:
+                assert tracer.current() is child
+            assert tracer.current() is root
+
+        assert [s.name for s in collector.spans] == ["child", "root"]
+        assert child.parent_id == root.span_id
+        assert child.trace is root.trace
+
+    def test_tail_sampling_keeps_slow_and_failed_traces(self):
+        collector = Collector()
+        tracer = Tracer(exporter=collector, sample_rate=0.0, slow_threshold=0.05)
+
+        with tracer.span("fast"):
+            pass
+        with tracer.span("slow"):
+            asyncio.run(asyncio.sleep(0.06))
+        with pytest.raises(RuntimeError):
+            with tracer.span("failed"):
+                raise RuntimeError("boom")
+
+        assert [s.name for s in collector.spans] == ["slow", "failed"]
+        assert collector.spans[1].status == "ERROR"
+        stats = tracer.stats()
+        assert (stats["dropped"], stats["kept_slow"], stats["kept_error"]) == (1, 1, 1)
+
+    def test_continues_incoming_trace(self):
+        tracer = Tracer(exporter=Collector(), sample_rate=0.0)
+        incoming = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+        with tracer.span("server", traceparent=incoming) as span:
+            header = tracer.headers()["traceparent"]
+
+        assert span.trace.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+        assert span.parent_id == "00f067aa0ba902b7"
+        assert header == f"00-4bf92f3577b34da6a3ce929d0e0e4736-{span.span_id}-01"
+
+    def test_disabled_tracer_records_nothing(self):
+        collector = Collector()
+        tracer = Tracer(exporter=collector, enabled=False)
+        with tracer.span("root") as span:
+            span.set(ignored=True)
+            assert tracer.headers() == {}
+        assert collector.spans == []
+
+    def test_jsonl_exporter(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        exporter = JsonlExporter(str(path))
+        tracer = Tracer(exporter=exporter)
+
+        with tracer.span("root", **{"chat.id": "c1"}):
+            with tracer.span("child"):
+                pass
+        exporter.shutdown()
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [r["name"] for r in records] == ["child", "root"]
+        assert records[0]["parentSpanId"] == records[1]["spanId"]
+        assert records[1]["attributes"]["chat.id"] == "c1"
+        assert records[1]["endTimeUnixNano"] >= records[1]["startTimeUnixNano"]
+
+
+class TestPropagation:
+    """Test trace context sent to the backend and spans of a chat turn"""
+
+    def test_backend_requests_carry_traceparent(self, collected):
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append(request.headers.get("traceparent"))
+            return httpx.Response(200, json=[])
+
+        async def run():
+            client = BackendClient()
+            await client.start(transport=httpx.MockTransport(handler))
+            try:
+                with tracer.span("root"):
+                    await client.get("/api/chat/c1/messages")
+            finally:
+                await client.close()
+
+        asyncio.run(run())
+
+        http_span = next(s for s in collected.spans if s.name == "HTTP GET")
+        assert seen == [http_span.traceparent]
+        assert http_span.attributes["http.response.status_code"] == 200
+
+    def test_chat_turn_spans(self, collected, monkeypatch):
+        class Agent:
+            async def generate(self, message, chat_history, user_id, tools):
+                return "hello"
+
+        monkeypatch.setattr(main, "agent", Agent())
+        monkeypatch.setattr(main, "answer_cache", AnswerCache(tools=main.TOOLS))
+        monkeypatch.setattr(main, "router", IntentRouter(enabled=False))
+        incoming = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+        TestClient(main.app).post(
+            "/api/chat",
+            json={"chat_id": "c1", "user_id": "U1", "message": "Hi", "messages": []},
+            headers={"traceparent": incoming},
+        )
+
+        names = [s.name for s in collected.spans]
+        assert names[-1] == "chat generate"
+        assert {"router.answer", "answer_cache.lookup", "agent.generate"} <= set(names)
+        root = collected.spans[-1]
+        assert root.trace.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+        assert root.attributes["chat.outcome"] == "llm"